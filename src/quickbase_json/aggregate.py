@@ -0,0 +1,217 @@
+import hashlib
+import json
+import math
+
+from quickbase_json.helpers import Group
+from quickbase_json.qb_response import QBQueryResponse
+
+AGGREGATES = ['count', 'sum', 'min', 'max', 'avg', 'distinct', 'approx_distinct']
+
+# groupings of a Group that can be aggregated client side, records are grouped by exact value
+GROUPINGS = ['equal-values']
+
+
+def _value(cell: any) -> any:
+    return cell.get('value') if isinstance(cell, dict) and 'value' in cell else cell
+
+
+def _encode(value: any) -> bytes:
+    return json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+
+
+class HyperLogLog:
+    """
+    Approximate distinct counter using a fixed 2^p bytes of memory, with a standard error of about 1.04 / sqrt(2^p).
+    """
+
+    def __init__(self, p: int = 12):
+        """
+        Initializes the counter.
+        :param p: precision, between 4 and 16
+        """
+        if not 4 <= p <= 16:
+            raise ValueError('HyperLogLog precision must be between 4 and 16')
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: any):
+        h = int.from_bytes(hashlib.blake2b(_encode(value), digest_size=8).digest(), 'big')
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        """
+        Merges another counter of the same precision into this one.
+        :param other: HyperLogLog
+        """
+        if other.p != self.p:
+            raise ValueError('Can not merge HyperLogLog counters of different precision')
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # small range correction
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+
+class Distinct:
+    """
+    Distinct counter that is exact up to a limit of values, then switches to a HyperLogLog.
+    """
+
+    def __init__(self, limit: int = 10000, p: int = 12):
+        self.limit = limit
+        self.p = p
+        self.values = set()
+        self.hll = None
+
+    def add(self, value: any):
+        if self.hll is not None:
+            self.hll.add(value)
+            return
+        self.values.add(_encode(value))
+        if len(self.values) > self.limit:
+            self.hll = HyperLogLog(self.p)
+            for encoded in self.values:
+                self.hll.add(json.loads(encoded))
+            self.values = None
+
+    @property
+    def exact(self) -> bool:
+        return self.hll is None
+
+    def count(self) -> int:
+        return len(self.values) if self.hll is None else self.hll.count()
+
+
+class Aggregator:
+    """
+    Aggregates a stream of records into groups, keeping only running totals per group.
+    Distinct counts are exact up to distinct_limit values per group, then approximate.
+    """
+
+    def __init__(self, group_by: any, aggregates: list, distinct_limit: int = 10000, precision: int = 12):
+        """
+        Initializes the aggregator.
+        :param group_by: list of fids, or Group, i.e. [6] or Group([(6, 'equal-values')]). Empty for a single group.
+        Only 'equal-values' groupings are supported.
+        :param aggregates: list of (fid, aggregate) or (fid, aggregate, name) tuples, i.e. [(7, 'sum'), (8, 'distinct')]
+        Aggregates are count (non-null values), sum, min, max, avg, distinct and approx_distinct.
+        :param distinct_limit: values counted exactly per group, before distinct counts become approximate
+        :param precision: HyperLogLog precision of approximate distinct counts
+        """
+        if isinstance(group_by, Group):
+            for fid, grouping in group_by.group_pairs:
+                if grouping not in GROUPINGS:
+                    raise ValueError(f'Invalid grouping "{grouping}" of field {fid}, valid groupings: {GROUPINGS}')
+            group_by = [pair[0] for pair in group_by.group_pairs]
+        self.group_by = [str(fid) for fid in group_by or []]
+        self.aggregates = []
+        for spec in aggregates:
+            fid, aggregate = str(spec[0]), spec[1]
+            if aggregate not in AGGREGATES:
+                raise ValueError(f'Invalid aggregate "{aggregate}", valid aggregates: {AGGREGATES}')
+            name = spec[2] if len(spec) > 2 else f'{aggregate}_{fid}'
+            self.aggregates.append((fid, aggregate, name))
+        self.distinct_limit = distinct_limit
+        self.precision = precision
+        self.groups = {}
+        self.records = 0
+
+    def _accumulators(self) -> list:
+        accumulators = []
+        for _, aggregate, _ in self.aggregates:
+            if aggregate == 'distinct':
+                accumulators.append(Distinct(self.distinct_limit, self.precision))
+            elif aggregate == 'approx_distinct':
+                accumulators.append(HyperLogLog(self.precision))
+            elif aggregate == 'avg':
+                accumulators.append([0, 0])
+            else:
+                accumulators.append(0 if aggregate in ('count', 'sum') else None)
+        return accumulators
+
+    def add(self, record: dict):
+        """
+        Adds a record, keyed by fid (raw or denested).
+        :param record: record dict
+        """
+        self.records += 1
+        key = tuple(_value(record.get(fid)) for fid in self.group_by)
+        try:
+            hash(key)
+        except TypeError:
+            key = tuple(_encode(k) for k in key)
+        accumulators = self.groups.get(key)
+        if accumulators is None:
+            accumulators = self.groups[key] = self._accumulators()
+
+        for i, (fid, aggregate, _) in enumerate(self.aggregates):
+            value = _value(record.get(fid))
+            if value is None:
+                continue
+            acc = accumulators[i]
+            if aggregate == 'count':
+                accumulators[i] += 1
+            elif aggregate == 'sum':
+                accumulators[i] += value
+            elif aggregate == 'avg':
+                acc[0] += value
+                acc[1] += 1
+            elif aggregate == 'min':
+                accumulators[i] = value if acc is None or value < acc else acc
+            elif aggregate == 'max':
+                accumulators[i] = value if acc is None or value > acc else acc
+            else:
+                acc.add(value)
+
+    def extend(self, records: any):
+        """
+        Adds many records.
+        :param records: iterable of record dicts
+        """
+        for record in records:
+            self.add(record)
+
+    def result(self) -> QBQueryResponse:
+        """
+        Builds a response with a record per group, holding group by fids and named aggregates.
+        :return: QBQueryResponse
+        """
+        keys = list(self.groups)
+        try:
+            keys.sort(key=lambda k: tuple((v is None, v) for v in k))
+        except TypeError:
+            pass
+
+        data = []
+        for key in keys:
+            row = {fid: {'value': value} for fid, value in zip(self.group_by, key)}
+            for (_, aggregate, name), acc in zip(self.aggregates, self.groups[key]):
+                if aggregate == 'avg':
+                    acc = acc[0] / acc[1] if acc[1] else None
+                elif aggregate in ('distinct', 'approx_distinct'):
+                    acc = acc.count()
+                row[name] = {'value': acc}
+            data.append(row)
+
+        fields = [{'id': int(fid), 'label': fid, 'type': 'group'} for fid in self.group_by]
+        fields += [{'id': name, 'label': name, 'type': aggregate} for _, aggregate, name in self.aggregates]
+        res = QBQueryResponse(sample_data={
+            'data': data,
+            'fields': fields,
+            'metadata': {'totalRecords': len(data), 'numRecords': len(data), 'numFields': len(fields), 'skip': 0}})
+        res.ok = True
+        res.status_code = 200
+        return res
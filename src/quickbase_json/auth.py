@@ -1,8 +1,12 @@
 import datetime
+import json
+import os
+import threading
+import time
 import urllib.parse
-from xml.etree import ElementTree
 
-import requests
+from quickbase_json.ratelimit import RateLimiter
+from quickbase_json.transport import Transport
 
 
 class AuthResponse:
@@ -19,30 +23,56 @@ class AuthResponse:
 
 
 class UserToken:
-    def __init__(self, string, hours):
+    def __init__(self, string, hours, expiration: datetime.datetime = None):
         self.string = string
-        self.expiration = datetime.datetime.now() + datetime.timedelta(hours=hours)
+        self.expiration = expiration or datetime.datetime.now() + datetime.timedelta(hours=hours)
+
+    def expires_in(self) -> float:
+        """
+        Seconds until the token expires.
+        :return: float
+        """
+        return (self.expiration - datetime.datetime.now()).total_seconds()
+
+    def is_expired(self, margin: float = 0.0) -> bool:
+        """
+        Checks if the token is expired, or will be within margin seconds.
+        :param margin: seconds before expiration to consider the token expired
+        :return: bool
+        """
+        return self.expires_in() <= margin
 
 
 class User:
-    def __init__(self, realm, username):
+    def __init__(self, realm, username, transport: Transport = None, **kwargs):
+        """
+        Initializes a user.
+        :param realm: quickbase realm
+        :param username: quickbase username (email)
+        :param transport: optional Transport
+        :param kwargs: 'realm_url', root url of the realm. Defaults to https://<realm>.quickbase.com
+        """
         self.realm = realm
         self.username = username
         self.authenticated = False
         self.token = None
+        self.ticket = None
+        self.transport = transport if transport is not None else Transport()
+        self.realm_url = kwargs.get('realm_url', f'https://{self.realm}.quickbase.com').rstrip('/')
 
     def is_authenticated(self):
         """
         Method to check if the user is authenticated.
         :return:
         """
-        return self.authenticated
+        return self.authenticated and (self.ticket is None or not self.ticket.is_expired())
 
     def authenticate(self, password, hours):
         pw = urllib.parse.quote(password)
-        url = f'https://{self.realm}.quickbase.com/db/main?a=API_Authenticate&username={self.username}&password={pw}&hours={hours}'
-        r = requests.post(url=url)
+        url = f'{self.realm_url}/db/main?a=API_Authenticate&username={urllib.parse.quote(self.username)}&password={pw}&hours={hours}'
+        r = self.transport.request('POST', url)
 
+        from xml.etree import ElementTree
         tree = ElementTree.fromstring(r.content)
 
         xml_dict = {}
@@ -54,6 +84,7 @@ class User:
         if error_code == 0:
             token = xml_dict.get('ticket')
             self.token = token
+            self.ticket = UserToken(token, hours)
             self.authenticated = True
             return AuthResponse(error_code=error_code)
         else:
@@ -65,5 +96,346 @@ class QBUser(User):
     Same as "User" class, just offers backwards compatibility.
     Recommended to use QBUser, NOT User for better typing.
     """
-    def __init__(self, realm, username):
-        super().__init__(realm, username)
\ No newline at end of file
+    def __init__(self, realm, username, transport: Transport = None, **kwargs):
+        super().__init__(realm, username, transport=transport, **kwargs)
+
+
+class AuthProvider:
+    """
+    Supplies credentials to a client, which consults it on every request.
+    A single provider can be shared by many clients and threads.
+    """
+
+    # number of times a client retries a throttled (429) request with this provider
+    retries = 0
+
+    def authorization(self, timeout: float = None) -> str:
+        """
+        Value of the Authorization header for the next request.
+        :param timeout: max seconds to wait for rate budget, raises TimeoutError once it passes. Waits forever if None.
+        :return: str
+        """
+        raise NotImplementedError
+
+    def xml_credential(self) -> tuple:
+        """
+        Credential for the XML API.
+        :return: tuple of (xml tag, value), i.e. ('usertoken', '...')
+        """
+        raise NotImplementedError
+
+    def xml_credential_of(self, authorization: str) -> tuple:
+        """
+        Credential for the XML API, matching a value returned by authorization().
+        :param authorization: value returned by authorization()
+        :return: tuple of (xml tag, value), i.e. ('usertoken', '...')
+        """
+        scheme, value = authorization.split(' ', 1)
+        return ('ticket' if scheme == 'QB-TICKET' else 'usertoken'), value
+
+    def can_retry(self) -> bool:
+        """
+        Checks if a throttled request can be retried right away.
+        :return: bool
+        """
+        return self.retries > 0
+
+    def release(self, authorization: str, response: any):
+        """
+        Called by the client once a request made with authorization has completed.
+        :param authorization: value returned by authorization()
+        :param response: response object, or None if the request raised an exception
+        """
+        pass
+
+    def masked(self) -> str:
+        """
+        Printable representation, without exposing the credential.
+        :return: str
+        """
+        return f'{self.__class__.__name__}'
+
+
+def mask(secret: str) -> str:
+    secret = secret or ''
+    return ''.join(['*' for _ in range(len(list(secret)))] + list(secret)[-5:])
+
+
+class UserTokenAuth(AuthProvider):
+    """
+    Authenticates with a quickbase user token.
+    """
+
+    def __init__(self, token: str, rate_limiter: RateLimiter = None):
+        """
+        Initializes user token authentication.
+        :param token: quickbase user token
+        :param rate_limiter: optional RateLimiter, every request waits for budget before being sent
+        """
+        self.token = token
+        self.rate_limiter = rate_limiter
+
+    def authorization(self, timeout: float = None) -> str:
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout):
+            raise TimeoutError(f'No rate budget within {timeout}s')
+        return f'QB-USER-TOKEN {self.token}'
+
+    def xml_credential(self) -> tuple:
+        return 'usertoken', self.token
+
+    def masked(self) -> str:
+        return mask(self.token)
+
+
+class TicketAuth(AuthProvider):
+    """
+    Authenticates with a ticket from API_Authenticate.
+    The ticket is cached until shortly before it expires and refreshed in the background, so requests
+    never wait on an authentication round trip.  Optionally, tickets are persisted to a file so short-lived
+    worker processes can reuse them.
+    """
+
+    def __init__(self, user: User, password: str, hours: float = 12, refresh_margin: float = 600,
+                 background: bool = True, persist_path: str = None, debug: bool = False):
+        """
+        Initializes ticket authentication.
+        :param user: User (or QBUser) to authenticate as
+        :param password: user's password, kept in memory to refresh tickets
+        :param hours: hours each ticket is valid for
+        :param refresh_margin: seconds before expiration to refresh the ticket
+        :param background: refresh tickets on a background thread before they expire
+        :param persist_path: optional file to share tickets between processes
+        :param debug: print background refresh failures
+        """
+        self.user = user
+        self._password = password
+        self.hours = hours
+        self.refresh_margin = refresh_margin
+        self.background = background
+        self.persist_path = persist_path
+        self.debug = debug
+        self.refreshes = 0
+        # error of the last failed background refresh, cleared by a successful refresh
+        self.refresh_error = None
+        self._lock = threading.RLock()
+        self._timer = None
+
+        if persist_path:
+            self._load()
+
+    def _load(self):
+        """Loads a persisted ticket, if it belongs to this user and is still fresh."""
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('realm') != self.user.realm or saved.get('username') != self.user.username:
+            return
+        ticket = UserToken(saved['ticket'], 0, expiration=datetime.datetime.fromtimestamp(saved['expiration']))
+        if not ticket.is_expired(self.refresh_margin):
+            self.user.token = ticket.string
+            self.user.ticket = ticket
+            self.user.authenticated = True
+            self._schedule()
+
+    def _save(self):
+        tmp_path = f'{self.persist_path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'realm': self.user.realm,
+                'username': self.user.username,
+                'ticket': self.user.ticket.string,
+                'expiration': self.user.ticket.expiration.timestamp()}, f)
+        os.replace(tmp_path, self.persist_path)
+
+    def _schedule(self):
+        if not self.background:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, self.user.ticket.expires_in() - self.refresh_margin)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # the next request will try again in the foreground, and report this if that fails too
+            self.refresh_error = e
+            if self.debug:
+                print(f'QJAC : TicketAuth : background refresh failed ---> {e}')
+
+    def refresh(self):
+        """
+        Gets a new ticket with API_Authenticate.
+        :return: AuthResponse
+        """
+        with self._lock:
+            if self.persist_path:
+                # another process may have refreshed already
+                self._load()
+                if self.user.ticket is not None and not self.user.ticket.is_expired(self.refresh_margin):
+                    return AuthResponse(error_code=0)
+
+            res = self.user.authenticate(self._password, self.hours)
+            if not res.ok:
+                raise PermissionError(f'Quickbase authentication failed, {res}')
+            self.refreshes += 1
+            self.refresh_error = None
+            if self.persist_path:
+                self._save()
+            self._schedule()
+            return res
+
+    def ticket(self) -> str:
+        """
+        Gets a valid ticket, authenticating only if the cached one is missing or about to expire.
+        :return: str
+        """
+        ticket = self.user.ticket
+        if ticket is None or ticket.is_expired(self.refresh_margin):
+            with self._lock:
+                ticket = self.user.ticket
+                if ticket is None or ticket.is_expired(self.refresh_margin):
+                    background_error = self.refresh_error
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        if background_error is not None:
+                            raise e from background_error
+                        raise
+        return self.user.ticket.string
+
+    def authorization(self, timeout: float = None) -> str:
+        return f'QB-TICKET {self.ticket()}'
+
+    def xml_credential(self) -> tuple:
+        return 'ticket', self.ticket()
+
+    def close(self):
+        """
+        Stops background refreshing.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def masked(self) -> str:
+        return f'TicketAuth({self.user.username})'
+
+
+class TokenStats:
+    """
+    Usage statistics of a single token in a UserTokenPool.
+    """
+
+    def __init__(self, token: str, rate_limiter: RateLimiter):
+        self.token = token
+        self.rate_limiter = rate_limiter
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.cooling_until = 0.0
+
+    def is_cooling(self, now: float) -> bool:
+        return now < self.cooling_until
+
+    def to_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'cooling': self.is_cooling(time.monotonic()),
+            'available': round(self.rate_limiter.available, 2),
+        }
+
+
+class UserTokenPool(AuthProvider):
+    """
+    Shards requests across a pool of user tokens, each with its own rate budget.
+    Every request goes to the least-loaded token with budget left. A token that receives a 429
+    cools down and the client retries the request with another token.
+    """
+
+    def __init__(self, tokens: list, requests: int = 100, seconds: float = 10.0, cooldown: float = 10.0):
+        """
+        Initializes the pool.
+        :param tokens: list of quickbase user tokens
+        :param requests: requests allowed per token, per period
+        :param seconds: length of period in seconds
+        :param cooldown: seconds a throttled token is rested, when the response has no Retry-After header
+        """
+        if not tokens:
+            raise ValueError('Token pool must contain at least one token')
+        self.cooldown = cooldown
+        self.tokens = {t: TokenStats(t, RateLimiter(requests, seconds)) for t in tokens}
+        self.retries = len(tokens)
+        self._lock = threading.Lock()
+
+    def _acquire(self, track: bool = True, timeout: float = None) -> TokenStats:
+        """Picks the least-loaded token with budget, waiting (up to timeout seconds) if every token is busy or cooling."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                ready = [s for s in self.tokens.values() if not s.is_cooling(now)]
+                for stats in sorted(ready, key=lambda s: (s.in_flight, -s.rate_limiter.available)):
+                    if stats.rate_limiter.try_acquire():
+                        stats.requests += 1
+                        if track:
+                            stats.in_flight += 1
+                        return stats
+                waits = [s.cooling_until - now for s in self.tokens.values() if s.is_cooling(now)]
+                waits += [s.rate_limiter.wait_time() for s in ready]
+            wait = min(waits)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f'No token with rate budget within {timeout}s')
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.001))
+
+    def authorization(self, timeout: float = None) -> str:
+        return f'QB-USER-TOKEN {self._acquire(timeout=timeout).token}'
+
+    def xml_credential(self) -> tuple:
+        return 'usertoken', self._acquire(track=False).token
+
+    def can_retry(self) -> bool:
+        now = time.monotonic()
+        return any(not s.is_cooling(now) for s in self.tokens.values())
+
+    def release(self, authorization: str, response: any):
+        stats = self.tokens.get(authorization.split(' ', 1)[-1])
+        if stats is None:
+            return
+        with self._lock:
+            stats.in_flight -= 1
+            if response is None:
+                stats.errors += 1
+            elif response.status_code == 429:
+                stats.throttled += 1
+                try:
+                    cooldown = float(response.headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    cooldown = self.cooldown
+                stats.cooling_until = time.monotonic() + cooldown
+
+    def stats(self) -> dict:
+        """
+        Gets per-token statistics, keyed by masked token.
+        :return: dict
+        """
+        with self._lock:
+            return {mask(t)[-9:]: s.to_dict() for t, s in self.tokens.items()}
+
+    def masked(self) -> str:
+        return f'UserTokenPool({len(self.tokens)} tokens)'
@@ -0,0 +1,179 @@
+import atexit
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+from quickbase_json.streaming import drop_null_values
+
+
+class BufferedWriter:
+    """
+    Thread-safe write-behind buffer for record upserts into a single table.
+    Producers append records and get a Future back, records are sent as batched upserts by a background
+    thread once a record count, byte size or age threshold is reached, and on flush() / close().
+    Each Future resolves to the record id of its record, or raises the error Quickbase returned for it.
+    """
+
+    def __init__(self, client, table: str, max_records: int = 500, max_bytes: int = 5 * 1024 * 1024,
+                 interval: float = 1.0, **kwargs):
+        """
+        Initializes the writer.
+        :param client: QuickbaseJSONClient
+        :param table: table to add records to
+        :param max_records: flush once this many records are buffered
+        :param max_bytes: flush once buffered records serialize to this many bytes, and the max size of each upsert
+        :param interval: flush once the oldest buffered record is this many seconds old
+        :param kwargs: optional request parameters, i.e. mergeFieldId, fieldsToReturn
+        """
+        if max_records < 1:
+            raise ValueError('max_records must be at least 1')
+        self.client = client
+        self.table = table
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.params = kwargs
+        fields = list(kwargs.pop('fieldsToReturn', None) or [])
+        self.params['fieldsToReturn'] = fields if 3 in fields else [3] + fields
+
+        self.requests = 0
+        self.records = 0
+        self.closed = False
+        self._buffer = []
+        self._bytes = 0
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.close)
+
+    def append(self, record: dict) -> Future:
+        """
+        Adds a record to the buffer.
+        :param record: dict of data, {"6": {"value": 'example'}}
+        :return: Future, resolving to the record id
+        """
+        record = drop_null_values(record)
+        size = len(json.dumps(record, separators=(',', ':'))) + 1
+        future = Future()
+        with self._cond:
+            if self.closed:
+                raise ValueError('BufferedWriter is closed')
+            self._buffer.append((record, future, size))
+            self._bytes += size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def extend(self, records: any) -> list:
+        """
+        Adds many records to the buffer.
+        :param records: iterable of record dicts
+        :return: list of Future
+        """
+        return [self.append(record) for record in records]
+
+    def _due(self) -> bool:
+        if not self._buffer:
+            return False
+        return (len(self._buffer) >= self.max_records or self._bytes >= self.max_bytes
+                or time.monotonic() - self._oldest >= self.interval)
+
+    def _take(self) -> list:
+        """Takes up to max_records records and max_bytes from the buffer, the lock must be held."""
+        count, size = 0, 0
+        for _, _, record_size in self._buffer[:self.max_records]:
+            # a single record larger than max_bytes is still sent, on its own
+            if count and size + record_size > self.max_bytes:
+                break
+            count += 1
+            size += record_size
+        batch, self._buffer = self._buffer[:count], self._buffer[count:]
+        self._bytes -= size
+        self._oldest = time.monotonic() if self._buffer else None
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.closed and not self._due():
+                    timeout = None if self._oldest is None else self.interval - (time.monotonic() - self._oldest)
+                    self._cond.wait(timeout=None if timeout is None else max(timeout, 0.001))
+                if self.closed and not self._buffer:
+                    return
+            # take the batch while holding the send lock, so batches are sent in order, but not the buffer
+            # lock, so producers can append while a batch is sent
+            with self._send_lock:
+                with self._cond:
+                    batch = self._take()
+                self._send(batch)
+
+    def _send(self, batch: list):
+        if not batch:
+            return
+        self.requests += 1
+        self.records += len(batch)
+        try:
+            res = self.client.insert_update_records(self.table, [r for r, _, _ in batch], **self.params)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        if not res.ok:
+            error = ConnectionError(f'{res.status_code}: {res.get("message")} {res.get("description", "")}'.strip())
+            for _, future, _ in batch:
+                future.set_exception(error)
+            return
+
+        # lineErrors are keyed by 1-based line, data holds a row for every other line, in order
+        line_errors = (res.get('metadata') or {}).get('lineErrors') or {}
+        rows = iter(res.get('data') or [])
+        for line, (_, future, _) in enumerate(batch, start=1):
+            if str(line) in line_errors:
+                future.set_exception(ValueError('; '.join(line_errors[str(line)])))
+                continue
+            row = next(rows, None)
+            future.set_result((row or {}).get('3', {}).get('value'))
+
+    def flush(self):
+        """
+        Sends every buffered record, waiting until they have been sent.
+        """
+        while True:
+            # waits for a batch the background thread may be sending
+            with self._send_lock:
+                with self._cond:
+                    if not self._buffer:
+                        break
+                    batch = self._take()
+                self._send(batch)
+
+    def close(self):
+        """
+        Flushes remaining records and stops the background thread.
+        """
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._cond.notify_all()
+        atexit.unregister(self.close)
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
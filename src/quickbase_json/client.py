@@ -1,41 +1,251 @@
 import datetime
+import functools
 import json
 import os
 import hashlib
-
-import requests
-
-from quickbase_json.helpers import FileUpload, Where, QBFile, split_list_into_chunks
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, Future, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING
+
+from quickbase_json.auth import AuthProvider, UserTokenAuth, UserTokenPool
+from quickbase_json.deadline import Deadline, DeadlineExceeded
+from quickbase_json.helpers import FileUpload, Where, QBFile, split_list_into_chunks, chunk_query_values, \
+    MAX_QUERY_LENGTH
 from quickbase_json.qb_insert_update_response import QBInsertResponse
+from quickbase_json.pagination import QueryPaginator, ShardedQuery
 from quickbase_json.qb_response import QBQueryResponse
+from quickbase_json.ratelimit import RateLimiter
+from quickbase_json.streaming import drop_null_values, iter_upsert_body, DEFAULT_CHUNK_SIZE, DownloadResult, \
+    write_base64_stream, file_name_from_headers
+from quickbase_json.transport import Transport
+
+if TYPE_CHECKING:
+    # imported where used, so importing the package stays fast
+    from quickbase_json.buffered_writer import BufferedWriter
+    from quickbase_json.encoder import RecordEncoder
+    from quickbase_json.file_cache import FileCache
+    from quickbase_json.hedging import HedgePolicy
+    from quickbase_json.qb_delete_response import QBDeleteResponse
+    from quickbase_json.upsert_state import UpsertState
 
 QUERY_CACHE = 'query_cache'
+API_URL = 'https://api.quickbase.com/v1'
 
-try:
-    import pkg_resources
 
-    version = pkg_resources.require("quickbase-json-api-client")[0].version
-except Exception as e:
-    print(e)
-    version = 'unknown'
+@functools.lru_cache(maxsize=None)
+def get_version() -> str:
+    """
+    Gets the installed version of the package, looked up on first use.
+    :return: str, 'unknown' if the package is not installed
+    """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python < 3.8
+        try:
+            import pkg_resources
+            return pkg_resources.require('quickbase-json-api-client')[0].version
+        except Exception:
+            return 'unknown'
+    try:
+        return version('quickbase-json-api-client')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # the module level version is kept for backwards compatibility, without looking it up on import
+        if name == 'version':
+            return get_version()
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+else:
+    # module __getattr__ (PEP 562) is Python 3.7+
+    version = get_version()
 
 
 class QuickbaseJSONClient:
-    def __init__(self, realm, auth, agent: str = f'python-qjac/{version}', debug=False, **kwargs):
+    def __init__(self, realm, auth, agent: str = None, debug=False, transport: Transport = None,
+                 **kwargs):
         """
         Creates a client object.
         :param realm: quickbase realm
-        :param auth: quickbase user token
-        :param kwargs:
+        :param auth: quickbase user token, a list of user tokens (requests are sharded across them, see UserTokenPool)
+        or an AuthProvider (i.e. TicketAuth) consulted on every request
+        :param transport: optional Transport, i.e. RecordingTransport or ReplayTransport. Defaults to network transport.
+        :param kwargs: 'base_url', to point the client at a different API host, i.e. a local mock server.
+        'realm_url', root url of the realm, used by the XML API. Defaults to https://<realm>.quickbase.com
+        'rate_limit', tuple of (requests, seconds) budget for a single user token, i.e. (100, 10)
+        'timeout', default timeout of requests, seconds or tuple of (connect, read) seconds. Defaults to the
+        transport's timeout.  Most methods also accept timeout and deadline kwargs per call.
+        'hedge', True or a HedgePolicy, to hedge idempotent reads (queries, fields, tables and file downloads)
+        that are slower than usual with a duplicate request.  Hedges are charged against the rate budget.
         """
         self.realm = realm
         self.auth = auth
+        if isinstance(auth, AuthProvider):
+            self.auth_provider = auth
+        elif isinstance(auth, (list, tuple)):
+            self.auth_provider = UserTokenPool(list(auth), *kwargs.get('rate_limit', (100, 10.0)))
+        else:
+            limiter = RateLimiter(*kwargs['rate_limit']) if kwargs.get('rate_limit') else None
+            self.auth_provider = UserTokenAuth(auth, rate_limiter=limiter)
         self.headers = {
             'QB-Realm-Hostname': f'{self.realm}.quickbase.com',
-            'User-Agent': agent,
-            'Authorization': f'QB-USER-TOKEN {auth}'
+            'User-Agent': agent or f'python-qjac/{get_version()}'
         }
+        if isinstance(auth, str):
+            self.headers['Authorization'] = f'QB-USER-TOKEN {auth}'
         self.debug = debug
+        self.transport = transport if transport is not None else Transport()
+        self.base_url = kwargs.get('base_url', API_URL).rstrip('/')
+        self.realm_url = kwargs.get('realm_url', f'https://{self.realm}.quickbase.com').rstrip('/')
+        self.timeout = kwargs.get('timeout', self.transport.timeout if hasattr(self.transport, 'timeout') else None)
+        self.hedge = kwargs.get('hedge', None)
+        if self.hedge is True:
+            from quickbase_json.hedging import HedgePolicy
+            self.hedge = HedgePolicy()
+        # field metadata per table, see table_fields()
+        self.fields_cache = {}
+
+    def _request(self, method: str, url: str, **kwargs):
+        """
+        Sends a request through the client's transport.
+        :param method: http method
+        :param url: url to send the request to
+        :param kwargs: keyword arguments passed to the transport. 'timeout' overrides the client's timeout,
+        'deadline' (Deadline or seconds) caps the timeout to the time remaining.
+        'hedge', set by idempotent reads, which are hedged if the client has a HedgePolicy.
+        'xml_body', callable(tag, credential) building the body of an XML API request for each attempt, with the
+        credential matching the attempt's authorization.
+        'retry', False to send the request once, i.e. a body read from a stream that can not be rewound.
+        :return: response object
+        """
+        if kwargs.pop('hedge', False) and self.hedge is not None and not kwargs.get('stream'):
+            return self._hedged_request(method, url, **kwargs)
+
+        headers = dict(kwargs.pop('headers', None) or self.headers)
+        timeout = kwargs.pop('timeout', self.timeout)
+        deadline = Deadline.of(kwargs.pop('deadline', None))
+        xml_body = kwargs.pop('xml_body', None)
+
+        # streamed bodies can only be sent once
+        data = kwargs.get('data')
+        retries = self.auth_provider.retries if data is None or isinstance(data, (str, bytes, dict)) else 0
+        if not kwargs.pop('retry', True):
+            retries = 0
+
+        for attempt in range(retries + 1):
+            if deadline is None:
+                authorization = self.auth_provider.authorization()
+            else:
+                # waiting for rate budget counts against the deadline too
+                try:
+                    authorization = self.auth_provider.authorization(timeout=deadline.timeout())
+                except TimeoutError as e:
+                    raise DeadlineExceeded(f'Deadline of {deadline.seconds}s exceeded ({e})') from e
+            headers['Authorization'] = authorization
+            if xml_body is not None:
+                kwargs['data'] = xml_body(*self.auth_provider.xml_credential_of(authorization))
+            try:
+                request_timeout = deadline.timeout(timeout) if deadline is not None else timeout
+                r = self.transport.request(method, url, headers=headers, timeout=request_timeout, **kwargs)
+            except Exception as e:
+                self.auth_provider.release(authorization, None)
+                if isinstance(e, DeadlineExceeded):
+                    raise
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded(f'Deadline of {deadline.seconds}s exceeded ({e})') from e
+                raise
+            self.auth_provider.release(authorization, r)
+            if r.status_code != 429 or attempt == retries or not self.auth_provider.can_retry():
+                break
+            if self.debug:
+                print(f'QJAC : _request : throttled ---> {url} (attempt {attempt + 1} of {retries + 1})')
+        return r
+
+    @staticmethod
+    def _timeouts(timeout: any, deadline: any) -> dict:
+        """Request kwargs of a per-call timeout and deadline, None keeps the client's defaults."""
+        return {k: v for k, v in (('timeout', timeout), ('deadline', deadline)) if v is not None}
+
+    def _retry_throttled(self, send: callable, retries: int = 5, deadline: Deadline = None):
+        """
+        Sends a request, backing off and retrying while it is throttled (429), for its Retry-After or exponentially.
+        Requests are retried even if the auth provider has no rate budget or other tokens to retry with.
+        :param send: callable sending the request, returning the response
+        :param retries: times a throttled request is retried
+        :param deadline: Deadline, DeadlineExceeded is raised rather than waiting past it
+        :return: response object
+        """
+        for attempt in range(retries + 1):
+            r = send()
+            if r.status_code != 429 or attempt == retries:
+                return r
+            try:
+                wait = float(r.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                wait = min(2 ** attempt, 30)
+            if deadline is not None and wait >= deadline.remaining():
+                raise DeadlineExceeded(f'Deadline of {deadline.seconds}s exceeded while throttled')
+            if self.debug:
+                print(f'QJAC : _retry_throttled : throttled, retrying in ---> {wait}s')
+            time.sleep(wait)
+
+    def _hedged_request(self, method: str, url: str, **kwargs):
+        """
+        Sends a request, and a duplicate if it is slower than the hedge policy's delay for its route.
+        The first to complete is returned, the other is closed when it completes.
+        Both go through _request(), so both are charged against the rate budget.
+        """
+        policy = self.hedge
+        route = policy.route(method, url)
+        policy.start()
+
+        def send() -> Future:
+            future = Future()
+
+            def run():
+                started = time.monotonic()
+                try:
+                    r = self._request(method, url, **kwargs)
+                except Exception as e:
+                    future.set_exception(e)
+                    return
+                policy.observe(route, time.monotonic() - started)
+                future.set_result(r)
+
+            threading.Thread(target=run, daemon=True).start()
+            return future
+
+        futures = [send()]
+        done, _ = wait(futures, timeout=policy.delay(route))
+        if not done and policy.try_hedge():
+            if self.debug:
+                print(f'QJAC : _hedged_request : hedging ---> {route}')
+            futures.append(send())
+
+        pending = set(futures)
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in futures if f in done and f.exception() is None), None)
+
+        def discard(future):
+            if future.exception() is None:
+                future.result().close()
+
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(discard)
+        if winner is None:
+            # every request failed, raise the first error
+            raise futures[0].exception()
+        if winner is not futures[0]:
+            policy.won()
+        return winner.result()
 
     """
     Records API
@@ -62,12 +272,43 @@ class QuickbaseJSONClient:
                 'select': select,
                 'where': where}
 
+        r = self._query_request(table, select, where, **kwargs)
+
+        if self.debug:
+            print(f'QJAC : query_records : response ---> {r}')
+            print(f'QJAC : query_records : response.json() ---> \n{r.json()}')
+
+        # create response object
+        res = QBQueryResponse(res=r)
+
+        # update response object with JSON data from request
+        res.update(r.json())
+
+        if self.debug:
+            print(f'QJAC : query_records : QBResponse ---> \n{res}')
+
+        return res
+
+    def _query_request(self, table: str, select: list, where: any, **kwargs):
+        """
+        Sends a query request, returning the raw response (undecoded).
+        :param table: quickbase table
+        :param select: list, list of fids to query
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param kwargs: optional request parameters.
+        :return: response object
+        """
+        if isinstance(where, Where):
+            where = where.build()
+
         if table == '':
             raise ValueError('Table cannot be blank')
 
         if not select:
             raise ValueError('Selection must contain at least one <int>')
 
+        timeout = self._timeouts(kwargs.pop('timeout', None), kwargs.pop('deadline', None))
+
         # create request body
         body = {
             'from': table,
@@ -76,24 +317,63 @@ class QuickbaseJSONClient:
         # update with keyword args
         body.update(kwargs)
 
-        # add optional args
-        body.update(kwargs)
-        r = requests.post('https://api.quickbase.com/v1/records/query', headers=self.headers, json=body)
-
-        if self.debug:
-            print(f'QJAC : query_records : response ---> {r}')
-            print(f'QJAC : query_records : response.json() ---> \n{r.json()}')
-
-        # create response object
-        res = QBQueryResponse(res=r)
+        return self._request('POST', f'{self.base_url}/records/query', json=body, hedge=True, **timeout)
 
-        # update response object with JSON data from request
-        res.update(r.json())
+    def paginate_query(self, table: str, select: list, where: any, **kwargs) -> QueryPaginator:
+        """
+        Iterates over every page of a query, using skip/top pagination.
+        https://developer.quickbase.com/operation/runQuery
+        :param table: quickbase table
+        :param select: list, list of fids to query
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param kwargs: see QueryPaginator, i.e. top, processes, transforms. Other kwargs are request parameters.
+        :return: QueryPaginator, iterate over it for QBQueryResponse pages
+        """
+        return QueryPaginator(self, table, select, where, **kwargs)
 
-        if self.debug:
-            print(f'QJAC : query_records : QBResponse ---> \n{res}')
+    def aggregate_records(self, table: str, where: any, group_by: any, aggregates: list, **kwargs) -> QBQueryResponse:
+        """
+        Aggregates query results page by page, keeping only running totals per group in memory.
+        :param table: quickbase table
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param group_by: list of fids, or Group, i.e. [6]
+        :param aggregates: list of (fid, aggregate) or (fid, aggregate, name), i.e. [(7, 'sum'), (8, 'distinct')]
+        :param kwargs: 'distinct_limit' and 'precision', see Aggregator.  Any other kwargs are passed to
+        paginate_query(), i.e. top, prefetch, adaptive
+        :return: QBQueryResponse with a record per group
+        """
+        from quickbase_json.aggregate import Aggregator
+        aggregator = Aggregator(group_by, aggregates, distinct_limit=kwargs.pop('distinct_limit', 10000),
+                                precision=kwargs.pop('precision', 12))
+        select = []
+        for fid in aggregator.group_by + [spec[0] for spec in aggregator.aggregates]:
+            if int(fid) not in select:
+                select.append(int(fid))
+        for page in self.paginate_query(table, select, where, **kwargs):
+            aggregator.extend(page.get('data') or [])
+        return aggregator.result()
+
+    def shard_query(self, table: str, select: list, where: any, **kwargs) -> ShardedQuery:
+        """
+        Queries for record data in parallel, split into record id ranges.
+        :param table: quickbase table
+        :param select: list, list of fids to query
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param kwargs: ShardedQuery options, i.e. shards, max_workers, ordered
+        :return: ShardedQuery, iterate over it for pages or use all() for a single response
+        """
+        return ShardedQuery(self, table, select, where, **kwargs)
 
-        return res
+    def query_all_records(self, table: str, select: list, where: any, **kwargs) -> QBQueryResponse:
+        """
+        Queries for all records matching a query, following pagination.
+        :param table: quickbase table
+        :param select: list, list of fids to query
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param kwargs: see QueryPaginator
+        :return: QBQueryResponse of all records
+        """
+        return self.paginate_query(table, select, where, **kwargs).all()
 
     def cache_query(self, table: str, select: list, where: any, hours: float, **kwargs):
         """
@@ -131,6 +411,7 @@ class QuickbaseJSONClient:
             # query is not cached or expired, run query and cache it
             res = self.query_records(table, select, where, **kwargs)
             data = {
+                'table': table,
                 'last_updated': datetime.datetime.now().timestamp(),
                 'hours': hours,
                 'response': res.data()
@@ -138,44 +419,190 @@ class QuickbaseJSONClient:
             open(f'{QUERY_CACHE}/{h}.json', 'w').write(json.dumps(data))
             return res
 
-    def insert_update_records(self, table: str, data: list, legacy: bool = False):
+    def clear_query_cache(self, table: str = None) -> int:
+        """
+        Removes queries cached by cache_query().
+        :param table: only remove queries of this table.  Queries cached before tables were recorded are always removed.
+        :return: number of cached queries removed
+        """
+        if not os.path.exists(QUERY_CACHE):
+            return 0
+        removed = 0
+        for name in os.listdir(QUERY_CACHE):
+            path = os.path.join(QUERY_CACHE, name)
+            if table is not None:
+                try:
+                    with open(path, 'r') as f:
+                        cached_table = json.load(f).get('table')
+                except (OSError, ValueError):
+                    cached_table = None
+                if cached_table not in (table, None):
+                    continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+        if self.debug:
+            print(f'QJAC : clear_query_cache : removed ---> {removed}')
+
+        return removed
+
+    def insert_update_records(self, table: str, data: list, legacy: bool = False, **kwargs):
         """
         Inerts or updates records in a given table.
         https://developer.quickbase.com/operation/upsert
         :param table: table to add records to
         :param data: list of dict of data, [{"6": {"value": 'example'}}] (do not include 3, record id to insert)
         :param legacy: if true, will use legacy insert/update method
+        :param kwargs: optional request parameters, i.e. mergeFieldId, fieldsToReturn
         :return: record id of created/updated records
         """
 
-        def fix_null_values(json_data):
-            """Remove any fields with a null value."""
-            for record in json_data:
-                for key, value in list(record.items()):
-                    if value.get('value', None) is None:
-                        del record[key]
-            return json_data
-
+        timeout = self._timeouts(kwargs.pop('timeout', None), kwargs.pop('deadline', None))
         body = {
             'to': table,
-            'data': data if legacy else fix_null_values(data)
+            'data': data if legacy else [drop_null_values(record) for record in data]
         }
+        body.update(kwargs)
 
         if self.debug:
             print(f'QJAC : insert_update : body ---> \n{body}')
 
-        r = requests.post('https://api.quickbase.com/v1/records', headers=self.headers, json=body)
+        r = self._request('POST', f'{self.base_url}/records', json=body, **timeout)
 
         res = QBInsertResponse().from_response(response=r)
 
         return res
 
-    def delete_records(self, table: str, where: str):
+    def insert_update_records_diff(self, table: str, data: list, state: 'UpsertState', **kwargs):
+        """
+        Inserts or updates records, sending only records and fields that differ from a known state.
+        Unchanged records are dropped, changed records are sent as their merge field and changed fields only.
+        The state is updated with what was written.
+        https://developer.quickbase.com/operation/upsert
+        :param table: table to add records to
+        :param data: list of dict of data, [{"6": {"value": 'example'}}]
+        :param state: UpsertState, i.e. UpsertState.from_response(client.query_records(...), merge_fid=6)
+        :param kwargs: optional request parameters, i.e. fieldsToReturn
+        :return: QBInsertResponse, skipped is the number of unchanged records not sent
+        """
+        merge_fid = int(state.merge_fid)
+        records, changes = [], []
+        for record in data:
+            record = drop_null_values(record)
+            change = state.diff(record)
+            if change is not None:
+                records.append(record)
+                changes.append(change)
+
+        if self.debug:
+            print(f'QJAC : insert_update_records_diff : sending ---> {len(changes)} of {len(data)} records')
+
+        if not changes:
+            res = QBInsertResponse()
+            res.ok, res.status_code = True, 200
+            res.update({'data': [], 'metadata': {
+                'createdRecordIds': [], 'updatedRecordIds': [], 'unchangedRecordIds': [],
+                'totalNumberOfRecordsProcessed': 0}})
+            res.skipped = len(data)
+            return res
+
+        fields = list(kwargs.pop('fieldsToReturn', None) or [])
+        kwargs['fieldsToReturn'] = fields if merge_fid in fields else [merge_fid] + fields
+        if merge_fid != 3:
+            kwargs['mergeFieldId'] = merge_fid
+        res = self.insert_update_records(table, changes, **kwargs)
+        res.skipped = len(data) - len(changes)
+
+        if res.ok:
+            # lineErrors are keyed by 1-based line, data holds a row for every other line, in order
+            line_errors = res.get('metadata', {}).get('lineErrors') or {}
+            rows = iter(res.get('data') or [])
+            for line, record in enumerate(records, start=1):
+                if str(line) not in line_errors:
+                    row = next(rows, None) or {}
+                    state.update(record, key=row.get(str(merge_fid)))
+        return res
+
+    def insert_update_records_stream(self, table: str, records: any, chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs):
+        """
+        Inserts or updates records, streaming the request body to quickbase in chunks.
+        Accepts any iterable or generator of records, which is consumed once and never mutated.
+        https://developer.quickbase.com/operation/upsert
+        :param table: table to add records to
+        :param records: iterable of dict of data, [{"6": {"value": 'example'}}]
+        :param chunk_size: size in bytes of each chunk sent to quickbase
+        :param kwargs: optional request parameters, i.e. mergeFieldId, fieldsToReturn.  'timeout' and 'deadline'
+        (Deadline or seconds) of the request.
+        :return: QBInsertResponse
+        """
+
+        timeout = self._timeouts(kwargs.pop('timeout', None), kwargs.pop('deadline', None))
+        headers = dict(self.headers, **{'Content-Type': 'application/json'})
+        body = iter_upsert_body(table, records, chunk_size=chunk_size, **kwargs)
+
+        if self.debug:
+            print(f'QJAC : insert_update_records_stream : table ---> {table} (chunk size: {chunk_size})')
+
+        r = self._request('POST', f'{self.base_url}/records', headers=headers, data=body, **timeout)
+
+        return QBInsertResponse().from_response(response=r)
+
+    def insert_update_rows(self, table: str, rows: any, columns: list = None, **kwargs):
+        """
+        Inserts or updates plain records, encoded with a RecordEncoder compiled from the table's fields.
+        https://developer.quickbase.com/operation/upsert
+        :param table: table to add records to
+        :param rows: iterable of dicts keyed by fid or label, i.e. [{'Name': 'example', 7: Decimal('1.50')}],
+        or of tuples in the order of columns.  Python dates, datetimes, times, timedeltas, Decimals and bools
+        are converted for the field's type, nulls are skipped.
+        :param columns: fids or labels, in the order of values in tuple rows, i.e. [6, 'Amount']
+        :param kwargs: optional request parameters, i.e. mergeFieldId, fieldsToReturn
+        :return: QBInsertResponse
+        """
+        timeout = self._timeouts(kwargs.pop('timeout', None), kwargs.pop('deadline', None))
+        encoder = self.record_encoder(table, columns)
+        body = encoder.body(table, rows, **kwargs)
+        headers = dict(self.headers, **{'Content-Type': 'application/json'})
+
+        if self.debug:
+            print(f'QJAC : insert_update_rows : body ---> {len(body)} bytes')
+
+        r = self._request('POST', f'{self.base_url}/records', headers=headers, data=body, **timeout)
+
+        return QBInsertResponse().from_response(response=r)
+
+    def record_encoder(self, table: str, columns: list = None, refresh: bool = False) -> 'RecordEncoder':
+        """
+        Compiles a RecordEncoder for a table, from its cached fields.
+        :param table: table id
+        :param columns: fids or labels, in the order of values in tuple records
+        :param refresh: fetch the table's fields again
+        :return: RecordEncoder
+        """
+        from quickbase_json.encoder import RecordEncoder
+        return RecordEncoder(self.table_fields(table, refresh=refresh), columns)
+
+    def buffered_writer(self, table: str, **kwargs) -> 'BufferedWriter':
+        """
+        Creates a write-behind buffer that batches single record upserts into a table.
+        :param table: table to add records to
+        :param kwargs: BufferedWriter options, i.e. max_records, max_bytes, interval, mergeFieldId
+        :return: BufferedWriter
+        """
+        from quickbase_json.buffered_writer import BufferedWriter
+        return BufferedWriter(self, table, **kwargs)
+
+    def delete_records(self, table: str, where: str, timeout: any = None, deadline: any = None):
         """
         Deletes records in a table based on a query.
         https://developer.quickbase.com/operation/deleteRecords
         :param table: The unique identifier of the table.
         :param where: The filter to delete records. To delete all records specify a filter that will include all records.
+        :param timeout: timeout of the request, defaults to the client's
+        :param deadline: Deadline or seconds, caps the timeout to the time remaining
         :return: dict, numberDeleted is number of records deleted.
         :
         """
@@ -188,7 +615,57 @@ class QuickbaseJSONClient:
         if self.debug:
             print(f'QJAC : delete_records : body ---> \n{body}')
 
-        return requests.delete('https://api.quickbase.com/v1/records', headers=headers, json=body).json()
+        return self._request('DELETE', f'{self.base_url}/records', headers=headers, json=body,
+                             **self._timeouts(timeout, deadline)).json()
+
+    def delete_records_by_ids(self, table: str, rids: list, key_fid: int = 3, max_workers: int = 4,
+                              max_length: int = MAX_QUERY_LENGTH, retries: int = 5, **kwargs) -> 'QBDeleteResponse':
+        """
+        Deletes a list of records, split into chunks of queries deleted in parallel.
+        Consecutive record ids are collapsed into ranges, so large contiguous deletes need few requests.
+        Values of any other key_fid are matched one by one.
+        Requests are made through the client's auth provider, so chunks wait for its rate budget (if it has one,
+        i.e. rate_limit=(100, 10)).  Throttled (429) chunks back off for their Retry-After and are retried.
+        :param table: The unique identifier of the table.
+        :param rids: list of record ids (or values of key_fid) to delete
+        :param key_fid: fid matched against rids, defaults to record id
+        :param max_workers: number of chunks deleted at the same time
+        :param max_length: max length of each chunk's query
+        :param retries: times a throttled chunk is retried
+        :param kwargs: 'timeout' of each request, 'deadline' (Deadline or seconds) of the whole delete.
+        Chunks not sent before the deadline are left, and the response is marked partial.
+        :return: QBDeleteResponse, numberDeleted is the total of every chunk, failed chunks are in failures
+        """
+        from quickbase_json.qb_delete_response import QBDeleteResponse
+        res = QBDeleteResponse()
+        queries = chunk_query_values(key_fid, list(rids), max_length=max_length, ranges=str(key_fid) == '3')
+        deadline = Deadline.of(kwargs.get('deadline'))
+        timeout = self._timeouts(kwargs.get('timeout'), deadline)
+
+        def delete(where):
+            if self.debug:
+                print(f'QJAC : delete_records_by_ids : where ---> \n{where}')
+            return self._retry_throttled(
+                lambda: self._request('DELETE', f'{self.base_url}/records', headers=self.headers,
+                                      json={'from': table, 'where': where}, **timeout),
+                retries, deadline)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = {pool.submit(delete, where): where for where in queries}
+            for future in as_completed(futures):
+                try:
+                    r = future.result()
+                except DeadlineExceeded as e:
+                    res.partial = True
+                    r = e
+                except Exception as e:
+                    r = e
+                res.add_chunk(futures[future], r)
+
+        if not queries:
+            res.ok, res.status_code = True, 200
+            res.update({'numberDeleted': 0, 'failures': []})
+        return res
 
     """
     Easy Upload
@@ -220,12 +697,14 @@ class QuickbaseJSONClient:
     Table API
     """
 
-    def create_table(self, app_id: str, name: str, **kwargs):
+    def create_table(self, app_id: str, name: str, timeout: any = None, deadline: any = None, **kwargs):
         """
         Creates a table in an application.
         https://developer.quickbase.com/operation/createTable
         :param app_id: The unique identifier of an app
         :param name: name of table
+        :param timeout: timeout of the request, defaults to the client's
+        :param deadline: Deadline or seconds, caps the timeout to the time remaining
         :param kwargs: optional args
         :return:
         """
@@ -234,40 +713,46 @@ class QuickbaseJSONClient:
         params = {
             'appId': f'{app_id}'}
         body = {
-            'name': name}.update(kwargs)
+            'name': name}
+        body.update(kwargs)
 
         if self.debug:
             print(f'QJAC : create_table : body ---> \n{body}')
 
-        return requests.post('https://api.quickbase.com/v1/tables', params=params, headers=headers, json=body).json()
+        return self._request('POST', f'{self.base_url}/tables', params=params, headers=headers, json=body,
+                             **self._timeouts(timeout, deadline)).json()
 
-    def get_tables(self, app_id: str):
+    def get_tables(self, app_id: str, timeout: any = None, deadline: any = None):
         """
         Gets all tables in an application
         https://developer.quickbase.com/operation/getAppTables
         :param app_id: The unique identifier of an app.
+        :param timeout: timeout of the request, defaults to the client's
+        :param deadline: Deadline or seconds, caps the timeout to the time remaining
         :return: dict of all tables in application.
         """
 
         headers = self.headers
         params = {
             'appId': f'{app_id}'}
-        body = None
 
         if self.debug:
             print(f'QJAC : get_tables : params ---> \n{params}')
 
-        return requests.post('https://api.quickbase.com/v1/tables', params=params, headers=headers, json=body).json()
+        return self._request('GET', f'{self.base_url}/tables', params=params, headers=headers, hedge=True,
+                             **self._timeouts(timeout, deadline)).json()
 
     """
     Fields API
     """
 
-    def get_fields(self, table_id: str, **kwargs):
+    def get_fields(self, table_id: str, timeout: any = None, deadline: any = None, **kwargs):
         """
         Get fields for a given table.
         https://developer.quickbase.com/operation/getFields
         :param table_id: Id of quickbase table
+        :param timeout: timeout of the request, defaults to the client's
+        :param deadline: Deadline or seconds, caps the timeout to the time remaining
         :param kwargs: optional args
         :return:
         """
@@ -275,30 +760,152 @@ class QuickbaseJSONClient:
         headers = self.headers
         params = {
             'tableId': f'{table_id}'}
-        return requests.get('https://api.quickbase.com/v1/fields', params=params, headers=headers).json()
+        return self._request('GET', f'{self.base_url}/fields', params=params, headers=headers, hedge=True,
+                             **self._timeouts(timeout, deadline)).json()
+
+    def table_fields(self, table_id: str, refresh: bool = False) -> list:
+        """
+        Gets fields for a given table, cached after the first request.
+        :param table_id: Id of quickbase table
+        :param refresh: fetch the fields again
+        :return: list of field dicts
+        """
+        fields = self.fields_cache.get(table_id)
+        if fields is None or refresh:
+            fields = self.get_fields(table_id)
+            if not isinstance(fields, list):
+                raise ConnectionError(f'Could not get fields of {table_id}: {fields.get("message")}')
+            self.fields_cache[table_id] = fields
+        return fields
 
     """
     Operations
     """
 
-    def download_file(self, table: str, rid: int, fid: int, version: int):
-        url = f'https://api.quickbase.com/v1/files/{table}/{rid}/{fid}/{version}'
-        r = requests.get(url=url, headers=self.headers)
+    def download_file(self, table: str, rid: int, fid: int, version: int, timeout: any = None, deadline: any = None):
+        url = f'{self.base_url}/files/{table}/{rid}/{fid}/{version}'
+        r = self._request('GET', url, hedge=True, **self._timeouts(timeout, deadline))
         if r.ok and r.status_code == 200:
             return QBFile(content=r.text)
         else:
             raise ConnectionError(f'{r.status_code}: {r.text} (This can sometimes happen with a bad file version)')
 
+    def download_file_to(self, table: str, rid: int, fid: int, version: int, dest: any,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE, resume: bool = False, algorithm: str = 'sha256',
+                         timeout: any = None, deadline: any = None):
+        """
+        Downloads a file, decoding the base64 response in chunks and writing straight to disk.
+        When dest is a path, the file is written to "<dest>.part" and renamed once complete.
+        :param table: table of file
+        :param rid: record id
+        :param fid: field id
+        :param version: file version
+        :param dest: path to save to, or a writable binary file-like object
+        :param chunk_size: size of chunks read from the response
+        :param resume: if a partial "<dest>.part" file exists, continue downloading from where it stopped
+        :param algorithm: hashlib algorithm used for the checksum computed while downloading
+        :param timeout: timeout of the request, defaults to the client's
+        :param deadline: Deadline or seconds, caps the timeout to the time remaining
+        :return: DownloadResult
+        """
+        url = f'{self.base_url}/files/{table}/{rid}/{fid}/{version}'
+        hasher = hashlib.new(algorithm)
+        headers = dict(self.headers)
+        offset = 0
+
+        part_path = None
+        if isinstance(dest, (str, os.PathLike)):
+            part_path = f'{dest}.part'
+            if resume and os.path.exists(part_path):
+                # resume on a whole base64 quantum, 3 decoded bytes per 4 encoded characters
+                offset = os.path.getsize(part_path) // 3 * 3
+                with open(part_path, 'rb') as f:
+                    remaining = offset
+                    while remaining:
+                        block = f.read(min(chunk_size, remaining))
+                        hasher.update(block)
+                        remaining -= len(block)
+                headers['Range'] = f'bytes={offset // 3 * 4}-'
+
+        r = self._request('GET', url, headers=headers, stream=True, **self._timeouts(timeout, deadline))
+        if not r.ok:
+            raise ConnectionError(f'{r.status_code}: {r.text} (This can sometimes happen with a bad file version)')
+
+        if offset and r.status_code != 206:
+            # range was ignored, start over
+            offset = 0
+            hasher = hashlib.new(algorithm)
+
+        if self.debug:
+            print(f'QJAC : download_file_to : {url} ---> {dest} (resuming from: {offset})')
+
+        try:
+            if part_path is not None:
+                with open(part_path, 'r+b' if offset else 'wb') as f:
+                    f.truncate(offset)
+                    f.seek(offset)
+                    size = write_base64_stream(r, f, hasher, chunk_size=chunk_size)
+                os.replace(part_path, dest)
+            else:
+                size = write_base64_stream(r, dest, hasher, chunk_size=chunk_size)
+        finally:
+            r.close()
+
+        return DownloadResult(
+            name=file_name_from_headers(r.headers),
+            size=offset + size,
+            checksum=hasher.hexdigest(),
+            algorithm=algorithm,
+            path=str(dest) if part_path is not None else None,
+            resumed_from=offset)
+
+    def fetch_files(self, items: list, cache: 'FileCache' = None, max_workers: int = 8):
+        """
+        Fetches many file attachments concurrently into a content-addressed local cache.
+        Files already cached for the same (table, rid, fid, version) are never downloaded again.
+        :param items: list of (table, rid, fid, version) tuples
+        :param cache: FileCache to use, defaults to FileCache() in the working directory
+        :param max_workers: max number of concurrent downloads
+        :return: generator of FileFetchResult, yielded as files complete
+        """
+        from quickbase_json.file_cache import FileCache, FileFetchResult
+        cache = cache if cache is not None else FileCache()
+
+        def fetch(item):
+            table, rid, fid, version = item
+            entry = cache.get(table, rid, fid, version)
+            if entry is not None:
+                return FileFetchResult(item, entry=entry, cached=True)
+            temp_path = cache.temp_path()
+            try:
+                result = self.download_file_to(table, rid, fid, version, temp_path)
+            except Exception as e:
+                if os.path.exists(f'{temp_path}.part'):
+                    os.remove(f'{temp_path}.part')
+                return FileFetchResult(item, error=e)
+            entry = cache.put(table, rid, fid, version, temp_path, result.checksum, name=result.name)
+            return FileFetchResult(item, entry=entry)
+
+        # de-duplicate requests for the same file
+        unique = list(dict.fromkeys(tuple(i) for i in items))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch, item) for item in unique]
+            for future in as_completed(futures):
+                yield future.result()
+
     """
     Misc.
     """
 
-    def get_choices(self, table: str, fid: int):
+    def get_choices(self, table: str, fid: int, timeout: any = None, deadline: any = None):
         """
         Get choices for a given multiple choice field
         https://developer.quickbase.com/operation/getField
         :param table: table id
         :param fid: fid of field to get choices from
+        :param timeout: timeout of the request, defaults to the client's
+        :param deadline: Deadline or seconds, caps the timeout to the time remaining
         :return: list of choices from multiple choice field
         """
 
@@ -306,14 +913,14 @@ class QuickbaseJSONClient:
         params = {
             'tableId': f'{table}',
             'fieldId': f'{fid}'}
-        fetch_url = "https://api.quickbase.com/v1/fields/" + str(fid) + "?tableId=" + table + "&includeFieldPerms=False"
-        r = requests.get(fetch_url, headers=headers).json()
+        fetch_url = f"{self.base_url}/fields/" + str(fid) + "?tableId=" + table + "&includeFieldPerms=False"
+        r = self._request('GET', fetch_url, headers=headers, **self._timeouts(timeout, deadline)).json()
         if not 'message' in r:
             return r['properties']['choices']
         else:
             raise ConnectionError(f'{r["message"]}: {r["description"]}')
 
-    def multi_query_records(self, table: str, search_field: int, select: list, search_list: list):
+    def multi_query_records(self, table: str, search_field: int, select: list, search_list: list, **kwargs):
         """
         Queries for record data.
         https://developer.quickbase.com/operation/runQuery
@@ -321,8 +928,13 @@ class QuickbaseJSONClient:
         :param search_field: int, fid of field to search
         :param select: list, list of FIDs to return for found records
         :param search_list: list of values to search for
-        :return: json data of records {data: ..., fields: ...}
+        :param kwargs: 'timeout' of each request, 'deadline' (Deadline or seconds) of the whole search.
+        Searches not run before the deadline are skipped, and the response is marked partial.
+        :return: QBQueryResponse of records {data: ..., fields: ...}
         """
+        deadline = Deadline.of(kwargs.get('deadline'))
+        timeout = self._timeouts(kwargs.get('timeout'), deadline)
+        partial = False
         response_for_return = {
             'data': [],
             'fields': [],
@@ -334,7 +946,11 @@ class QuickbaseJSONClient:
         list_of_searches = split_list_into_chunks(array=search_list, chunk_size=100)
         for list_of_100 in list_of_searches:
             query = Where(fid=search_field, operator='EX', value=list_of_100).build(join='OR')
-            r = self.query_records(table=table, select=select, where=query)
+            try:
+                r = self.query_records(table=table, select=select, where=query, **timeout)
+            except DeadlineExceeded:
+                partial = True
+                break
             if r.ok and r.status_code == 200:
                 response_for_return['data'].extend(r['data'])
                 response_for_return['fields'] = r['fields']
@@ -344,12 +960,15 @@ class QuickbaseJSONClient:
                 response_for_return['metadata']['totalRecords'] += r['metadata']['totalRecords']
             else:
                 raise ConnectionError(f'{r.status_code}: {r.text}')
-        return response_for_return
+
+        res = QBQueryResponse(sample_data=response_for_return)
+        res.ok, res.status_code, res.partial = True, 200, partial
+        return res
 
     def __str__(self):
         """
         Shows a string representation of a QuickbaseJSONClient.
         :return: client's realm and last 5 of auth
         """
-        auth_str = ''.join(['*' for _ in range(len(list(self.auth)))] + list(self.auth)[-5:])
+        auth_str = self.auth_provider.masked()
         return f'Quickbase Client\t--->\t{self.realm} : {auth_str} (DEBUG: {self.debug})'
@@ -0,0 +1,59 @@
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Deadline:
+    """
+    Overall time budget of an operation made of many requests, i.e. paging through a query.
+    Every request's timeout is capped to the time remaining, and no request is sent once it has expired.
+    """
+
+    def __init__(self, seconds: float):
+        """
+        Initializes the deadline.
+        :param seconds: seconds from now until the deadline
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def of(cls, deadline: any):
+        """
+        Converts seconds to a Deadline, Deadline and None are returned as is.
+        :param deadline: None, Deadline, or seconds from now
+        :return: Deadline or None
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self) -> float:
+        """
+        Seconds left until the deadline.
+        :return: float
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, timeout: any = None) -> any:
+        """
+        Caps a request timeout to the time remaining.
+        :param timeout: None, seconds, or tuple of (connect, read) seconds
+        :return: capped timeout
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'Deadline of {self.seconds}s exceeded')
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
@@ -0,0 +1,186 @@
+import datetime
+import json
+import math
+from decimal import Decimal
+
+from quickbase_json.streaming import DEFAULT_CHUNK_SIZE, iter_upsert_body
+
+_dumps = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def _text(value: any) -> str:
+    return _dumps(value if type(value) is str else str(value))
+
+
+def _number(value: any) -> str:
+    if type(value) is int:
+        return str(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+        raise ValueError(f'{value!r} is not a number')
+    if isinstance(value, int):
+        return str(int(value))
+    if not math.isfinite(value):
+        raise ValueError(f'{value} is not a valid number')
+    # str() of a Decimal is exact and valid JSON, i.e. 12.30
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _checkbox(value: any) -> str:
+    if value is True or value is False or value in (0, 1):
+        return 'true' if value else 'false'
+    raise ValueError(f'{value!r} is not a checkbox value')
+
+
+def _date(value: any) -> str:
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return f'"{value.isoformat()}"'
+    return _text(value)
+
+
+def _timestamp(value: any) -> str:
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            return f'"{value.isoformat(timespec="milliseconds")}Z"'
+        # naive datetimes are sent as is, quickbase reads them in the app's time zone
+        return f'"{value.isoformat(timespec="milliseconds")}"'
+    if isinstance(value, datetime.date):
+        return f'"{value.isoformat()}"'
+    return _text(value)
+
+
+def _time(value: any) -> str:
+    if isinstance(value, datetime.time):
+        return f'"{value.replace(tzinfo=None).isoformat(timespec="milliseconds")}"'
+    return _text(value)
+
+
+def _duration(value: any) -> str:
+    # durations are sent in milliseconds
+    if isinstance(value, datetime.timedelta):
+        return str(round(value.total_seconds() * 1000))
+    return _number(value)
+
+
+def _multitext(value: any) -> str:
+    if isinstance(value, str):
+        return _dumps([value])
+    return _dumps([v if type(v) is str else str(v) for v in value])
+
+
+def _json(value: any) -> str:
+    return _dumps(value)
+
+
+SERIALIZERS = {
+    'text': _text,
+    'text-multi-line': _text,
+    'text-multiple-choice': _text,
+    'rich-text': _text,
+    'email': _text,
+    'url': _text,
+    'phone': _text,
+    'numeric': _number,
+    'currency': _number,
+    'percent': _number,
+    'rating': _number,
+    'recordid': _number,
+    'checkbox': _checkbox,
+    'date': _date,
+    'timestamp': _timestamp,
+    'timeofday': _time,
+    'duration': _duration,
+    'multitext': _multitext,
+}
+
+
+class RecordEncoder:
+    """
+    Encodes plain records into the upsert wire format, compiled from a table's field metadata.
+    Each column gets a serializer for its field type (i.e. datetime to ISO 8601, Decimal to an exact number,
+    timedelta to milliseconds), nulls are skipped and records are written straight to JSON text.
+    Fields of types without a serializer (i.e. user, file) are sent as given.
+    """
+
+    def __init__(self, fields: list, columns: list = None):
+        """
+        Compiles the encoder.
+        :param fields: field metadata, as returned by QuickbaseJSONClient.get_fields() (or query 'fields')
+        :param columns: fids or labels, in the order of values in tuple records, i.e. [6, 'Amount']
+        """
+        self.fields = {}
+        self._lookup = {}
+        for field in fields:
+            fid = int(field['id'])
+            # getFields returns 'fieldType', query metadata 'type'
+            serializer = SERIALIZERS.get(field.get('fieldType', field.get('type')), _json)
+            column = (fid, f'"{fid}":{{"value":', serializer)
+            self.fields[fid] = field
+            self._lookup[fid] = self._lookup[str(fid)] = column
+            if field.get('label') is not None:
+                self._lookup.setdefault(field['label'], column)
+        self.columns = [self._column(c) for c in columns] if columns is not None else None
+
+    def _column(self, key: any) -> tuple:
+        try:
+            return self._lookup[key]
+        except KeyError:
+            raise ValueError(f'Unknown field "{key}", fields: {sorted(self.fields)}') from None
+
+    def _cell(self, column: tuple, value: any) -> str:
+        try:
+            return column[1] + column[2](value) + '}'
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Field {column[0]}: {e}') from None
+
+    def dumps(self, record: any) -> str:
+        """
+        Encodes a record to JSON text.
+        :param record: dict keyed by fid or label, or a tuple in the order of columns
+        Values may be plain (5) or raw ({"value": 5}), nulls are skipped.
+        :return: str, i.e. '{"6":{"value":"name"},"7":{"value":5}}'
+        """
+        if isinstance(record, dict):
+            items = ((self._column(k), v) for k, v in record.items())
+        elif self.columns is not None:
+            if len(record) > len(self.columns):
+                raise ValueError(f'Record has {len(record)} values, encoder has {len(self.columns)} columns')
+            items = zip(self.columns, record)
+        else:
+            raise ValueError('Tuple records need the encoder to be compiled with columns')
+
+        cells = []
+        for column, value in items:
+            if type(value) is dict and 'value' in value:
+                value = value['value']
+            if value is not None:
+                cells.append(self._cell(column, value))
+        return '{' + ','.join(cells) + '}'
+
+    def encode(self, records: any) -> list:
+        """
+        Encodes records to the upsert wire format.
+        :param records: iterable of records, see dumps()
+        :return: list of dict, i.e. [{"6": {"value": 'name'}}]
+        """
+        return [json.loads(self.dumps(record)) for record in records]
+
+    def iter_body(self, table: str, records: any, chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs):
+        """
+        Serializes an upsert request body, yielding encoded chunks of roughly chunk_size bytes.
+        :param table: table to add records to
+        :param records: iterable of records, see dumps()
+        :param chunk_size: size in bytes of yielded chunks
+        :param kwargs: optional request parameters, i.e. mergeFieldId, fieldsToReturn
+        :return: generator of bytes
+        """
+        return iter_upsert_body(table, records, chunk_size=chunk_size, serialize=self.dumps, **kwargs)
+
+    def body(self, table: str, records: any, **kwargs) -> bytes:
+        """
+        Serializes a whole upsert request body, see iter_body().
+        :return: bytes
+        """
+        return b''.join(self.iter_body(table, records, chunk_size=float('inf'), **kwargs))
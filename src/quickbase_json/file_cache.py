@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+
+FILE_CACHE = 'file_cache'
+
+
+class CacheEntry:
+    """
+    A cached file attachment.
+    """
+
+    def __init__(self, key: str, checksum: str, name: str, size: int, path: str):
+        self.key = key
+        self.checksum = checksum
+        self.name = name
+        self.size = size
+        self.path = path
+
+    def __str__(self):
+        return f'CacheEntry: "{self.name}" ({self.key}) -> "{self.path}"'
+
+
+class FileFetchResult:
+    """
+    Result of fetching a single file with QuickbaseJSONClient.fetch_files()
+    """
+
+    def __init__(self, item: tuple, entry: CacheEntry = None, cached: bool = False, error: Exception = None):
+        self.item = item
+        self.entry = entry
+        self.cached = cached
+        self.error = error
+        self.ok = error is None
+
+    @property
+    def path(self):
+        return self.entry.path if self.entry else None
+
+    def __str__(self):
+        if not self.ok:
+            return f'FileFetchResult: {self.item} failed ({self.error})'
+        return f'FileFetchResult: {self.item} -> "{self.path}" (cached: {self.cached})'
+
+
+class FileCache:
+    """
+    Content-addressed local cache of file attachments.
+    Files are stored once per sha256 checksum under "objects/", an append-only index maps
+    (table, rid, fid, version) keys to checksums.  Version 0 (latest) is never cached, as it can change.
+    """
+
+    def __init__(self, directory: str = FILE_CACHE):
+        """
+        Opens (or creates) a file cache.
+        :param directory: cache directory
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'tmp'), exist_ok=True)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    if row.get('checksum') is None:
+                        self.entries.pop(row['key'], None)
+                    else:
+                        self.entries[row['key']] = row
+
+    @staticmethod
+    def key(table: str, rid: int, fid: int, version: int) -> str:
+        return f'{table}/{rid}/{fid}/{version}'
+
+    def object_path(self, checksum: str) -> str:
+        return os.path.join(self.directory, 'objects', checksum[:2], checksum)
+
+    def temp_path(self) -> str:
+        return os.path.join(self.directory, 'tmp', uuid.uuid4().hex)
+
+    def get(self, table: str, rid: int, fid: int, version: int):
+        """
+        Gets a cached file.
+        :return: CacheEntry, or None if the file is not cached
+        """
+        if int(version) == 0:
+            return None
+        row = self.entries.get(self.key(table, rid, fid, version))
+        if row is None:
+            return None
+        path = self.object_path(row['checksum'])
+        if not os.path.exists(path):
+            return None
+        return CacheEntry(row['key'], row['checksum'], row.get('name'), row.get('size'), path)
+
+    def put(self, table: str, rid: int, fid: int, version: int, temp_path: str, checksum: str, name: str = None):
+        """
+        Moves a downloaded file into the cache.
+        :param temp_path: path of downloaded file, it is moved (or removed if the content is already cached)
+        :param checksum: sha256 hex digest of the file
+        :param name: file name
+        :return: CacheEntry
+        """
+        path = self.object_path(checksum)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+
+        key = self.key(table, rid, fid, version)
+        row = {'key': key, 'checksum': checksum, 'name': name, 'size': os.path.getsize(path)}
+        if int(version) != 0:
+            self._append(row)
+        return CacheEntry(key, checksum, name, row['size'], path)
+
+    def invalidate(self, table: str, rid: int = None):
+        """
+        Forgets cached keys for a table, or a single record of a table.  File objects are kept, see prune().
+        :param table: table id
+        :param rid: optional record id
+        :return: number of keys removed
+        """
+        prefix = f'{table}/' if rid is None else f'{table}/{rid}/'
+        removed = 0
+        for key in [k for k in self.entries if k.startswith(prefix)]:
+            self._append({'key': key, 'checksum': None})
+            removed += 1
+        return removed
+
+    def prune(self):
+        """
+        Removes file objects no longer referenced by any key, and compacts the index.
+        Should not be called while downloads into the cache are in progress.
+        :return: number of objects removed
+        """
+        with self._lock:
+            referenced = {row['checksum'] for row in self.entries.values()}
+            removed = 0
+            objects = os.path.join(self.directory, 'objects')
+            for prefix in os.listdir(objects):
+                for checksum in os.listdir(os.path.join(objects, prefix)):
+                    if checksum not in referenced:
+                        os.remove(os.path.join(objects, prefix, checksum))
+                        removed += 1
+            tmp_index = f'{self.index_path}.tmp'
+            with open(tmp_index, 'w') as f:
+                for row in self.entries.values():
+                    f.write(json.dumps(row) + '\n')
+            os.replace(tmp_index, self.index_path)
+            shutil.rmtree(os.path.join(self.directory, 'tmp'), ignore_errors=True)
+            os.makedirs(os.path.join(self.directory, 'tmp'), exist_ok=True)
+        return removed
+
+    def _append(self, row: dict):
+        with self._lock:
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+            if row.get('checksum') is None:
+                self.entries.pop(row['key'], None)
+            else:
+                self.entries[row['key']] = row
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,96 @@
+import collections
+import re
+import threading
+import urllib.parse
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge idempotent reads: if a request has not completed within a percentile of the latency
+    observed for its route, a duplicate request is sent and whichever completes first is used.
+    Hedges are limited to a ratio of requests, so a slow server is not flooded with duplicates.
+    """
+
+    def __init__(self, percentile: float = 95, min_delay: float = 0.05, initial_delay: float = 1.0,
+                 min_samples: int = 20, window: int = 500, max_ratio: float = 0.1):
+        """
+        Initializes the policy.
+        :param percentile: percentile of observed latency to wait before hedging, i.e. 95
+        :param min_delay: shortest wait before hedging, in seconds
+        :param initial_delay: wait before hedging until min_samples latencies have been observed for a route
+        :param min_samples: latencies observed before the percentile is used
+        :param window: number of recent latencies kept per route
+        :param max_ratio: max ratio of hedged requests to requests
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.max_ratio = max_ratio
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def route(method: str, url: str) -> str:
+        """
+        Groups requests whose latency is comparable, i.e. 'GET /v1/files/bck7gp3q2/{id}/{id}/{id}'
+        :return: str
+        """
+        path = re.sub(r'/\d+(?=/|$)', '/{id}', urllib.parse.urlparse(url).path)
+        return f'{method.upper()} {path}'
+
+    def delay(self, route: str) -> float:
+        """
+        Seconds to wait for a request before hedging it.
+        :param route: see route()
+        :return: float
+        """
+        with self._lock:
+            samples = sorted(self.latencies[route])
+        if len(samples) < self.min_samples:
+            return max(self.min_delay, self.initial_delay)
+        idx = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[idx])
+
+    def observe(self, route: str, seconds: float):
+        with self._lock:
+            self.latencies[route].append(seconds)
+
+    def start(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """
+        Takes a hedge, if under max_ratio.
+        :return: bool
+        """
+        with self._lock:
+            if self.hedged + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        """
+        Gets hedging statistics.
+        :return: dict, i.e. {'requests': 100, 'hedged': 4, 'hedge_wins': 3, 'win_rate': 0.75, 'delays': {...}}
+        """
+        with self._lock:
+            routes = list(self.latencies)
+            stats = {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'win_rate': self.hedge_wins / self.hedged if self.hedged else 0.0,
+            }
+        stats['delays'] = {route: round(self.delay(route), 4) for route in routes}
+        return stats
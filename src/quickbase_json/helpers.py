@@ -1,14 +1,20 @@
 import base64
 import io
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import BinaryIO
-from xml.dom import minidom
-import xml.etree.ElementTree as ET
-
-import requests
 
 from quickbase_json import wiki
 from quickbase_json.qb_response import QBResponse
+from quickbase_json.streaming import iter_upload_xml, DEFAULT_CHUNK_SIZE
+
+# JSON API payload limit, larger files are sent with the XML API
+JSON_UPLOAD_LIMIT = 10 * 1024 * 1024
+JSON_UPLOAD_OVERHEAD = 1024
+
+# max length of generated query strings
+MAX_QUERY_LENGTH = 8000
 
 VALID_OPERATORS = [
     'CT',
@@ -123,7 +129,7 @@ class Group(QuickbaseParameter):
     def __init__(self, group_pairs: list):
         """
         Creates a groupBy parameter for quickbase query.
-        :param group_pairs: list of tuples, i.e. (3, 'equal-value')
+        :param group_pairs: list of tuples, i.e. (3, 'equal-values')
         """
         self.group_pairs = group_pairs
 
@@ -166,13 +172,14 @@ class QBFile(dict):
     Represents a file, preparing to upload to QB
     """
 
-    def __init__(self):
+    def __init__(self, content: str = None):
         """
         Initialize file upload helper
+        :param content: optional b64 file content
         """
         super().__init__()
         self.name = None
-        self.content = None
+        self.content = content
         self.path = None
         self.qb_data = {}
 
@@ -206,8 +213,8 @@ class QBFile(dict):
         :param version: file version
         :return: QBFile()
         """
-        url = f'https://api.quickbase.com/v1/files/{table}/{rid}/{fid}/{version}'
-        r = requests.get(url=url, headers=client.headers)
+        url = f'{client.base_url}/files/{table}/{rid}/{fid}/{version}'
+        r = client._request('GET', url)
         file_name = r.headers.get('content-disposition').split("''")[1]
         cleaned_file_name = re.sub('[^a-zA-Z0-9 \n]', '_', file_name)
 
@@ -232,20 +239,27 @@ class QBFile(dict):
         if self.content is None:
             raise ValueError('QB File has no content to save.')
 
-        f = open(f'{path}', 'wb')
-        f.write(base64.b64decode(self.content, validate=True))
-        f.close()
+        # decode in slices, to avoid holding a second full copy of the file in memory
+        step = 4 * 64 * 1024
+        with open(f'{path}', 'wb') as f:
+            for i in range(0, len(self.content), step):
+                f.write(base64.b64decode(self.content[i:i + step], validate=True))
 
 
-def xml_upload(client, tbid, rid: int, fid: int, file: any, filename: str) -> QBResponse:
+def xml_upload(client, tbid, rid: int, fid: int, file: any, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               timeout: any = None, deadline: any = None) -> QBResponse:
     """
     Fallback upload option to support uploading files that are larger than ~10 MB (the JSON API payload size limit)
+    The request body is streamed, the file is read and base64 encoded in chunks.
     :param client: valid QBClient object
     :param tbid: table id
     :param rid: record id
     :param fid: field id
-    :param file: file object, must be bytes!
+    :param file: file object, must be bytes!  Streams that can not seek (i.e. pipes) are sent once, without retries.
     :param filename: filename to save as on quickbase
+    :param chunk_size: size of chunks read from the file
+    :param timeout: timeout of the request, defaults to the client's
+    :param deadline: Deadline or seconds, caps the timeout to the time remaining
     :return: QBResponse object
     """
 
@@ -260,43 +274,24 @@ def xml_upload(client, tbid, rid: int, fid: int, file: any, filename: str) -> QB
         'QUICKBASE-ACTION': 'API_UploadFile'
     }
 
-    # convert file
-    file = base64.b64encode(file.read()).decode()
-
-    # begin building of XML
-    root = minidom.Document()
-    xml = root.createElement('qdbapi')
-    root.appendChild(xml)
-
-    # user token
-    user_token = root.createElement('usertoken')
-    user_token_value = root.createTextNode(client.auth)
-    user_token.appendChild(user_token_value)
-    xml.appendChild(user_token)
-
-    # rid
-    rid_node = root.createElement('rid')
-    rid_value = root.createTextNode(str(rid))
-    rid_node.appendChild(rid_value)
-    xml.appendChild(rid_node)
-
-    # field
-    fid_node = root.createElement('field')
-    fid_node.setAttribute('fid', str(fid))
-    fid_node.setAttribute('filename', str(filename))
-    fid_value = root.createTextNode(file)
-    fid_node.appendChild(fid_value)
-    xml.appendChild(fid_node)
-
-    # useful for debugging
-    # xml_str = root.toprettyxml(indent="\t")
-
-    r = requests.post(url=f'https://synctivate.quickbase.com/db/{tbid}', headers=headers, data=xml.toxml())
+    seekable = file.seekable()
+    start = file.tell() if seekable else None
+
+    def body(tag, credential):
+        # a throttled upload is retried from the start of the file
+        if seekable:
+            file.seek(start)
+        return iter_upload_xml(credential, rid, fid, filename, file, chunk_size=chunk_size, credential_tag=tag)
+
+    timeouts = client._timeouts(timeout, deadline)
+    r = client._request('POST', f'{client.realm_url}/db/{tbid}', headers=headers, xml_body=body, retry=seekable,
+                        **timeouts)
     response_fo = io.StringIO(r.text)
 
     # set response info, based on response xml
     res = QBResponse()
     try:
+        import xml.etree.ElementTree as ET
         tree = ET.parse(response_fo)
         res.status_code = int(tree.getroot().find('./errcode').text)
         res.text = tree.getroot().find('./errtext').text
@@ -304,12 +299,106 @@ def xml_upload(client, tbid, rid: int, fid: int, file: any, filename: str) -> QB
             res.ok = True
         else:
             res.ok = False
-
-        return res
     except Exception as e:
         res.ok = False
         res.text = str(e)
 
+    return res
+
+
+def upload_file(client, tbid, rid: int, fid: int, file: any, filename: str = None, **kwargs):
+    """
+    Uploads a file, using the JSON API for small files and the streamed XML API for files over the JSON payload limit.
+    :param client: valid QBClient object
+    :param tbid: table id
+    :param rid: record id
+    :param fid: field id
+    :param file: path to a local file, or a binary file object.  Streams that can not seek (i.e. pipes) have no
+    known size, they are always sent with the XML API.
+    :param filename: filename to save as on quickbase, defaults to the local file name
+    :param kwargs: 'json_limit', max JSON request size in bytes. 'chunk_size', size of chunks read from the file.
+    'timeout' of the request, 'deadline' (Deadline or seconds) of the upload.
+    :return: QBInsertResponse (JSON API) or QBResponse (XML API)
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            return upload_file(client, tbid, rid, fid, f, filename or os.path.basename(file), **kwargs)
+
+    if filename is None:
+        filename = os.path.basename(getattr(file, 'name', 'file'))
+
+    timeouts = client._timeouts(kwargs.get('timeout'), kwargs.get('deadline'))
+    if file.seekable():
+        # size of the remaining stream
+        position = file.tell()
+        size = file.seek(0, io.SEEK_END) - position
+        file.seek(position)
+    else:
+        size = None
+
+    if size is not None and size * 4 / 3 + JSON_UPLOAD_OVERHEAD < kwargs.get('json_limit', JSON_UPLOAD_LIMIT):
+        data = base64.b64encode(file.read()).decode()
+        record = {'3': {'value': rid}, str(fid): {'value': {'fileName': filename, 'data': data}}}
+        return client.insert_update_records(tbid, data=[record], **timeouts)
+
+    return xml_upload(client, tbid, rid, fid, file, filename, chunk_size=kwargs.get('chunk_size', DEFAULT_CHUNK_SIZE),
+                      **timeouts)
+
+
+def upload_files(client, uploads: list, max_workers: int = 4, **kwargs) -> list:
+    """
+    Uploads many files concurrently.
+    :param client: valid QBClient object
+    :param uploads: list of dicts with tbid, rid, fid, file and optionally filename
+    :param max_workers: max number of concurrent uploads
+    :param kwargs: passed to upload_file
+    :return: list of responses, in the same order as uploads
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(upload_file, client, **upload, **kwargs) for upload in uploads]
+        return [f.result() for f in futures]
+
+
+def chunk_query_values(fid: int, values: list, max_length: int = MAX_QUERY_LENGTH, ranges: bool = False) -> list:
+    """
+    Builds OR queries matching a list of values, split so no query is longer than max_length.
+    With ranges, runs of 3 or more consecutive ints are collapsed into a single range, i.e. ({3.GTE.1}AND{3.LTE.500})
+    :param fid: fid to match values against
+    :param values: list of values, i.e. record ids
+    :param max_length: max length of each query string
+    :param ranges: collapse runs of consecutive ints into ranges, only safe for record ids (a range also matches
+    text keys such as "10" and fractional values such as 2.5)
+    :return: list of query strings
+    """
+    terms = []
+    values = list(dict.fromkeys(values))
+    if ranges and values and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        values.sort()
+        start = prev = values[0]
+        for v in values[1:] + [None]:
+            if v is not None and v == prev + 1:
+                prev = v
+                continue
+            if prev - start >= 2:
+                terms.append(f'({build_query_str(fid, "GTE", start)}AND{build_query_str(fid, "LTE", prev)})')
+            else:
+                terms.extend(build_query_str(fid, 'EX', i) for i in range(start, prev + 1))
+            start = prev = v
+    else:
+        terms = [build_query_str(fid, 'EX', f'"{v}"' if isinstance(v, str) else v) for v in values]
+
+    queries, chunk, length = [], [], 0
+    for term in terms:
+        added = len(term) + (2 if chunk else 0)
+        if chunk and length + added > max_length:
+            queries.append('OR'.join(chunk))
+            chunk, length, added = [], 0, len(term)
+        chunk.append(term)
+        length += added
+    if chunk:
+        queries.append('OR'.join(chunk))
+    return queries
+
 
 def split_list_into_chunks(array: list, chunk_size: int):
     """
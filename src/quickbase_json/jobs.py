@@ -0,0 +1,211 @@
+import json
+import os
+
+from quickbase_json.deadline import Deadline
+from quickbase_json.pagination import QueryPaginator
+
+
+def _rid(record: dict) -> int:
+    cell = record.get('3')
+    return int(cell.get('value') if isinstance(cell, dict) else cell)
+
+
+class Checkpoint:
+    """
+    Append-only log of job progress, each entry is synced to disk before it is relied on.
+    A partially written last line (i.e. the process died while writing it) is ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = []
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        break
+
+    def append(self, entry: dict):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append(entry)
+
+    @property
+    def last(self) -> dict:
+        return self.entries[-1] if self.entries else {}
+
+
+class ExportJob:
+    """
+    Exports query results to a JSON lines file, one record per line, checkpointing after every page.
+    Records are paged in record id order, if the job stops it resumes after the last record id written.
+    """
+
+    def __init__(self, client, table: str, select: list, where: str, dest: str, checkpoint: str = None, **kwargs):
+        """
+        Initializes the export.
+        :param client: QuickbaseJSONClient
+        :param table: quickbase table
+        :param select: list, list of fids to export, record id (3) is always exported
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param dest: path of JSON lines file
+        :param checkpoint: path of checkpoint file, defaults to dest + '.checkpoint'
+        :param kwargs: QueryPaginator options, i.e. top, transforms, deadline.  Transforms must keep records keyed
+        by fid.  If the deadline passes, run() returns early with partial set, run it again to continue.
+        """
+        self.client = client
+        self.table = table
+        self.select = select if 3 in select else [3] + list(select)
+        self.where = where
+        self.dest = dest
+        self.checkpoint = Checkpoint(checkpoint or f'{dest}.checkpoint')
+        self.options = kwargs
+        self.records = self.checkpoint.last.get('records', 0)
+        self.done = self.checkpoint.last.get('done', False)
+        self.partial = False
+
+    def run(self) -> int:
+        """
+        Runs (or resumes) the export.
+        :return: number of records exported
+        """
+        if self.done:
+            return self.records
+        last = self.checkpoint.last
+        where = self.where or ''
+        if last.get('last_rid') is not None:
+            after = f'{{3.GT.{last["last_rid"]}}}'
+            where = f'({where})AND{after}' if where else after
+
+        paginator = QueryPaginator(self.client, self.table, self.select, where, **self.options)
+        with open(self.dest, 'ab') as f:
+            # drop anything written after the last checkpoint
+            f.truncate(last.get('offset', 0))
+            f.seek(0, os.SEEK_END)
+            for page in paginator:
+                data = page.get('data') or []
+                if not data:
+                    continue
+                f.write(''.join(json.dumps(record) + '\n' for record in data).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                self.records += len(data)
+                self.checkpoint.append({'last_rid': _rid(data[-1]), 'records': self.records, 'offset': f.tell()})
+                if self.client.debug:
+                    print(f'QJAC : ExportJob : exported ---> {self.records}')
+
+        self.partial = paginator.partial
+        if self.partial:
+            return self.records
+        self.done = True
+        self.checkpoint.append(dict(self.checkpoint.last, done=True, records=self.records))
+        return self.records
+
+
+class ImportJob:
+    """
+    Imports records in batched upserts, checkpointing every committed batch along with its returned record ids.
+    If the job stops it resumes with the first uncommitted batch, so the source must yield records in the
+    same order on every run.
+
+    A batch is logged as pending before it is sent.  If the job stopped while a batch was pending, it is
+    not known whether Quickbase applied it, so resuming requires a mergeFieldId (making the upsert idempotent).
+    """
+
+    def __init__(self, client, table: str, records: any, checkpoint: str, batch_size: int = 500, **kwargs):
+        """
+        Initializes the import.
+        :param client: QuickbaseJSONClient
+        :param table: table to add records to
+        :param records: iterable of record dicts, or path of a JSON lines file
+        :param checkpoint: path of checkpoint file
+        :param batch_size: records per upsert
+        :param kwargs: optional request parameters, i.e. mergeFieldId.  'deadline', Deadline or seconds for the
+        run, checked between batches so a batch in flight is never cut off.  If it passes, run() returns early
+        with partial set, run it again to continue.
+        """
+        self.deadline = kwargs.pop('deadline', None)
+        self.partial = False
+        self.client = client
+        self.table = table
+        self.source = records
+        self.batch_size = batch_size
+        self.params = kwargs
+        self.checkpoint = Checkpoint(checkpoint)
+
+        self.rids = []
+        self.errors = {}
+        self.committed = 0
+        self.pending = None
+        for entry in self.checkpoint.entries:
+            if entry.get('status') == 'pending':
+                self.pending = entry['batch']
+            elif entry.get('status') == 'committed':
+                self.pending = None
+                self.committed = entry['batch'] + 1
+                self.rids.extend(entry['rids'])
+                self.errors.update(entry.get('errors') or {})
+
+    def _records(self):
+        if isinstance(self.source, str):
+            with open(self.source, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            yield from self.source
+
+    def _batches(self):
+        batch = []
+        for record in self._records():
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self) -> list:
+        """
+        Runs (or resumes) the import.
+        :return: list of record ids created or updated, in source order
+        """
+        if self.pending is not None and 'mergeFieldId' not in self.params:
+            raise ValueError(
+                f'Batch {self.pending} may have been applied before the job stopped, '
+                f'resuming without a mergeFieldId could duplicate its records')
+
+        deadline = Deadline.of(self.deadline)
+        self.partial = False
+        params = dict(self.params)
+        fields = list(params.pop('fieldsToReturn', None) or [])
+        params['fieldsToReturn'] = fields if 3 in fields else [3] + fields
+
+        for number, batch in enumerate(self._batches()):
+            if number < self.committed:
+                continue
+            if deadline is not None and deadline.expired:
+                self.partial = True
+                break
+            self.checkpoint.append({'batch': number, 'status': 'pending'})
+            r = self.client.insert_update_records(self.table, batch, **params)
+            if not r.ok:
+                raise ConnectionError(f'{r.status_code}: {r.get("message")} {r.get("description", "")}'.strip())
+
+            # lineErrors are keyed by 1-based line, data holds a row for every other line, in order
+            line_errors = r.get('metadata', {}).get('lineErrors') or {}
+            errors = {str(number * self.batch_size + int(line) - 1): e for line, e in line_errors.items()}
+            rids = [_rid(row) for row in r.get('data') or []]
+            self.checkpoint.append({'batch': number, 'status': 'committed', 'rids': rids, 'errors': errors})
+            self.rids.extend(rids)
+            self.errors.update(errors)
+            self.committed = number + 1
+            self.pending = None
+            if self.client.debug:
+                print(f'QJAC : ImportJob : committed batch ---> {number} ({len(rids)} records)')
+
+        return self.rids
@@ -0,0 +1,557 @@
+import collections
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from quickbase_json.deadline import Deadline, DeadlineExceeded
+from quickbase_json.qb_response import QBQueryResponse
+
+# QBQueryResponse methods that can be applied to each page independently
+PAGE_TRANSFORMS = ['denest', 'transform', 'round_ints', 'convert_type']
+
+
+def extract_metadata(content: bytes) -> dict:
+    """
+    Reads the metadata of a query response without decoding the records, which can be much larger.
+    :param content: raw response body
+    :return: dict, i.e. {'totalRecords': 10, 'numRecords': 10, 'numFields': 3, 'skip': 0}
+    """
+    idx = content.rfind(b'"metadata"')
+    if idx != -1:
+        start = content.find(b'{', idx)
+        try:
+            metadata, _ = json.JSONDecoder().raw_decode(content[start:].decode('utf-8'))
+            if isinstance(metadata, dict) and 'numRecords' in metadata:
+                return metadata
+        except ValueError:
+            pass
+    return json.loads(content).get('metadata', {})
+
+
+def parse_page(content: bytes, transforms: list = None) -> tuple:
+    """
+    Decodes a page of query results and applies transforms to it.
+    Runs in worker processes, so takes and returns only plain picklable data.
+    :param content: raw response body
+    :param transforms: list of QBQueryResponse method names, or (name, args) / (name, kwargs) tuples
+    :return: tuple of (dict of data, fields and metadata, list of operations)
+    """
+    res = QBQueryResponse(sample_data=json.loads(content))
+    for transform in transforms or []:
+        name, args = (transform, ()) if isinstance(transform, str) else (transform[0], tuple(transform[1:]))
+        kwargs = {}
+        if args and isinstance(args[-1], dict):
+            args, kwargs = args[:-1], args[-1]
+        getattr(res, name)(*args, **kwargs)
+    return dict(res), res.operations
+
+
+def build_page(parsed: tuple) -> QBQueryResponse:
+    page, operations = parsed
+    res = QBQueryResponse(sample_data=page)
+    res.operations = operations
+    return res
+
+
+class PageSizer:
+    """
+    Tunes the page size (top) of paginated queries from observed bytes per record and latency.
+    Page sizes grow toward a target response size, and shrink after failed, timed out or slow pages.
+    The chosen size is remembered per (table, select).  Sizes are only kept across runs when a path is given,
+    without one they last as long as the PageSizer (for PAGE_SIZER, the process).
+    """
+
+    # statuses worth retrying with a smaller page
+    RETRY_STATUSES = (413, 500, 502, 503, 504)
+
+    def __init__(self, path: str = None, target_bytes: int = 2 * 1024 * 1024, initial: int = 100,
+                 min_top: int = 10, max_top: int = 10000, slow_seconds: float = 10.0):
+        """
+        Initializes the page sizer.
+        :param path: optional JSON file to remember page sizes in
+        :param target_bytes: response size to aim for
+        :param initial: page size of a (table, select) not seen before
+        :param min_top: smallest page size
+        :param max_top: largest page size
+        :param slow_seconds: pages slower than this shrink the page size
+        """
+        self.path = path
+        self.target_bytes = target_bytes
+        self.initial = initial
+        self.min_top = min_top
+        self.max_top = max_top
+        self.slow_seconds = slow_seconds
+        self.sizes = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.sizes = json.load(f)
+
+    @staticmethod
+    def key(table: str, select: list) -> str:
+        return f'{table}:{",".join(str(fid) for fid in sorted(int(f) for f in select))}'
+
+    def top(self, table: str, select: list) -> int:
+        """
+        Gets the page size to use next.
+        :return: int
+        """
+        return self.sizes.get(self.key(table, select), self.initial)
+
+    def _set(self, table: str, select: list, top: float) -> int:
+        top = int(max(self.min_top, min(self.max_top, top)))
+        with self._lock:
+            self.sizes[self.key(table, select)] = top
+            if self.path:
+                tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.sizes, f)
+                os.replace(tmp_path, self.path)
+        return top
+
+    def observe(self, table: str, select: list, top: int, num_records: int, size: int, seconds: float) -> int:
+        """
+        Adjusts the page size after a successful page.
+        :param top: page size requested
+        :param num_records: records returned
+        :param size: response size in bytes
+        :param seconds: time taken to fetch the page
+        :return: new page size
+        """
+        if seconds > self.slow_seconds:
+            return self._set(table, select, top * max(0.5, self.slow_seconds / seconds))
+        if not num_records:
+            return top
+        ideal = self.target_bytes / max(1.0, size / num_records)
+        if num_records < top:
+            # the last page, or capped by the server, only shrink
+            return self._set(table, select, min(ideal, top))
+        # grow at most 2x per page, toward the target size
+        return self._set(table, select, min(ideal, top * 2))
+
+    def failed(self, table: str, select: list, top: int) -> int:
+        """
+        Halves the page size after a failed page.
+        :return: new page size
+        """
+        return self._set(table, select, top / 2)
+
+
+# shared by paginators created with adaptive=True, kept in memory only.
+# Pass adaptive=PageSizer(path=...) to remember page sizes between runs.
+PAGE_SIZER = PageSizer()
+
+
+class QueryPaginator:
+    """
+    Iterates over every page of a query with skip/top pagination, yielding a QBQueryResponse per page.
+    Pages are fetched in order; decoding and transforms can be offloaded to a pool of processes.
+    """
+
+    def __init__(self, client, table: str, select: list, where: any, top: int = None, skip: int = 0, **kwargs):
+        """
+        Initializes the paginator.
+        :param client: QuickbaseJSONClient
+        :param table: quickbase table
+        :param select: list, list of fids to query
+        :param where: Quickbase query language string. i.e. {3.EX.100}
+        :param top: max records per page, the server decides if not given
+        :param skip: number of records to skip before the first page
+        :param kwargs: 'processes', number of worker processes used to decode and transform pages.
+        'transforms', list of QBQueryResponse methods applied to every page, i.e. ['denest', ('convert_type', 'datetime')]
+        'prefetch', number of pages fetched ahead on a background thread while the current page is processed.
+        'adaptive', tune top from observed response sizes and latency, True or a PageSizer.  top is ignored.
+        'deadline', Deadline or seconds for the whole query.  Once it passes no more pages are fetched and
+        partial is set.  'timeout', timeout of each request.  'retries', times a throttled (429) page is retried,
+        after its Retry-After.
+        Any other kwargs are passed as request parameters, i.e. sortBy.  Records are sorted by record id
+        unless sortBy is given, so pages are stable.
+        """
+        self.client = client
+        self.table = table
+        self.select = select
+        self.where = where
+        self.top = top
+        self.skip = skip
+        self.processes = kwargs.pop('processes', None)
+        self.transforms = kwargs.pop('transforms', None) or []
+        self.prefetch = kwargs.pop('prefetch', 0)
+        adaptive = kwargs.pop('adaptive', None)
+        self.sizer = PAGE_SIZER if adaptive is True else adaptive or None
+        self.deadline = Deadline.of(kwargs.pop('deadline', None))
+        self.timeout = client._timeouts(kwargs.pop('timeout', None), None)
+        self.retries = kwargs.pop('retries', 5)
+        self.options = kwargs.pop('options', {})
+        kwargs.setdefault('sortBy', [{'fieldId': 3, 'order': 'ASC'}])
+        self.params = kwargs
+
+        for transform in self.transforms:
+            name = transform if isinstance(transform, str) else transform[0]
+            if name not in PAGE_TRANSFORMS:
+                raise ValueError(f'"{name}" can not be applied per page, valid transforms: {PAGE_TRANSFORMS}')
+
+        self.pages = 0
+        self.records = 0
+        self.total = None
+        self.next_skip = skip
+        self.partial = False
+
+    def fetch(self, skip: int, top: int = None) -> bytes:
+        """
+        Fetches a single page.
+        :param skip: number of records to skip
+        :param top: max records to return
+        :return: raw response body
+        """
+        r = self._fetch(skip, top)
+        if not r.ok:
+            raise ConnectionError(f'{r.status_code}: {r.text}')
+        return r.content
+
+    def _fetch(self, skip: int, top: int = None):
+        options = dict(self.options, skip=skip)
+        if top:
+            options['top'] = top
+        return self.client._retry_throttled(
+            lambda: self.client._query_request(self.table, self.select, self.where, options=options,
+                                               deadline=self.deadline, **self.timeout, **self.params),
+            self.retries, self.deadline)
+
+    def _fetch_adaptive(self, skip: int) -> bytes:
+        """Fetches a page sized by the page sizer, retrying with smaller pages on failure or timeout."""
+        import requests
+
+        while True:
+            top = self.sizer.top(self.table, self.select)
+            started = time.monotonic()
+            try:
+                r = self._fetch(skip, top)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                # a deadline that passed raises DeadlineExceeded instead, which is not retried
+                if top <= self.sizer.min_top:
+                    raise
+                self.sizer.failed(self.table, self.select, top)
+                if self.client.debug:
+                    print(f'QJAC : QueryPaginator : {e.__class__.__name__} with top {top}, retrying with a smaller page')
+                continue
+            if r.ok:
+                num_records = extract_metadata(r.content).get('numRecords', 0)
+                self.sizer.observe(self.table, self.select, top, num_records, len(r.content), time.monotonic() - started)
+                return r.content
+            if r.status_code not in self.sizer.RETRY_STATUSES or top <= self.sizer.min_top:
+                raise ConnectionError(f'{r.status_code}: {r.text}')
+            self.sizer.failed(self.table, self.select, top)
+            if self.client.debug:
+                print(f'QJAC : QueryPaginator : {r.status_code} with top {top}, retrying with a smaller page')
+
+    def raw_pages(self):
+        """
+        Fetches pages in order, without decoding their records.
+        :return: generator of (raw response body, metadata)
+        """
+        skip = self.skip
+        while True:
+            try:
+                content = self._fetch_adaptive(skip) if self.sizer else self.fetch(skip, self.top)
+            except DeadlineExceeded:
+                self.partial = True
+                if self.client.debug:
+                    print(f'QJAC : QueryPaginator : deadline exceeded after {skip - self.skip} records')
+                return
+            metadata = extract_metadata(content)
+            num_records = metadata.get('numRecords', 0)
+            self.total = metadata.get('totalRecords', self.total)
+            if num_records == 0:
+                return
+            yield content, metadata
+            skip += num_records
+            self.next_skip = skip
+            if self.total is not None and skip >= self.total:
+                return
+
+    def prefetched_pages(self):
+        """
+        Same as raw_pages(), but fetches up to prefetch pages ahead on a background thread.
+        The thread waits while that many pages are buffered, so a slow consumer is never overrun.
+        :return: generator of (raw response body, metadata)
+        """
+        buffered = queue.Queue(maxsize=max(1, self.prefetch))
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    buffered.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for page in self.raw_pages():
+                    if not put(page):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = buffered.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def _pages(self):
+        return self.prefetched_pages() if self.prefetch else self.raw_pages()
+
+    def _parsed_pages(self):
+        if not self.processes:
+            for content, _ in self._pages():
+                yield parse_page(content, self.transforms)
+            return
+
+        # decode in worker processes while the next pages download, results come back in order
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            pending = collections.deque()
+            for content, _ in self._pages():
+                pending.append(pool.submit(parse_page, content, self.transforms))
+                while len(pending) > self.processes * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def __iter__(self):
+        for parsed in self._parsed_pages():
+            page = build_page(parsed)
+            self.pages += 1
+            self.records += len(page.get('data') or [])
+            yield page
+
+    def iter_records(self):
+        """
+        Iterates over records of every page.
+        :return: generator of record dicts
+        """
+        for page in self:
+            yield from page.get('data') or []
+
+    def all(self) -> QBQueryResponse:
+        """
+        Fetches every page, merging them into a single response.
+        :return: QBQueryResponse
+        """
+        res = QBQueryResponse()
+        data = []
+        for page in self:
+            data.extend(page.get('data') or [])
+            res.update({'fields': page.get('fields'), 'metadata': page.get('metadata')})
+            res.operations = page.operations
+        res.update({'data': data})
+        res['metadata'] = {
+            'totalRecords': self.total or len(data),
+            'numRecords': len(data),
+            'numFields': len(res.get('fields') or self.select),
+            'skip': 0}
+        res.setdefault('fields', [])
+        res.ok = True
+        res.status_code = 200
+        res.partial = self.partial
+        return res
+
+
+def _and(where: str, term: str) -> str:
+    return f'({where})AND{term}' if where else term
+
+
+class ShardedQuery:
+    """
+    Runs a query in parallel by splitting it into record id ranges, i.e. {3.GT.100}AND{3.LTE.200}.
+    Shard bounds are probed with cheap select=[3] queries so shards hold a similar number of records.
+    Each shard is paged with a QueryPaginator on a pool of worker threads.  Requests go through the client's
+    auth provider, so shards wait for its rate budget if it has one (i.e. rate_limit=(100, 10) or a UserTokenPool),
+    and throttled (429) pages back off and are retried.
+    """
+
+    # pages buffered per worker, before it waits for the consumer
+    BUFFERED_PAGES = 2
+
+    def __init__(self, client, table: str, select: list, where: any, shards: int = None, max_workers: int = 4,
+                 ordered: bool = False, **kwargs):
+        """
+        Initializes the sharded query.
+        :param client: QuickbaseJSONClient
+        :param table: quickbase table
+        :param select: list, list of fids to query
+        :param where: Quickbase query language string. i.e. {7.GT.100}
+        :param shards: number of shards, defaults to 4 per worker
+        :param max_workers: number of shards fetched at the same time
+        :param ordered: yield shards in record id order, rather than as they complete
+        :param kwargs: QueryPaginator options for each shard, i.e. top, transforms
+        """
+        self.client = client
+        self.table = table
+        self.select = select
+        self.where = where or ''
+        self.shards = shards or max_workers * 4
+        self.max_workers = max_workers
+        self.ordered = ordered
+        kwargs['deadline'] = Deadline.of(kwargs.get('deadline'))
+        self.options = kwargs
+        self.total = None
+        self.bounds = None
+        self.records = 0
+        self.partial = False
+
+    def _rid_at(self, skip: int, order: str = 'ASC'):
+        """Gets the record id at a position of the query, sorted by record id."""
+        deadline = self.options['deadline']
+        r = self.client._retry_throttled(lambda: self.client._query_request(
+            self.table, [3], self.where, options={'skip': skip, 'top': 1}, sortBy=[{'fieldId': 3, 'order': order}],
+            deadline=deadline), self.options.get('retries', 5), deadline)
+        if not r.ok:
+            raise ConnectionError(f'{r.status_code}: {r.text}')
+        content = r.json()
+        self.total = content.get('metadata', {}).get('totalRecords', self.total)
+        data = content.get('data') or []
+        return data[0]['3']['value'] if data else None
+
+    def probe(self) -> list:
+        """
+        Probes record id bounds of the query, splitting it into shards of roughly equal size.
+        :return: list of (lower, upper) record id bounds, lower is exclusive, upper is inclusive or None
+        """
+        first = self._rid_at(0)
+        if first is None:
+            self.bounds = []
+            return self.bounds
+
+        shards = max(1, min(self.shards, self.total))
+        positions = sorted({round(i * self.total / shards) - 1 for i in range(1, shards)})
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            uppers = list(pool.map(self._rid_at, positions))
+
+        bounds, lower = [], first - 1
+        for upper in sorted({u for u in uppers if u is not None and u > lower}):
+            bounds.append((lower, upper))
+            lower = upper
+        # the last shard is open ended, so records added since probing are not missed
+        bounds.append((lower, None))
+        self.bounds = bounds
+        return bounds
+
+    def shard_where(self, lower: int, upper: int = None) -> str:
+        term = f'{{3.GT.{lower}}}' if upper is None else f'{{3.GT.{lower}}}AND{{3.LTE.{upper}}}'
+        return _and(self.where, term)
+
+    def _page_shard(self, bounds: tuple, put) -> bool:
+        """Pages a shard, handing each page to put.  Returns False if the consumer stopped."""
+        paginator = QueryPaginator(self.client, self.table, self.select, self.shard_where(*bounds), **self.options)
+        for page in paginator:
+            if not put(page):
+                return False
+        if paginator.partial:
+            self.partial = True
+        return True
+
+    def __iter__(self):
+        """
+        Yields pages as workers fetch them, through bounded queues so at most a few pages per worker are held.
+        In ordered mode shards are consumed one after another, workers fetching later shards wait once
+        their shard's queue is full.
+        """
+        bounds = self.bounds if self.bounds is not None else self.probe()
+        stop = threading.Event()
+        done = object()
+        pending = queue.Queue()
+        for i, b in enumerate(bounds):
+            pending.put((i, b))
+        if self.ordered:
+            queues = [queue.Queue(maxsize=self.BUFFERED_PAGES) for _ in bounds]
+        else:
+            queues = [queue.Queue(maxsize=self.BUFFERED_PAGES * self.max_workers)] * len(bounds)
+
+        def put(q, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def work():
+            while not stop.is_set():
+                try:
+                    i, b = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if not self._page_shard(b, lambda page: put(queues[i], page)):
+                        return
+                except Exception as e:
+                    put(queues[i], e)
+                    return
+                put(queues[i], done)
+
+        for _ in range(max(1, min(self.max_workers, len(bounds)))):
+            threading.Thread(target=work, daemon=True).start()
+
+        def drain(q, shards: int):
+            while shards:
+                item = q.get()
+                if item is done:
+                    shards -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                self.records += len(item.get('data') or [])
+                yield item
+
+        try:
+            if self.ordered:
+                for q in queues:
+                    yield from drain(q, 1)
+            elif bounds:
+                yield from drain(queues[0], len(bounds))
+        finally:
+            stop.set()
+
+    def iter_records(self):
+        """
+        Iterates over records of every shard.
+        :return: generator of record dicts
+        """
+        for page in self:
+            yield from page.get('data') or []
+
+    def all(self) -> QBQueryResponse:
+        """
+        Fetches every shard, merging them into a single response.
+        :return: QBQueryResponse
+        """
+        res = QBQueryResponse()
+        data = []
+        for page in self:
+            data.extend(page.get('data') or [])
+            res.update({'fields': page.get('fields')})
+            res.operations = page.operations
+        res.update({'data': data})
+        res['metadata'] = {'totalRecords': len(data), 'numRecords': len(data), 'numFields': len(self.select), 'skip': 0}
+        res.setdefault('fields', [])
+        res.ok = True
+        res.status_code = 200
+        res.partial = self.partial
+        return res
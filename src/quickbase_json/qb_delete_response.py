@@ -0,0 +1,36 @@
+class QBDeleteResponse(dict):
+
+    def __init__(self, **kwargs):
+        self.ok = False
+        self.status_code = None
+        self.number_deleted = 0
+        self.chunks = 0
+        self.failures = []
+        self.partial = False
+        super().__init__()
+
+    def info(self):
+        """
+        Prints information about the response.
+        """
+        print(
+            f'Response:\nOK:\t--->\t{self.ok}\nDeleted:\t--->\t{self.number_deleted}\nChunks:\t--->\t{self.chunks}\nFailed:\t--->\t{len(self.failures)}')
+
+    def add_chunk(self, where: str, response):
+        """
+        Adds the result of deleting a single chunk.
+        :param where: query used to delete the chunk
+        :param response: response object, or an exception if the request failed
+        """
+        self.chunks += 1
+        if isinstance(response, Exception):
+            self.failures.append({'where': where, 'status_code': None, 'error': str(response)})
+        elif response.ok:
+            self.number_deleted += response.json().get('numberDeleted', 0)
+        else:
+            self.failures.append({'where': where, 'status_code': response.status_code, 'error': response.text})
+
+        self.ok = not self.failures
+        self.status_code = 200 if self.ok else 207
+        self.update({'numberDeleted': self.number_deleted, 'failures': self.failures})
+        return self
@@ -31,6 +31,7 @@ class QBInsertResponse(dict):
         self.processed = 0
         self.created_rids = []
         self.updated_rids = []
+        self.skipped = 0
         super().__init__()
 
     def info(self):
@@ -1,10 +1,26 @@
 from quickbase_json.client import QuickbaseJSONClient
+from quickbase_json.helpers import build_query_str, split_list_into_chunks
+
+
+def _key(value):
+    """Normalizes a field value for matching, i.e. 5.0 and 5 are the same record id."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _query_value(value):
+    return f'"{value}"' if isinstance(value, str) else value
 
 
 class LinkedRecord:
     def __init__(self, table, rid, table_name='default', fid=3, **kwargs):
+        self.table = table
+        self.rid = rid
+        self.alias = table if table_name == 'default' else table_name
         self.tables = {}
         self.attributes = {}
+        self.links = {}
         self.add_link(table, rid, table_name, fid)
 
     def add_link(self, table_id, rid, table_name='default', fid=3):
@@ -15,24 +31,205 @@ class LinkedRecord:
     def add_attribute(self, key, value):
         self.attributes.update({key: value})
 
-    def build(self, use_aliases=False):
-        pass
+    def link(self, alias: str, record):
+        """
+        Links another record to this one.
+        :param alias: name of the relationship, i.e. 'lines'
+        :param record: LinkedRecord
+        """
+        linked = self.links.setdefault(alias, [])
+        if record not in linked:
+            linked.append(record)
+
+    def get(self, alias: str) -> list:
+        """
+        Gets linked records for a relationship.
+        :param alias: name of the relationship
+        :return: list of LinkedRecord
+        """
+        return self.links.get(alias, [])
+
+    def build(self, use_aliases=False, _seen=None):
+        """
+        Builds a nested dict of this record, its attributes and linked records.
+        Records already included higher up the graph are only referenced by table and rid.
+        :param use_aliases: key the record's table by its alias rather than table id
+        :return: dict
+        """
+        _seen = set() if _seen is None else _seen
+        table = self.alias if use_aliases else self.table
+        if (self.table, self.rid) in _seen:
+            return {'table': table, 'rid': self.rid}
+        _seen = _seen | {(self.table, self.rid)}
+
+        built = {'table': table, 'rid': self.rid}
+        built.update(self.attributes)
+        for alias, records in self.links.items():
+            built[alias] = [r.build(use_aliases=use_aliases, _seen=_seen) for r in records]
+        return built
+
+    def __repr__(self):
+        return f'LinkedRecord({self.table}, {self.rid})'
 
 
 class LinkedRecordFactory:
-    def __init__(self, realm, auth_token, table_id):
+    """
+    Loads a graph of related records, starting from a root query and following reference fields
+    into parent and child tables.  Each hop issues one batched OR query per table, rather than one per record.
+    """
+
+    def __init__(self, realm=None, auth_token=None, table_id=None, client: QuickbaseJSONClient = None):
         self.realm = realm
         self.table_id = table_id
         self.records = {}
-        self.client = QuickbaseJSONClient(realm, auth_token)
+        self.client = client if client is not None else QuickbaseJSONClient(realm, auth_token)
+        self.roots = []
+        self.links = []
+        self.selects = {}
+        self.queries = 0
+        self._root = None
+        self._queried = set()
 
     def set_root(self, table, fid, where):
-        records = self.client.query_records(table, fid, where)
-        self.records = records
-        return records
+        """
+        Sets the root query of the graph.
+        :param table: root table
+        :param fid: fid or list of fids to select from the root table
+        :param where: Quickbase query language string, or Where
+        :return: self
+        """
+        self.table_id = table
+        self._root = (table, where)
+        self.select(table, [fid] if isinstance(fid, int) else fid)
+        return self
 
-    def add_link(self, source_table, fid, table):
-        pass
+    def select(self, table, fids):
+        """
+        Adds fids to select from a table, record id (3) is always selected.
+        :param table: table id
+        :param fids: list of fids
+        :return: self
+        """
+        selected = self.selects.setdefault(table, [3])
+        for fid in fids or []:
+            if int(fid) not in selected:
+                selected.append(int(fid))
+        return self
+
+    def add_link(self, source_table, fid, table, target_fid=3, alias=None, select=None):
+        """
+        Follows a reference from source_table into table: records of table whose target_fid equals the value
+        of fid on source records are linked to them.
+        Parent (many to one): add_link('lines', 10, 'orders'), where 10 is the related order on lines.
+        Child (one to many): add_link('orders', 3, 'lines', target_fid=10).
+        :param source_table: table the link starts from
+        :param fid: fid on source_table holding the value to match
+        :param table: table the link points to
+        :param target_fid: fid on table matched against, defaults to record id
+        :param alias: name of the relationship, defaults to table id
+        :param select: fids to select from table
+        :return: self
+        """
+        self.links.append({
+            'source': source_table, 'fid': int(fid), 'table': table, 'target_fid': int(target_fid),
+            'alias': alias or table})
+        self.select(source_table, [fid])
+        self.select(table, [target_fid] + list(select or []))
+        return self
 
     def add_links(self, links):
-        pass
+        """
+        Adds many links.
+        :param links: list of tuples or dicts of add_link() arguments
+        :return: self
+        """
+        for link in links:
+            if isinstance(link, dict):
+                self.add_link(**link)
+            else:
+                self.add_link(*link)
+        return self
+
+    def _query_all(self, table, where):
+        """Runs a query, following skip/top pagination until all records are returned."""
+        data = []
+        while True:
+            r = self.client.query_records(table, self.selects[table], where, options={'skip': len(data)})
+            self.queries += 1
+            if not r.ok:
+                raise ConnectionError(f'{r.status_code}: {r.text}')
+            data.extend(r.get('data', []))
+            metadata = r.get('metadata', {})
+            if not metadata.get('numRecords') or len(data) >= metadata.get('totalRecords', 0):
+                return data
+
+    def _load(self, table, rows, index):
+        """Adds query rows to the graph, returning records that were not loaded before."""
+        new = []
+        for row in rows:
+            values = {k: _key(v.get('value') if isinstance(v, dict) else v) for k, v in row.items()}
+            rid = values.get('3')
+            if (table, rid) in self.records:
+                continue
+            record = LinkedRecord(table, rid)
+            for k, v in values.items():
+                record.add_attribute(k, v)
+            self.records[(table, rid)] = record
+            self._queried.add((table, 3, rid))
+            new.append(record)
+            for fid in self.selects[table]:
+                index.setdefault((table, fid), {}).setdefault(values.get(str(fid)), []).append(record)
+        return new
+
+    def build(self, max_hops: int = None):
+        """
+        Runs the root query and follows links, hop by hop, until no new records are found.
+        :param max_hops: optional limit on the number of hops from the root
+        :return: list of root LinkedRecord
+        """
+        if self._root is None:
+            raise ValueError('Root query is not set, use set_root() first')
+
+        self.records = {}
+        self.queries = 0
+        index = {}
+        self._queried = queried = set()
+
+        table, where = self._root
+        self.roots = self._load(table, self._query_all(table, where), index)
+        frontier = {table: self.roots}
+        hops = 0
+
+        while frontier and (max_hops is None or hops < max_hops):
+            hops += 1
+            active = [link for link in self.links if frontier.get(link['source'])]
+
+            # collect values to look up, per target table
+            terms = {}
+            for link in active:
+                for source in frontier[link['source']]:
+                    value = source.attributes.get(str(link['fid']))
+                    lookup = (link['table'], link['target_fid'], value)
+                    if value is None or value == '' or lookup in queried:
+                        continue
+                    queried.add(lookup)
+                    terms.setdefault(link['table'], []).append(
+                        build_query_str(link['target_fid'], 'EX', _query_value(value)))
+
+            # one batched OR query per table
+            next_frontier = {}
+            for target, table_terms in terms.items():
+                for chunk in split_list_into_chunks(table_terms, chunk_size=100):
+                    loaded = self._load(target, self._query_all(target, 'OR'.join(chunk)), index)
+                    next_frontier.setdefault(target, []).extend(loaded)
+
+            # link new source records to their targets
+            for link in active:
+                targets = index.get((link['table'], link['target_fid']), {})
+                for source in frontier[link['source']]:
+                    for target in targets.get(source.attributes.get(str(link['fid'])), []):
+                        source.link(link['alias'], target)
+
+            frontier = {t: r for t, r in next_frontier.items() if r}
+
+        return self.roots
@@ -26,6 +26,8 @@ def operation(method):
 class QBResponse(dict):
     def __init__(self, requests_response=None, **kwargs):
         self.ok = False
+        # set when a deadline stopped the response from being complete
+        self.partial = False
         if requests_response:
             self.ok = requests_response.ok
             self.status_code = requests_response.status_code
@@ -210,6 +212,155 @@ class QBQueryResponse(QBResponse):
         else:
             raise ValueError(f'{orient} is not a valid orientation.')
 
+    def join(self, other, on, how: str = 'inner', suffix: str = '_r'):
+        """
+        Joins another response onto this one with a hash join.  The smaller side is hashed, the larger is streamed.
+        Rows with a null join key never match.
+        :param other: QBQueryResponse (or dict with 'data' and 'fields') to join
+        :param on: fid, list of fids, or list of (left fid, right fid) pairs
+        :param how: 'inner', 'left' or 'semi' (left rows that have at least one match, left columns only)
+        :param suffix: appended to right fids (and labels) that clash with left fids, i.e. '7' -> '7_r'
+        Right values are merged in the representation of the left rows, raw ({"value": x}) or denested.
+        :return: new QBQueryResponse, 'inner' rows follow the order of the larger side, 'left' and 'semi' the left
+        """
+        if how not in ('inner', 'left', 'semi'):
+            raise ValueError(f'{how} is not a valid join type.')
+
+        left_data, right_data = self.get('data') or [], other.get('data') or []
+        if isinstance(left_data, dict) or isinstance(right_data, dict):
+            raise ValueError('Responses must be in list orientation to join, join before calling orient().')
+
+        pairs = [on] if isinstance(on, (int, str, tuple)) else list(on)
+        pairs = [(str(p[0]), str(p[1])) if isinstance(p, tuple) else (str(p), str(p)) for p in pairs]
+        left_keys, right_keys = [p[0] for p in pairs], [p[1] for p in pairs]
+
+        def key(row, fids):
+            values = []
+            for fid in fids:
+                v = row.get(fid)
+                v = v.get('value') if isinstance(v, dict) else v
+                if v is None:
+                    return None
+                values.append(int(v) if isinstance(v, float) and v.is_integer() else v)
+            return tuple(values)
+
+        # merged fields, right join keys are dropped, clashing right fids are renamed
+        left_fields = list(self.get('fields') or [])
+        taken = {str(f.get('id')) for f in left_fields}.union(*(row.keys() for row in left_data[:1]))
+        renamed = {}
+        right_fields = []
+        for f in other.get('fields') or []:
+            fid = str(f.get('id'))
+            if fid in right_keys:
+                continue
+            new_fid = fid + suffix if fid in taken else fid
+            if new_fid in taken:
+                raise ValueError(f'Field {fid} of the joined response clashes with {new_fid}, use another suffix.')
+            renamed[fid] = new_fid
+            taken.add(new_fid)
+            right_fields.append(dict(f, id=int(new_fid) if new_fid.isdigit() else new_fid,
+                                     label=f'{f.get("label")}{suffix}' if new_fid != fid else f.get('label')))
+        left_raw = 'denest' not in self.operations
+        right_raw = 'denest' not in getattr(other, 'operations', [])
+        null = {'value': None} if left_raw else None
+
+        def cell(v):
+            if left_raw and not right_raw:
+                return {'value': v}
+            if right_raw and not left_raw:
+                return v.get('value') if isinstance(v, dict) else v
+            return v
+
+        def merge(left_row, right_row):
+            row = dict(left_row)
+            for fid, new_fid in renamed.items():
+                row[new_fid] = cell(right_row[fid]) if right_row is not None and fid in right_row else null
+            return row
+
+        rows = []
+        if len(left_data) <= len(right_data):
+            # hash the left side, stream the right
+            table = {}
+            for idx, row in enumerate(left_data):
+                k = key(row, left_keys)
+                if k is not None:
+                    table.setdefault(k, []).append(idx)
+            matches = {}
+            for right_row in right_data:
+                for idx in table.get(key(right_row, right_keys), []):
+                    if how == 'inner':
+                        rows.append(merge(left_data[idx], right_row))
+                    elif how == 'semi':
+                        matches[idx] = True
+                    else:
+                        matches.setdefault(idx, []).append(right_row)
+            if how == 'semi':
+                rows = [dict(row) for idx, row in enumerate(left_data) if idx in matches]
+            elif how == 'left':
+                for idx, row in enumerate(left_data):
+                    rows.extend([merge(row, r) for r in matches[idx]] if idx in matches else [merge(row, None)])
+        else:
+            # hash the right side, stream the left
+            table = {}
+            for right_row in right_data:
+                k = key(right_row, right_keys)
+                if k is not None:
+                    table.setdefault(k, []).append(right_row)
+            for row in left_data:
+                found = table.get(key(row, left_keys), [])
+                if how == 'semi':
+                    if found:
+                        rows.append(dict(row))
+                elif found:
+                    rows.extend(merge(row, r) for r in found)
+                elif how == 'left':
+                    rows.append(merge(row, None))
+
+        fields = left_fields if how == 'semi' else left_fields + right_fields
+        res = QBQueryResponse()
+        res.update({
+            'data': rows,
+            'fields': fields,
+            'metadata': {'totalRecords': len(rows), 'numRecords': len(rows), 'numFields': len(fields), 'skip': 0}})
+        res.ok = True
+        res.status_code = 200
+        res.operations = list(self.operations) + ['join']
+        return res
+
+    def save(self, path: str):
+        """
+        Saves the response to a binary columnar snapshot, see load().
+        Values must be JSON values, datetimes, dates or Decimals, other types raise ValueError.
+        :param path: file path
+        """
+        from quickbase_json.snapshot import save_snapshot
+        save_snapshot(path, self.get('data') or [], self.get('fields'), self.get('metadata'), self.operations)
+
+    @classmethod
+    def load(cls, path: str, columns: list = None):
+        """
+        Loads a response saved with save().  The file is memory-mapped and only the columns loaded are read,
+        pass columns to load some of them, without it every column is decoded.
+        :param path: file path
+        :param columns: optional list of field ids to load, i.e. [3, 6]
+        :return: QBQueryResponse
+        """
+        from quickbase_json.snapshot import Snapshot
+        with Snapshot(path) as snap:
+            header = snap.header
+            data = snap.records(columns)
+
+        fields = header.get('fields')
+        if columns is not None and fields:
+            keep = {str(k) for k in columns}
+            fields = [f for f in fields if str(f.get('id')) in keep]
+        res = cls()
+        res.update({'data': data, 'fields': fields, 'metadata': header.get('metadata')})
+        res.operations = header.get('operations', [])
+        res.ok = True
+        res.status_code = 200
+        return res
+
     def currency(self, currency_type):
         return self
 
@@ -229,7 +380,7 @@ class QBQueryResponse(QBResponse):
             data = self.get('data')
             fields = self.get('fields')
 
-            fields_dict = {i['id']: i for i in fields}
+            fields_dict = {str(i['id']): i for i in fields}
 
             # replace record id numbers with record labels
             records = []
@@ -237,7 +388,7 @@ class QBQueryResponse(QBResponse):
                 record = {}
                 for k, v in d.items():
                     record.update({
-                        fields_dict[int(k)].get('label'): v if v.get('value') is None else v.get('value')
+                        fields_dict[str(k)].get('label'): v if v.get('value') is None else v.get('value')
                     })
 
                 records.append(record)
@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket, allowing a number of requests per period of seconds.
+    Quickbase allows 100 requests per 10 seconds per user token.
+    """
+
+    def __init__(self, requests: int = 100, seconds: float = 10.0):
+        """
+        Initializes the rate limiter.
+        :param requests: number of requests allowed per period
+        :param seconds: length of period in seconds
+        """
+        self.capacity = float(requests)
+        self.rate = requests / seconds
+        self._tokens = float(requests)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def wait_time(self) -> float:
+        """
+        Seconds until a request can be made.
+        :return: float
+        """
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a request from the budget, if one is available.
+        :return: bool
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Takes a request from the budget, waiting until one is available.
+        :param timeout: max seconds to wait, waits forever if None
+        :return: bool, False if the timeout passed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            wait = self.wait_time()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.001))
+        return True
@@ -0,0 +1,227 @@
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from decimal import Decimal
+
+MAGIC = b'QJSNAP1\n'
+HEADER = struct.Struct('<Q')
+
+# mask values, per row of a column
+VALUE, NULL, ABSENT = 0, 1, 2
+
+# placeholder for a key missing from a record
+_MISSING = object()
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _datetime_parts(v: datetime.datetime) -> list:
+    # parts, not isoformat(), so they can be read back without fromisoformat() (Python 3.7+)
+    offset = v.utcoffset()
+    return [v.year, v.month, v.day, v.hour, v.minute, v.second, v.microsecond,
+            None if offset is None else offset.days * 86400 + offset.seconds]
+
+
+def _from_datetime_parts(parts: list) -> datetime.datetime:
+    tz = None if parts[7] is None else datetime.timezone(datetime.timedelta(seconds=parts[7]))
+    return datetime.datetime(*parts[:7], tzinfo=tz)
+
+
+# values that are not JSON, stored as JSON of (encode, decode), time zones are kept as a fixed utc offset
+TYPED = {
+    'datetime': (lambda v: isinstance(v, datetime.datetime), _datetime_parts, _from_datetime_parts),
+    'date': (lambda v: type(v) is datetime.date, lambda v: [v.year, v.month, v.day], lambda p: datetime.date(*p)),
+    'decimal': (lambda v: isinstance(v, Decimal), str, Decimal),
+}
+
+
+def _encode_column(cells: list) -> tuple:
+    """
+    Encodes a column of cells.
+    :param cells: list of cells, {"value": x}, x, or _MISSING
+    :return: tuple of (column info, list of blocks)
+    """
+    present = [c for c in cells if c is not _MISSING]
+    nested = bool(present) and all(isinstance(c, dict) and 'value' in c for c in present)
+    values = [None if c is _MISSING else c.get('value') if nested else c for c in cells]
+    mask = bytes(ABSENT if c is _MISSING else NULL if v is None else VALUE for c, v in zip(cells, values))
+
+    non_null = [v for v in values if v is not None]
+    if non_null and all(type(v) is int and INT64_MIN <= v <= INT64_MAX for v in non_null):
+        encoding, body = 'int', array('q', [0 if v is None else v for v in values]).tobytes()
+    elif non_null and all(type(v) in (int, float) for v in non_null) and any(type(v) is float for v in non_null):
+        if any(type(v) is int for v in non_null):
+            # mixed ints and floats would come back as floats
+            encoding, body = 'json', json.dumps(values, separators=(',', ':')).encode('utf-8')
+        else:
+            encoding, body = 'float', array('d', [0.0 if v is None else v for v in values]).tobytes()
+    else:
+        encoding = next((name for name, (match, _, _) in TYPED.items() if non_null and all(map(match, non_null))),
+                        'json')
+        if encoding != 'json':
+            encode = TYPED[encoding][1]
+            values = [None if v is None else encode(v) for v in values]
+        try:
+            body = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            # values are not turned into strings, they would load back as a different type
+            raise ValueError(f'Can not save values of this column ({e})') from None
+
+    info = {'encoding': encoding, 'nested': nested, 'length': len(body)}
+    blocks = [body]
+    if any(mask):
+        info['mask'] = len(mask)
+        blocks.append(mask)
+    return info, blocks
+
+
+def save_snapshot(path: str, data: list, fields: list = None, metadata: dict = None, operations: list = None):
+    """
+    Writes records to a columnar snapshot: a magic string, the length of a JSON header
+    (fields, metadata and column offsets), then one block per column and its null mask.
+    :param path: file path
+    :param data: list of record dicts
+    :param fields: fields of the response
+    :param metadata: metadata of the response
+    :param operations: operations applied to the response
+    """
+    if not isinstance(data, list):
+        raise ValueError('Only the default orientation (a list of records) can be saved')
+
+    keys = []
+    for record in data:
+        for k in record:
+            if k not in keys:
+                keys.append(k)
+
+    columns, blocks, offset = [], [], 0
+    for k in keys:
+        try:
+            info, column_blocks = _encode_column([record.get(k, _MISSING) for record in data])
+        except ValueError as e:
+            raise ValueError(f'Column "{k}": {e}') from None
+        info.update({'key': str(k), 'offset': offset})
+        offset += sum(len(b) for b in column_blocks)
+        columns.append(info)
+        blocks.extend(column_blocks)
+
+    header = json.dumps({
+        'records': len(data),
+        'byteorder': sys.byteorder,
+        'columns': columns,
+        'fields': fields,
+        'metadata': metadata,
+        'operations': operations or []}, default=str).encode('utf-8')
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(header)))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """
+    Memory-mapped snapshot written by QBQueryResponse.save().
+    Columns are decoded on first use, only the bytes of columns that are read are touched.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can not be mapped
+            self._file.close()
+            raise ValueError(f'"{path}" is not a snapshot')
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'"{path}" is not a snapshot')
+        start = len(MAGIC) + HEADER.size
+        (length,) = HEADER.unpack(self._mmap[len(MAGIC):start])
+        self.header = json.loads(self._mmap[start:start + length])
+        self._base = start + length
+        self.columns = {c['key']: c for c in self.header['columns']}
+        self._decoded = {}
+
+    @property
+    def keys(self) -> list:
+        return list(self.columns)
+
+    def __len__(self):
+        return self.header['records']
+
+    def _values(self, info: dict) -> list:
+        start = self._base + info['offset']
+        body = self._mmap[start:start + info['length']]
+        if info['encoding'] == 'json':
+            return json.loads(body)
+        if info['encoding'] in TYPED:
+            decode = TYPED[info['encoding']][2]
+            return [None if v is None else decode(v) for v in json.loads(body)]
+        values = array('q' if info['encoding'] == 'int' else 'd')
+        values.frombytes(body)
+        if self.header['byteorder'] != sys.byteorder:
+            values.byteswap()
+        return values.tolist()
+
+    def column(self, key: str) -> list:
+        """
+        Gets the values of a column, None where null or absent.
+        :param key: field id, i.e. '6'
+        :return: list
+        """
+        key = str(key)
+        if key not in self._decoded:
+            info = self.columns[key]
+            values = self._values(info)
+            mask = self._mask(info)
+            if mask is not None:
+                values = [None if m else v for v, m in zip(values, mask)]
+            self._decoded[key] = values
+        return self._decoded[key]
+
+    def _mask(self, info: dict):
+        if 'mask' not in info:
+            return None
+        start = self._base + info['offset'] + info['length']
+        return self._mmap[start:start + info['mask']]
+
+    def records(self, columns: list = None) -> list:
+        """
+        Rebuilds records with some or all columns.
+        :param columns: list of field ids, all columns if not given
+        :return: list of record dicts
+        """
+        keys = [str(k) for k in columns] if columns is not None else self.keys
+        for k in keys:
+            if k not in self.columns:
+                raise KeyError(f'Column "{k}" is not in the snapshot, columns: {self.keys}')
+        records = [{} for _ in range(len(self))]
+        for k in keys:
+            info = self.columns[k]
+            mask = self._mask(info)
+            for i, value in enumerate(self.column(k)):
+                if mask is not None and mask[i] == ABSENT:
+                    continue
+                records[i][k] = {'value': value} if info['nested'] else value
+        return records
+
+    def close(self):
+        self._decoded = {}
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
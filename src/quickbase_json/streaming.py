@@ -0,0 +1,190 @@
+import base64
+import json
+import re
+import urllib.parse
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def drop_null_values(record: dict) -> dict:
+    """
+    Returns a copy of a record without any fields that have a null value.
+    :param record: record dict, i.e. {"6": {"value": 'example'}, "7": {"value": None}}
+    :return: dict
+    """
+    return {k: v for k, v in record.items() if not (isinstance(v, dict) and v.get('value', None) is None)}
+
+
+def iter_upsert_body(table: str, records: any, chunk_size: int = DEFAULT_CHUNK_SIZE, drop_nulls: bool = True,
+                     serialize: callable = None, **kwargs):
+    """
+    Serializes an upsert request body incrementally, yielding encoded chunks of roughly chunk_size bytes.
+    Only one record (plus the current chunk) is held in memory at a time.
+    :param table: table to add records to
+    :param records: any iterable or generator of record dicts
+    :param chunk_size: size in bytes of yielded chunks
+    :param drop_nulls: drop fields with a null value while serializing, the caller's records are not mutated.
+    :param serialize: optional callable(record) returning a record's JSON text, i.e. RecordEncoder.dumps.
+    drop_nulls is left to it.
+    :param kwargs: optional request parameters, i.e. mergeFieldId, fieldsToReturn
+    :return: generator of bytes
+    """
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    head = {'to': table}
+    head.update(kwargs)
+
+    buffer = [encoder.encode(head)[:-1], ',"data":[']
+    size = sum(len(b) for b in buffer)
+    first = True
+
+    for record in records:
+        if serialize is not None:
+            piece = serialize(record)
+        else:
+            if drop_nulls:
+                record = drop_null_values(record)
+            piece = encoder.encode({str(k): v for k, v in record.items()})
+        if not first:
+            piece = ',' + piece
+        first = False
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+
+    buffer.append(']}')
+    yield ''.join(buffer).encode('utf-8')
+
+
+class Base64StreamDecoder:
+    """
+    Incrementally decodes base64 text, fed in arbitrarily sized chunks.
+    """
+
+    def __init__(self):
+        self._remainder = b''
+
+    def decode(self, chunk: any) -> bytes:
+        """
+        Decodes as much of the given chunk as possible, buffering any incomplete quantum.
+        :param chunk: str or bytes of base64 text
+        :return: decoded bytes
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode('ascii')
+        data = self._remainder + b''.join(chunk.split())
+        usable = len(data) - len(data) % 4
+        self._remainder = data[usable:]
+        return base64.b64decode(data[:usable], validate=True)
+
+    def flush(self) -> bytes:
+        """
+        Decodes whatever is left in the buffer.
+        :return: decoded bytes
+        """
+        data, self._remainder = self._remainder, b''
+        if not data:
+            return b''
+        # tolerate missing padding at the end of the stream
+        return base64.b64decode(data + b'=' * (-len(data) % 4), validate=True)
+
+
+class DownloadResult:
+    """
+    Result of a streamed file download.
+    """
+
+    def __init__(self, name: str, size: int, checksum: str, algorithm: str, path: str = None, resumed_from: int = 0):
+        self.name = name
+        self.size = size
+        self.checksum = checksum
+        self.algorithm = algorithm
+        self.path = path
+        self.resumed_from = resumed_from
+
+    def __str__(self):
+        return f'DownloadResult: "{self.name}" ({self.size} bytes, {self.algorithm}: {self.checksum})'
+
+
+def file_name_from_headers(headers) -> str:
+    """
+    Gets a cleaned file name from a files API response's content-disposition header.
+    :param headers: response headers
+    :return: str or None
+    """
+    disposition = headers.get('content-disposition') or ''
+    if "''" not in disposition:
+        return None
+    return re.sub('[^a-zA-Z0-9 \n]', '_', urllib.parse.unquote(disposition.split("''")[1]))
+
+
+def write_base64_stream(response: any, fileobj: any, hasher: any = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Decodes a base64 response body in chunks, writing decoded bytes to a file-like object.
+    :param response: streamed response object, supporting iter_content()
+    :param fileobj: writable binary file-like object
+    :param hasher: optional hashlib object, updated with every decoded chunk
+    :param chunk_size: size of chunks read from the response
+    :return: number of decoded bytes written
+    """
+    decoder = Base64StreamDecoder()
+    written = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        decoded = decoder.decode(chunk)
+        if decoded:
+            fileobj.write(decoded)
+            written += len(decoded)
+            if hasher is not None:
+                hasher.update(decoded)
+    decoded = decoder.flush()
+    if decoded:
+        fileobj.write(decoded)
+        written += len(decoded)
+        if hasher is not None:
+            hasher.update(decoded)
+    return written
+
+
+def iter_base64(fileobj: any, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Base64 encodes a binary stream in chunks.
+    :param fileobj: readable binary file-like object
+    :param chunk_size: approximate size of encoded chunks, rounded to a whole base64 quantum
+    :return: generator of bytes
+    """
+    read_size = max(3, chunk_size // 4 * 3)
+    pending = b''
+    while True:
+        block = fileobj.read(read_size)
+        if not block:
+            break
+        pending += block
+        usable = len(pending) - len(pending) % 3
+        if usable:
+            yield base64.b64encode(pending[:usable])
+            pending = pending[usable:]
+    if pending:
+        yield base64.b64encode(pending)
+
+
+def iter_upload_xml(credential: str, rid: int, fid: int, filename: str, fileobj: any,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, credential_tag: str = 'usertoken'):
+    """
+    Generates an API_UploadFile XML request around a chunked base64 encoding of a binary stream.
+    :param credential: user token (or ticket) used to authenticate
+    :param rid: record id
+    :param fid: field id
+    :param filename: filename to save as on quickbase
+    :param fileobj: readable binary file-like object
+    :param chunk_size: approximate size of yielded chunks
+    :param credential_tag: xml tag for the credential, 'usertoken' or 'ticket'
+    :return: generator of bytes
+    """
+    from xml.sax.saxutils import escape, quoteattr
+    yield (f'<qdbapi><{credential_tag}>{escape(str(credential))}</{credential_tag}>'
+           f'<rid>{escape(str(rid))}</rid>'
+           f'<field fid={quoteattr(str(fid))} filename={quoteattr(str(filename))}>').encode('utf-8')
+    yield from iter_base64(fileobj, chunk_size=chunk_size)
+    yield b'</field></qdbapi>'
@@ -0,0 +1,3 @@
+from quickbase_json.testing.server import MockQuickbaseServer
+from quickbase_json.testing.store import TableStore, MockTable
+from quickbase_json.testing.webhooks import sample_webhook, post_webhook
@@ -0,0 +1,419 @@
+import collections
+import json
+import math
+import threading
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from http.server import BaseHTTPRequestHandler
+
+from quickbase_json.testing.store import TableStore, QueryError, KEY_FID
+from quickbase_json.webhooks import ThreadingHTTPServer
+
+DEFAULT_MAX_PAYLOAD_BYTES = 10 * 1024 * 1024
+DEFAULT_PAGE_SIZE = 1000
+
+
+class MockQuickbaseServer:
+    """
+    Local stand-in for the Quickbase JSON API, backed by an in-memory TableStore.
+    Runs on a background thread, point a client at it with base_url=server.url (or use server.client()).
+    """
+
+    def __init__(self, store: TableStore = None, host: str = '127.0.0.1', port: int = 0, latency: any = 0.0, **kwargs):
+        """
+        Initializes the mock server.
+        :param store: TableStore to serve, a new empty store is created if not given
+        :param host: host to bind to
+        :param port: port to bind to, 0 picks a free port
+        :param latency: seconds to sleep before every response. Float or callable(method, path) returning a float.
+        :param kwargs: 'max_payload_bytes', requests with larger bodies get a 413.
+        'page_size', max records returned by a single query when no 'top' is given.
+        'max_response_bytes', queries stop adding records once a response reaches this size.
+        'rate_limit', tuple of (requests, seconds) allowed per user token before responding with 429.
+        'tokens', iterable of accepted user tokens, any token is accepted if not given.
+        'ranges', set to False to ignore Range headers on file downloads.
+        'users', dict of username to password accepted by API_Authenticate, any login is accepted if not given.
+        """
+        self.store = store if store is not None else TableStore()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.max_payload_bytes = kwargs.get('max_payload_bytes', DEFAULT_MAX_PAYLOAD_BYTES)
+        self.page_size = kwargs.get('page_size', DEFAULT_PAGE_SIZE)
+        self.max_response_bytes = kwargs.get('max_response_bytes', None)
+        self.rate_limit = kwargs.get('rate_limit', None)
+        self.tokens = set(kwargs.get('tokens')) if kwargs.get('tokens') else None
+        self.ranges = kwargs.get('ranges', True)
+        self.users = kwargs.get('users', None)
+
+        self.stats = collections.Counter()
+        self.log = []
+        self._faults = []
+        self._windows = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    """
+    Lifecycle
+    """
+
+    def start(self):
+        """
+        Starts serving on a background thread.
+        :return: self
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.mock = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='qjac-mock-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def root_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    @property
+    def url(self):
+        return f'{self.root_url}/v1'
+
+    def client(self, auth: str = 'mock-token', **kwargs):
+        """
+        Creates a client pointed at this server.
+        :param auth: user token
+        :param kwargs: passed to QuickbaseJSONClient
+        :return: QuickbaseJSONClient
+        """
+        from quickbase_json.client import QuickbaseJSONClient
+        return QuickbaseJSONClient(realm='mock', auth=auth, base_url=self.url, realm_url=self.root_url, **kwargs)
+
+    """
+    Fault injection
+    """
+
+    def inject(self, status: int = 429, count: int = 1, path: str = None, **kwargs):
+        """
+        Makes the next matching requests fail with the given status.
+        :param status: http status code to respond with
+        :param count: number of requests to fail
+        :param path: only fail requests whose path starts with this, i.e. '/v1/records'
+        :param kwargs: 'retry_after', seconds sent in the Retry-After header of 429 responses.
+        """
+        with self._lock:
+            for _ in range(count):
+                self._faults.append({'status': status, 'path': path, 'retry_after': kwargs.get('retry_after', 1)})
+
+    def _take_fault(self, path):
+        with self._lock:
+            for i, fault in enumerate(self._faults):
+                if fault['path'] is None or path.startswith(fault['path']):
+                    return self._faults.pop(i)
+        return None
+
+    def _throttled(self, token):
+        """Sliding window rate limit per token, returns seconds until a slot frees up, or 0."""
+        if not self.rate_limit:
+            return 0
+        limit, window = self.rate_limit
+        now = time.monotonic()
+        with self._lock:
+            stamps = self._windows[token]
+            while stamps and now - stamps[0] >= window:
+                stamps.popleft()
+            if len(stamps) >= limit:
+                return window - (now - stamps[0])
+            stamps.append(now)
+        return 0
+
+    def _delay(self, method, path):
+        delay = self.latency(method, path) if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+
+    """
+    Endpoints
+    """
+
+    def query(self, body: dict):
+        table = self.store.get(body.get('from'))
+        select = body.get('select') or []
+        options = body.get('options') or {}
+        skip = int(options.get('skip', 0))
+        top = int(options.get('top', 0)) or self.page_size
+        top = min(top, self.page_size)
+
+        with self.store.lock:
+            rows = table.query(body.get('where', ''), body.get('sortBy'))
+            total = len(rows)
+            page = []
+            size = 0
+            for row in rows[skip:skip + top]:
+                record = {str(fid): dict(row.get(str(fid), {'value': None})) for fid in select}
+                if self.max_response_bytes:
+                    size += len(json.dumps(record))
+                    if page and size > self.max_response_bytes:
+                        break
+                page.append(record)
+            fields = [table.field_info(fid) for fid in select]
+
+        return 200, {
+            'data': page,
+            'fields': fields,
+            'metadata': {
+                'totalRecords': total,
+                'numRecords': len(page),
+                'numFields': len(select),
+                'skip': skip,
+            }
+        }
+
+    def upsert(self, body: dict):
+        table = self.store.get(body.get('to'))
+        merge_fid = int(body.get('mergeFieldId', KEY_FID))
+        fields_to_return = body.get('fieldsToReturn') or []
+        created, updated, unchanged, data, line_errors = [], [], [], [], {}
+
+        with self.store.lock:
+            for line, record in enumerate(body.get('data') or [], start=1):
+                try:
+                    rid, status = table.upsert(record, merge_fid=merge_fid)
+                except QueryError as e:
+                    line_errors[str(line)] = [e.message]
+                    continue
+                {'created': created, 'updated': updated, 'unchanged': unchanged}[status].append(rid)
+                if fields_to_return:
+                    stored = table.records[rid]
+                    data.append({str(fid): dict(stored.get(str(fid), {'value': None})) for fid in fields_to_return})
+
+        metadata = {
+            'createdRecordIds': created,
+            'updatedRecordIds': updated,
+            'unchangedRecordIds': unchanged,
+            'totalNumberOfRecordsProcessed': len(created) + len(updated) + len(unchanged),
+        }
+        if line_errors:
+            metadata['lineErrors'] = line_errors
+        return (207 if line_errors else 200), {'data': data, 'metadata': metadata}
+
+    def delete(self, body: dict):
+        table = self.store.get(body.get('from'))
+        with self.store.lock:
+            return 200, {'numberDeleted': table.delete(body.get('where', ''))}
+
+    @staticmethod
+    def _field(field: dict) -> dict:
+        # getFields names the type 'fieldType', runQuery metadata 'type'
+        field = dict(field)
+        field['fieldType'] = field.pop('type')
+        return field
+
+    def fields(self, params: dict, fid: str = None):
+        table = self.store.get(params.get('tableId'))
+        if fid is None:
+            return 200, [self._field(f) for f in table.fields.values()]
+        field = table.fields.get(int(fid))
+        if field is None:
+            return 404, {'message': 'Field not found', 'description': f'Field {fid} does not exist.'}
+        field = self._field(field)
+        field['properties'] = dict(field.get('properties') or {})
+        field['properties'].setdefault('choices', [])
+        return 200, field
+
+    def tables(self, method: str, params: dict, body: dict, table_id: str = None):
+        app_id = params.get('appId')
+        if method == 'POST':
+            table = self.store.add_table(name=(body or {}).get('name'), app_id=app_id)
+            return 200, {'id': table.id, 'name': table.name, 'alias': f'_DBID_{table.name.upper()}'}
+        if table_id is not None:
+            table = self.store.get(table_id)
+            return 200, {'id': table.id, 'name': table.name}
+        return 200, [{'id': t.id, 'name': t.name} for t in self.store.tables.values() if t.app_id == app_id]
+
+    def file(self, table_id: str, rid: str, fid: str, version: str, range_header: str = None):
+        table = self.store.get(table_id)
+        f = table.file(int(rid), int(fid), int(version))
+        if f is None:
+            return 404, {'message': 'File not found', 'description': 'Bad file version or record.'}, None
+        headers = {'Content-Disposition': f"attachment; filename*=UTF-8''{urllib.parse.quote(f['fileName'])}"}
+        content = f['data'].encode('ascii')
+        if range_header and range_header.startswith('bytes=') and self.ranges:
+            start = int(range_header[len('bytes='):].split('-')[0])
+            headers['Content-Range'] = f'bytes {start}-{len(content) - 1}/{len(content)}'
+            return 206, content[start:], headers
+        return 200, content, headers
+
+    def xml_api(self, tbid: str, action: str, params: dict, raw: bytes):
+        """
+        Minimal XML API, supporting API_Authenticate and API_UploadFile.
+        :return: tuple of (errcode, errtext, dict of extra response elements)
+        """
+        if action == 'API_Authenticate':
+            username = params.get('username')
+            if not username or (self.users is not None and self.users.get(username) != params.get('password')):
+                return 20, 'Unknown username/password', {}
+            with self._lock:
+                self.stats['authenticate'] += 1
+                ticket = f'mock-ticket-{username}-{self.stats["authenticate"]}'
+            return 0, 'No error', {'ticket': ticket, 'userid': username}
+        if action != 'API_UploadFile':
+            return 4, f'Action "{action}" is not supported by the mock server.', {}
+        root = ET.fromstring(raw)
+        if not (root.findtext('usertoken') or root.findtext('ticket')):
+            return 4, 'User not authorized', {}
+        table = self.store.get(tbid)
+        rid = int(root.findtext('rid'))
+        with self.store.lock:
+            if rid not in table.records:
+                return 30, 'No record with specified record ID', {}
+            for field in root.findall('field'):
+                table.upsert({'3': {'value': rid}, field.get('fid'): {
+                    'value': {'fileName': field.get('filename'), 'data': ''.join((field.text or '').split())}}})
+        return 0, 'No error', {}
+
+    def route(self, method: str, path: str, params: dict, body: any, headers: dict = None):
+        """
+        Dispatches a request to an endpoint.
+        :return: tuple of (status, payload, extra headers)
+        """
+        parts = [p for p in path.split('/') if p]
+        if parts[:1] != ['v1']:
+            return 404, {'message': 'Not found', 'description': path}, None
+        parts = parts[1:]
+
+        if parts == ['records', 'query'] and method == 'POST':
+            return self.query(body) + (None,)
+        if parts == ['records'] and method == 'POST':
+            return self.upsert(body) + (None,)
+        if parts == ['records'] and method == 'DELETE':
+            return self.delete(body) + (None,)
+        if parts[:1] == ['fields'] and method == 'GET':
+            return self.fields(params, fid=parts[1] if len(parts) > 1 else None) + (None,)
+        if parts[:1] == ['tables'] and method in ('GET', 'POST'):
+            return self.tables(method, params, body, table_id=parts[1] if len(parts) > 1 else None) + (None,)
+        if parts[:1] == ['files'] and len(parts) == 5 and method == 'GET':
+            return self.file(*parts[1:], range_header=(headers or {}).get('Range'))
+        return 404, {'message': 'Not found', 'description': f'{method} {path}'}, None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status: int, payload: any, headers: dict = None):
+        if isinstance(payload, (bytes, bytearray)):
+            content = bytes(payload)
+            content_type = 'application/octet-stream'
+        else:
+            content = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json'
+        headers = dict(headers or {})
+        content_type = headers.pop('Content-Type', content_type)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(content)
+        mock = self.server.mock
+        with mock._lock:
+            mock.stats['bytes_out'] += len(content)
+            mock.stats[f'status_{status}'] += 1
+
+    def _handle(self, method):
+        mock = self.server.mock
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        raw = self._read_body()
+
+        with mock._lock:
+            mock.stats['requests'] += 1
+            mock.stats['bytes_in'] += len(raw)
+            mock.log.append((method, url.path))
+
+        mock._delay(method, url.path)
+
+        if url.path.startswith('/db/'):
+            action = self.headers.get('QUICKBASE-ACTION') or params.get('a')
+            try:
+                errcode, errtext, extra = mock.xml_api(url.path.split('/')[2], action, params, raw)
+            except (KeyError, ValueError, ET.ParseError) as e:
+                errcode, errtext, extra = 2, f'Invalid input: {e}', {}
+            elements = ''.join(f'<{k}>{escape(str(v))}</{k}>' for k, v in extra.items())
+            content = (f'<?xml version="1.0" ?><qdbapi><action>{action}</action>'
+                       f'<errcode>{errcode}</errcode><errtext>{escape(errtext)}</errtext>{elements}</qdbapi>')
+            return self._send(200, content.encode('utf-8'), {'Content-Type': 'application/xml'})
+
+        authorization = self.headers.get('Authorization', '')
+        token = authorization.split(' ', 1)[-1] if ' ' in authorization else ''
+        if not token or (mock.tokens is not None and token not in mock.tokens):
+            return self._send(401, {'message': 'Unauthorized', 'description': 'Invalid or missing user token.'})
+
+        fault = mock._take_fault(url.path)
+        if fault is not None:
+            headers = {'Retry-After': str(fault['retry_after'])} if fault['status'] == 429 else None
+            return self._send(fault['status'], {'message': 'Injected fault', 'description': 'mock'}, headers)
+
+        wait = mock._throttled(token)
+        if wait:
+            with mock._lock:
+                mock.stats['throttled'] += 1
+            return self._send(429, {'message': 'Too Many Requests', 'description': 'Rate limit exceeded.'},
+                              {'Retry-After': str(max(1, math.ceil(wait)))})
+
+        if len(raw) > mock.max_payload_bytes:
+            return self._send(413, {'message': 'Payload Too Large',
+                                    'description': f'Request body exceeds {mock.max_payload_bytes} bytes.'})
+
+        try:
+            body = json.loads(raw) if raw else None
+            status, payload, headers = mock.route(method, url.path, params, body, headers=self.headers)
+        except KeyError as e:
+            status, payload, headers = 404, {'message': 'Not found', 'description': f'Table {e} does not exist.'}, None
+        except (QueryError, ValueError) as e:
+            status, payload, headers = 400, {'message': 'Bad Request', 'description': str(e)}, None
+        self._send(status, payload, headers)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
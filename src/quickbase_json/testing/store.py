@@ -0,0 +1,304 @@
+import re
+import threading
+
+KEY_FID = 3
+
+DEFAULT_FIELDS = [
+    {'id': 1, 'label': 'Date Created', 'type': 'timestamp'},
+    {'id': 2, 'label': 'Date Modified', 'type': 'timestamp'},
+    {'id': 3, 'label': 'Record ID#', 'type': 'recordid'},
+    {'id': 4, 'label': 'Record Owner', 'type': 'user'},
+    {'id': 5, 'label': 'Last Modified By', 'type': 'user'},
+]
+
+# matches a single query term, i.e. {6.EX."value"}
+TERM_RE = re.compile(r'\{\s*(\d+)\s*\.\s*([A-Z]+)\s*\.\s*(.*?)\}(?=\s*(?:AND|OR|\)|$))', re.DOTALL)
+
+
+class QueryError(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _unquote(value: str):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return value
+
+
+def _as_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compare(operator: str, actual, expected: str):
+    """Evaluates a single query operator against a stored value."""
+    if isinstance(actual, dict):
+        actual = actual.get('fileName', actual.get('name', ''))
+    text = '' if actual is None else str(actual)
+    a_num, e_num = _as_number(actual), _as_number(expected)
+
+    if operator in ('EX', 'XEX'):
+        if a_num is not None and e_num is not None:
+            result = a_num == e_num
+        else:
+            result = text.lower() == expected.lower()
+        return result if operator == 'EX' else not result
+    if operator in ('CT', 'XCT'):
+        result = expected.lower() in text.lower()
+        return result if operator == 'CT' else not result
+    if operator in ('SW', 'XSW'):
+        result = text.lower().startswith(expected.lower())
+        return result if operator == 'SW' else not result
+    if operator in ('HAS', 'XHAS'):
+        values = actual if isinstance(actual, list) else [actual]
+        result = expected in [str(v) for v in values]
+        return result if operator == 'HAS' else not result
+    if operator in ('LT', 'LTE', 'GT', 'GTE', 'BF', 'OBF', 'AF', 'OAF'):
+        if actual is None:
+            return False
+        if a_num is not None and e_num is not None:
+            a, e = a_num, e_num
+        else:
+            a, e = text, expected
+        return {
+            'LT': a < e, 'BF': a < e,
+            'LTE': a <= e, 'OBF': a <= e,
+            'GT': a > e, 'AF': a > e,
+            'GTE': a >= e, 'OAF': a >= e,
+        }[operator]
+    raise QueryError(f'Operator "{operator}" is not supported by the mock server.')
+
+
+def compile_where(where: str):
+    """
+    Compiles a Quickbase query string into a predicate, taking a record dict of {fid_str: {'value': ...}}.
+    Supports terms joined by AND/OR (AND binds tighter) and parentheses.
+    :param where: quickbase query string
+    :return: callable
+    """
+    where = (where or '').strip()
+    if not where:
+        return lambda record: True
+
+    tokens = []
+    pos = 0
+    while pos < len(where):
+        if where[pos].isspace():
+            pos += 1
+        elif where[pos] in '()':
+            tokens.append(where[pos])
+            pos += 1
+        elif where.startswith('AND', pos):
+            tokens.append('AND')
+            pos += 3
+        elif where.startswith('OR', pos):
+            tokens.append('OR')
+            pos += 2
+        else:
+            m = TERM_RE.match(where, pos)
+            if not m:
+                raise QueryError(f'Invalid query near: {where[pos:pos + 32]}')
+            tokens.append((m.group(1), m.group(2), _unquote(m.group(3))))
+            pos = m.end()
+
+    def parse_or(i):
+        left, i = parse_and(i)
+        while i < len(tokens) and tokens[i] == 'OR':
+            right, i = parse_and(i + 1)
+            left = (lambda l, r: lambda rec: l(rec) or r(rec))(left, right)
+        return left, i
+
+    def parse_and(i):
+        left, i = parse_atom(i)
+        while i < len(tokens) and tokens[i] == 'AND':
+            right, i = parse_atom(i + 1)
+            left = (lambda l, r: lambda rec: l(rec) and r(rec))(left, right)
+        return left, i
+
+    def parse_atom(i):
+        if i >= len(tokens):
+            raise QueryError('Unexpected end of query.')
+        token = tokens[i]
+        if token == '(':
+            inner, i = parse_or(i + 1)
+            if i >= len(tokens) or tokens[i] != ')':
+                raise QueryError('Unbalanced parentheses in query.')
+            return inner, i + 1
+        if isinstance(token, tuple):
+            fid, operator, value = token
+
+            def predicate(rec, fid=fid, operator=operator, value=value):
+                return _compare(operator, rec.get(fid, {}).get('value'), value)
+
+            return predicate, i + 1
+        raise QueryError(f'Unexpected token "{token}" in query.')
+
+    predicate, end = parse_or(0)
+    if end != len(tokens):
+        raise QueryError('Unexpected trailing tokens in query.')
+    return predicate
+
+
+class MockTable:
+    """
+    An in-memory Quickbase table.
+    """
+
+    def __init__(self, table_id: str, name: str = None, fields: list = None, app_id: str = 'mockapp'):
+        self.id = table_id
+        self.name = name or table_id
+        self.app_id = app_id
+        self.fields = {f['id']: dict(f) for f in DEFAULT_FIELDS}
+        for f in fields or []:
+            self.add_field(**f)
+        self.records = {}
+        self.files = {}
+        self.next_rid = 1
+
+    def add_field(self, id: int, label: str, type: str = 'text', fieldType: str = None, **properties):
+        # fields can be given as returned by getFields, with 'fieldType'
+        self.fields[int(id)] = {'id': int(id), 'label': label, 'type': fieldType or type, 'properties': properties}
+        return self.fields[int(id)]
+
+    def field_info(self, fid: int):
+        field = self.fields.get(int(fid))
+        if field is None:
+            return {'id': int(fid), 'label': str(fid), 'type': 'text'}
+        return {'id': field['id'], 'label': field['label'], 'type': field['type']}
+
+    def _store_file(self, rid: int, fid: int, value: dict):
+        versions = self.files.setdefault((rid, fid), [])
+        versions.append({
+            'versionNumber': len(versions) + 1,
+            'fileName': value.get('fileName', 'file'),
+            'data': value.get('data', ''),
+        })
+        return {
+            'url': f'/files/{self.id}/{rid}/{fid}/{len(versions)}',
+            'versions': [{'versionNumber': v['versionNumber'], 'fileName': v['fileName']} for v in versions],
+        }
+
+    def upsert(self, record: dict, merge_fid: int = KEY_FID):
+        """
+        Inserts or updates a record.
+        :return: tuple of (rid, 'created' | 'updated' | 'unchanged')
+        """
+        record = {str(k): v if isinstance(v, dict) else {'value': v} for k, v in record.items()}
+        merge_value = record.get(str(merge_fid), {}).get('value')
+        rid = None
+        if merge_value is not None:
+            if merge_fid == KEY_FID:
+                rid = int(merge_value) if int(merge_value) in self.records else None
+            else:
+                for existing_rid, existing in self.records.items():
+                    if existing.get(str(merge_fid), {}).get('value') == merge_value:
+                        rid = existing_rid
+                        break
+
+        if rid is None:
+            if merge_fid == KEY_FID and merge_value is not None:
+                raise QueryError(f'Record ID# {merge_value} does not exist.')
+            rid = self.next_rid
+            self.next_rid += 1
+            self.records[rid] = {str(KEY_FID): {'value': rid}}
+            status = 'created'
+        else:
+            status = 'unchanged'
+
+        stored = self.records[rid]
+        for fid, cell in record.items():
+            if int(fid) == KEY_FID:
+                continue
+            value = cell.get('value')
+            if self.fields.get(int(fid), {}).get('type') == 'file' and isinstance(value, dict) and 'data' in value:
+                value = self._store_file(rid, int(fid), value)
+            if stored.get(str(fid), {}).get('value') != value:
+                stored[str(fid)] = {'value': value}
+                if status == 'unchanged':
+                    status = 'updated'
+        return rid, status
+
+    def query(self, where: str = '', sort_by: list = None):
+        predicate = compile_where(where)
+        rows = [r for rid, r in sorted(self.records.items()) if predicate(r)]
+        for sorter in reversed(sort_by or []):
+            fid = str(sorter.get('fieldId'))
+            reverse = sorter.get('order', 'ASC').upper() == 'DESC'
+            rows.sort(key=lambda r: (r.get(fid, {}).get('value') is None, r.get(fid, {}).get('value')),
+                      reverse=reverse)
+        return rows
+
+    def delete(self, where: str):
+        rows = self.query(where)
+        for r in rows:
+            rid = r[str(KEY_FID)]['value']
+            del self.records[rid]
+            for key in [k for k in self.files if k[0] == rid]:
+                del self.files[key]
+        return len(rows)
+
+    def file(self, rid: int, fid: int, version: int):
+        versions = self.files.get((int(rid), int(fid)), [])
+        if version == 0 and versions:
+            return versions[-1]
+        for v in versions:
+            if v['versionNumber'] == int(version):
+                return v
+        return None
+
+
+class TableStore:
+    """
+    Thread-safe collection of in-memory tables, backing a MockQuickbaseServer.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.RLock()
+        self._next_table = 1
+
+    def add_table(self, table_id: str = None, name: str = None, fields: list = None, app_id: str = 'mockapp'):
+        """
+        Adds a table to the store.
+        :param table_id: table id, generated if not given
+        :param name: table name
+        :param fields: list of field dicts, i.e. [{'id': 6, 'label': 'Name', 'type': 'text'}]
+        :param app_id: id of app the table belongs to
+        :return: MockTable
+        """
+        with self.lock:
+            if table_id is None:
+                table_id = f'mock{self._next_table:05d}'
+                self._next_table += 1
+            table = MockTable(table_id, name=name, fields=fields, app_id=app_id)
+            self.tables[table_id] = table
+            return table
+
+    def get(self, table_id: str):
+        table = self.tables.get(table_id)
+        if table is None:
+            raise KeyError(table_id)
+        return table
+
+    def add_records(self, table_id: str, records: list):
+        """
+        Loads records into a table, values may be plain or {'value': ...} wrapped.
+        :return: list of created rids
+        """
+        with self.lock:
+            table = self.get(table_id)
+            rids = []
+            for record in records:
+                wrapped = {str(k): v if isinstance(v, dict) and 'value' in v else {'value': v}
+                           for k, v in record.items()}
+                rids.append(table.upsert(wrapped)[0])
+            return rids
@@ -0,0 +1,45 @@
+import json
+import urllib.error
+import urllib.request
+
+
+def sample_webhook(table: str, action: str, rids: list, fields: dict = None, quickbase_loop: bool = True) -> str:
+    """
+    Builds a webhook payload the way a Quickbase webhook template renders it.
+    :param table: table id
+    :param action: 'Add', 'Modify' or 'Delete'
+    :param rids: record ids
+    :param fields: optional field values sent per record, dict of rid to {fid: value}
+    :param quickbase_loop: leave the trailing comma a %%RecordsStart%% ... %%RecordsEnd%% loop renders
+    :return: str
+    """
+    records = [json.dumps(dict({'rid': rid}, **{str(k): v for k, v in (fields or {}).get(rid, {}).items()}))
+               for rid in rids]
+    body = ''.join(f'{r},' for r in records) if quickbase_loop else ','.join(records)
+    return f'{{"table": "{table}", "action": "{action}", "records": [{body}]}}'
+
+
+def post_webhook(url: str, payload: any, table: str = None, action: str = None, secret: str = None) -> tuple:
+    """
+    Posts a webhook payload to a WebhookReceiver.
+    :param url: receiver url, i.e. receiver.url
+    :param payload: str, bytes or dict
+    :param table: table id, sent in the url
+    :param action: action, sent in the url (requires table)
+    :param secret: sent in the QB-Webhook-Secret header
+    :return: tuple of (status code, response dict)
+    """
+    if isinstance(payload, dict):
+        payload = json.dumps(payload)
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    url = '/'.join([url.rstrip('/')] + [p for p in (table, action) if p])
+    headers = {'Content-Type': 'application/json'}
+    if secret is not None:
+        headers['QB-Webhook-Secret'] = secret
+    request = urllib.request.Request(url, data=payload, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
@@ -0,0 +1,287 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+# (connect, read) timeout in seconds of requests that do not set one, the read timeout applies between bytes
+DEFAULT_TIMEOUT = (10.0, 300.0)
+
+# headers that are never written to a cassette file
+SENSITIVE_HEADERS = ['authorization', 'qb-realm-hostname', 'cookie', 'set-cookie']
+
+
+class CassetteError(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Transport:
+    """
+    Default transport, sends requests over the network using the requests library.
+    Every network call made by the client goes through a transport's request() method.
+    """
+
+    def __init__(self, session=None, timeout: any = DEFAULT_TIMEOUT):
+        """
+        Initializes the transport.
+        :param session: optional requests.Session, to reuse connections between calls
+        :param timeout: default timeout of requests, seconds or tuple of (connect, read) seconds.
+        None waits forever.
+        """
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+        Sends a request.
+        :param method: http method, i.e. GET, POST, DELETE
+        :param url: url to send the request to
+        :param kwargs: any keyword arguments accepted by requests.request
+        :return: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if self.session is not None:
+            return self.session.request(method, url, **kwargs)
+        # imported on first use, requests is slow to import
+        import requests
+        return requests.request(method, url, **kwargs)
+
+
+class CassetteResponse:
+    """
+    Response served from a cassette, mimics the parts of requests.Response used by the client.
+    """
+
+    def __init__(self, status_code: int, content: bytes, headers: dict = None, url: str = '', elapsed: float = 0.0):
+        self.status_code = status_code
+        self.content = content
+        from requests.structures import CaseInsensitiveDict
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.url = url
+        self.elapsed = elapsed
+        self.encoding = 'utf-8'
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def iter_content(self, chunk_size: int = 1, decode_unicode: bool = False):
+        for i in range(0, len(self.content), chunk_size):
+            chunk = self.content[i:i + chunk_size]
+            yield chunk.decode(self.encoding) if decode_unicode else chunk
+
+    def raise_for_status(self):
+        if not self.ok:
+            import requests
+            raise requests.HTTPError(f'{self.status_code}: {self.text}', response=self)
+
+    def close(self):
+        pass
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f'<CassetteResponse [{self.status_code}]>'
+
+
+def _body_bytes(kwargs):
+    """Gets the body of a request as bytes, from the json or data keyword arguments."""
+    if kwargs.get('json') is not None:
+        return json.dumps(kwargs.get('json'), sort_keys=True, default=str).encode('utf-8')
+    data = kwargs.get('data')
+    if data is None:
+        return b''
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if isinstance(data, dict):
+        return json.dumps(data, sort_keys=True).encode('utf-8')
+    # file-like objects and generators
+    if hasattr(data, 'read'):
+        data = iter(lambda: data.read(65536), b'')
+    return b''.join(c.encode('utf-8') if isinstance(c, str) else c for c in data)
+
+
+def load_cassette(path: str) -> list:
+    """
+    Reads the interactions of a cassette file, written as JSON lines (a version header, then one
+    interaction per line) or, by older versions, as a single JSON document.
+    :param path: path of cassette file
+    :return: list of interactions
+    """
+    with open(path, 'r') as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or 'interactions' in header:
+            # a single JSON document
+            f.seek(0)
+            return json.load(f).get('interactions', [])
+        interactions = []
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                interactions.append(json.loads(line))
+            except ValueError:
+                # a partially written last line
+                break
+        return interactions
+
+
+def request_key(method: str, url: str, **kwargs):
+    """
+    Builds the key used to match a request against recorded interactions.
+    :param method: http method
+    :param url: request url
+    :param kwargs: request keyword arguments (params, json, data)
+    :return: str
+    """
+    params = kwargs.get('params') or {}
+    if isinstance(params, dict):
+        params = sorted((str(k), str(v)) for k, v in params.items())
+    body_hash = hashlib.sha1(_body_bytes(kwargs)).hexdigest()
+    return f'{method.upper()} {url} {json.dumps(params)} {body_hash}'
+
+
+class RecordingTransport(Transport):
+    """
+    Sends requests over the network, capturing every request/response pair to a cassette file.
+    Interactions are appended to the file as JSON lines, as they are recorded.
+    """
+
+    def __init__(self, path: str, session=None, **kwargs):
+        """
+        Initializes the recording transport.
+        :param path: path of cassette file to write
+        :param session: optional requests.Session
+        :param kwargs: 'overwrite' (default True), set to False to append to an existing cassette.
+        'timeout', default timeout of requests, see Transport.
+        """
+        super().__init__(session=session, timeout=kwargs.get('timeout', DEFAULT_TIMEOUT))
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+
+        if not kwargs.get('overwrite', True) and os.path.exists(path):
+            self.interactions = load_cassette(path)
+        self.save()
+
+    def request(self, method: str, url: str, **kwargs):
+        # generators and file objects can only be read once, so materialize before sending
+        body = _body_bytes(kwargs)
+        if kwargs.get('data') is not None and not isinstance(kwargs.get('data'), (str, bytes, dict)):
+            kwargs['data'] = body
+
+        key = request_key(method, url, **kwargs)
+        start = time.perf_counter()
+        r = super().request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        interaction = {
+            'key': key,
+            'request': {
+                'method': method.upper(),
+                'url': url,
+                'params': kwargs.get('params'),
+                'headers': {k: v for k, v in (kwargs.get('headers') or {}).items()
+                            if k.lower() not in SENSITIVE_HEADERS},
+            },
+            'response': {
+                'status_code': r.status_code,
+                'headers': {k: v for k, v in r.headers.items() if k.lower() not in SENSITIVE_HEADERS},
+                'body': base64.b64encode(r.content).decode(),
+                'elapsed': elapsed,
+            }
+        }
+
+        line = json.dumps(interaction) + '\n'
+        with self._lock:
+            self.interactions.append(interaction)
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+        return r
+
+    def save(self):
+        """
+        Rewrites the cassette file with every recorded interaction.
+        """
+        with self._lock:
+            with open(self.path, 'w') as f:
+                f.write(json.dumps({'version': 2}) + '\n')
+                for interaction in self.interactions:
+                    f.write(json.dumps(interaction) + '\n')
+
+
+class ReplayTransport(Transport):
+    """
+    Serves responses from a cassette file, without touching the network.
+    """
+
+    def __init__(self, path: str, latency: any = 0.0, **kwargs):
+        """
+        Initializes the replay transport.
+        :param path: path of cassette file to replay
+        :param latency: simulated latency in seconds. Float, callable returning a float, or 'recorded'
+        to sleep for the latency observed while recording.
+        :param kwargs: 'repeat' (default True), when all matching interactions have been served, keep serving the last.
+        """
+        super().__init__()
+        self.path = path
+        self.latency = latency
+        self.repeat = kwargs.get('repeat', True)
+        self.served = 0
+        self._lock = threading.Lock()
+        self._queues = {}
+
+        for interaction in load_cassette(path):
+            self._queues.setdefault(interaction['key'], []).append(interaction)
+        self._last = {}
+
+    def _sleep(self, recorded):
+        if self.latency == 'recorded':
+            delay = recorded
+        elif callable(self.latency):
+            delay = self.latency()
+        else:
+            delay = self.latency
+        if delay:
+            time.sleep(delay)
+
+    def request(self, method: str, url: str, **kwargs):
+        key = request_key(method, url, **kwargs)
+
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                interaction = queue.pop(0)
+                self._last[key] = interaction
+            elif self.repeat and key in self._last:
+                interaction = self._last[key]
+            else:
+                raise CassetteError(f'No recorded interaction for request: {method.upper()} {url}')
+            self.served += 1
+
+        recorded = interaction['response']
+        self._sleep(recorded.get('elapsed', 0.0))
+
+        return CassetteResponse(
+            status_code=recorded['status_code'],
+            content=base64.b64decode(recorded['body']),
+            headers=recorded.get('headers'),
+            url=url,
+            elapsed=recorded.get('elapsed', 0.0))
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+
+from quickbase_json.qb_response import QBQueryResponse
+
+
+def _value(cell: any) -> any:
+    """Gets the value of a cell in either raw ({"value": x}) or denested form, 5.0 and 5 are the same value."""
+    value = cell.get('value') if isinstance(cell, dict) and 'value' in cell else cell
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def value_hash(value: any) -> str:
+    """
+    Hashes a single field value.
+    :param value: cell, {"value": x} or x
+    :return: str
+    """
+    encoded = json.dumps(_value(value), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def record_hash(field_hashes: dict) -> str:
+    """
+    Hashes a record from the hashes of its fields.
+    :param field_hashes: dict of fid to value_hash()
+    :return: str
+    """
+    encoded = ','.join(f'{fid}:{h}' for fid, h in sorted(field_hashes.items()))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+class UpsertState:
+    """
+    Known current state of records in a table, as per-field value hashes keyed by the value of a merge field.
+    Used by QuickbaseJSONClient.insert_update_records_diff() to send only records and fields that changed.
+    Can be built from a QBQueryResponse, or saved to and loaded from a file between runs.
+    """
+
+    def __init__(self, merge_fid: int = 3, records: dict = None):
+        """
+        Initializes the state.
+        :param merge_fid: fid identifying records, defaults to record id
+        :param records: dict of merge value to {'hash': record hash, 'fields': {fid: value hash}}
+        """
+        self.merge_fid = str(merge_fid)
+        self.records = records or {}
+
+    @staticmethod
+    def _key(value: any) -> str:
+        return json.dumps(_value(value), default=str)
+
+    @classmethod
+    def from_response(cls, response: QBQueryResponse, merge_fid: int = 3):
+        """
+        Builds the state from query results, which must be keyed by fid (raw or denested).
+        :param response: QBQueryResponse, or list of records
+        :param merge_fid: fid identifying records, must be selected in the query
+        :return: UpsertState
+        """
+        state = cls(merge_fid)
+        data = response.get('data') if isinstance(response, dict) else response
+        if isinstance(data, dict):
+            raise ValueError('Records must be in the default orientation, not transformed to a dict')
+        for record in data or []:
+            state.update(record)
+        return state
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Loads a saved state.
+        :param path: file path
+        :return: UpsertState
+        """
+        with open(path, 'r') as f:
+            saved = json.load(f)
+        return cls(saved['merge_fid'], saved['records'])
+
+    def save(self, path: str):
+        """
+        Saves the state to a file.
+        :param path: file path
+        """
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'merge_fid': self.merge_fid, 'records': self.records}, f)
+        os.replace(tmp_path, path)
+
+    def update(self, record: dict, key: any = None):
+        """
+        Records the values of a record's fields, merged into what is already known about it.
+        :param record: record dict, keyed by fid
+        :param key: merge value, if not in the record (i.e. the record id of a created record)
+        """
+        record = {str(fid): cell for fid, cell in record.items()}
+        key = record.get(self.merge_fid) if key is None else key
+        if _value(key) is None:
+            return
+        key = self._key(key)
+        known = self.records.setdefault(key, {'hash': None, 'fields': {}})
+        known['fields'].update({str(fid): value_hash(cell) for fid, cell in record.items()})
+        known['hash'] = record_hash(known['fields'])
+
+    def diff(self, record: dict) -> any:
+        """
+        Compares a record against its known state.
+        :param record: record dict, keyed by fid
+        :return: None if nothing changed, otherwise the merge field and changed fields, or the whole record
+        if it is not known
+        """
+        record = {str(fid): cell for fid, cell in record.items()}
+        if _value(record.get(self.merge_fid)) is None:
+            return record
+        known = self.records.get(self._key(record.get(self.merge_fid)))
+        if known is None:
+            return record
+
+        hashes = {str(fid): value_hash(cell) for fid, cell in record.items()}
+        if len(hashes) == len(known['fields']) and record_hash(hashes) == known['hash']:
+            return None
+        changed = {fid: record[fid] for fid, h in hashes.items() if fid != self.merge_fid and known['fields'].get(fid) != h}
+        if not changed:
+            return None
+        return dict({self.merge_fid: record[self.merge_fid]}, **changed)
+
+    def forget(self, key: any) -> bool:
+        """
+        Forgets a record, i.e. after it was changed or deleted by someone else.  It is sent whole on the next diff.
+        :param key: merge value
+        :return: bool, True if the record was known
+        """
+        return self.records.pop(self._key(key), None) is not None
+
+    def __len__(self):
+        return len(self.records)
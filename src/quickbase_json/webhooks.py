@@ -0,0 +1,313 @@
+import collections
+import hmac
+import json
+import re
+import socketserver
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+ACTIONS = {
+    'add': 'add', 'added': 'add', 'create': 'add', 'created': 'add',
+    'modify': 'modify', 'modified': 'modify', 'update': 'modify', 'updated': 'modify',
+    'delete': 'delete', 'deleted': 'delete', 'remove': 'delete', 'removed': 'delete',
+}
+
+# keys that may hold the record id of a record in a payload
+RID_KEYS = ('rid', 'recordId', 'Record ID#', '3')
+
+# trailing comma left by a %%RecordsStart%% ... %%RecordsEnd%% loop, i.e. [{"rid": 1},]
+_TRAILING_COMMA = re.compile(r',\s*([\]}])')
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server handling each request on its own thread, http.server.ThreadingHTTPServer is Python 3.7+"""
+    daemon_threads = True
+
+
+class WebhookEvent:
+    """
+    A record add, modify or delete, parsed from a Quickbase webhook payload.
+    """
+
+    def __init__(self, table: str, action: str, rids: list, records: list = None):
+        """
+        :param table: table id
+        :param action: 'add', 'modify' or 'delete'
+        :param rids: record ids affected
+        :param records: field values sent with each record, keyed by fid, i.e. [{'3': 1, '6': 'name'}]
+        """
+        self.table = table
+        self.action = action
+        self.rids = rids
+        self.records = records or []
+
+    def __str__(self):
+        return f'WebhookEvent: {self.action} {self.table} {self.rids}'
+
+
+def _cell_value(cell: any) -> any:
+    return cell.get('value') if isinstance(cell, dict) and 'value' in cell else cell
+
+
+def parse_webhook(payload: any, table: str = None, action: str = None) -> WebhookEvent:
+    """
+    Parses a webhook payload.  Quickbase webhook bodies are templates, a JSON body such as
+    {"table": "bck7gp3q2", "action": "Modify", "records": [%%RecordsStart%%{"rid": [Record ID#], "6": "[Name]"},%%RecordsEnd%%]}
+    is expected.  A single record can be sent as {"rid": ...}, records can be ids or dicts keyed by fid.
+    :param payload: bytes, str or parsed dict
+    :param table: table id, if not in the payload (i.e. taken from the url)
+    :param action: action, if not in the payload
+    :return: WebhookEvent
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = json.loads(_TRAILING_COMMA.sub(r'\1', payload))
+    if not isinstance(payload, dict):
+        raise ValueError('Webhook payload must be a JSON object')
+
+    table = payload.get('table') or payload.get('tableId') or payload.get('dbid') or table
+    action = str(payload.get('action') or payload.get('event') or action or '').lower()
+    if not table:
+        raise ValueError('Webhook payload has no table')
+    if action not in ACTIONS:
+        raise ValueError(f'Invalid webhook action "{action}", valid actions: {sorted(set(ACTIONS.values()))}')
+
+    entries = payload.get('records')
+    if entries is None:
+        entries = payload.get('rids')
+    if entries is None:
+        entries = [payload]
+
+    rids, records = [], []
+    for entry in entries:
+        record = entry if isinstance(entry, dict) else {'3': entry}
+        rid = next((record[k] for k in RID_KEYS if _cell_value(record.get(k)) not in (None, '')), None)
+        if rid is None:
+            raise ValueError(f'Webhook record has no record id: {entry}')
+        try:
+            rid = int(_cell_value(rid))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid record id in webhook: {entry}') from None
+        values = {str(k): _cell_value(v) for k, v in record.items() if str(k).isdigit()}
+        values['3'] = rid
+        rids.append(rid)
+        records.append(values)
+    return WebhookEvent(str(table), ACTIONS[action], rids, records)
+
+
+class WebhookReceiver:
+    """
+    Small HTTP server receiving Quickbase webhooks, so client side caches are invalidated (or patched)
+    when records change instead of by polling.  Runs on a background thread.
+
+    Point Quickbase webhooks at POST <url>/<table id>/<action> (or include table and action in the payload),
+    see parse_webhook() for the expected payload.  Every event is passed to the subscribed handlers in turn.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, secret: str = None):
+        """
+        Initializes the receiver.
+        :param host: host to bind to
+        :param port: port to bind to, 0 picks a free port
+        :param secret: if given, requests must send it in a 'QB-Webhook-Secret' header or a 'secret' query param
+        """
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self.handlers = []
+        self.stats = collections.Counter()
+        self.errors = []
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    """
+    Lifecycle
+    """
+
+    def start(self):
+        """
+        Starts serving on a background thread.
+        :return: self
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.receiver = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='qjac-webhook-receiver', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}/webhooks'
+
+    """
+    Handlers
+    """
+
+    def subscribe(self, handler: callable, table: str = None):
+        """
+        Calls a handler with every event.
+        :param handler: callable(WebhookEvent)
+        :param table: only call it for events of this table
+        :return: handler
+        """
+        self.handlers.append((table, handler))
+        return handler
+
+    def handle(self, event: WebhookEvent) -> int:
+        """
+        Passes an event to the subscribed handlers, events are handled one at a time.
+        :param event: WebhookEvent
+        :return: number of handlers called
+        """
+        called = 0
+        with self._lock:
+            self.stats[event.action] += 1
+            self.stats['records'] += len(event.rids)
+            for table, handler in self.handlers:
+                if table is None or table == event.table:
+                    handler(event)
+                    called += 1
+        return called
+
+    def invalidate_files(self, cache, table: str = None):
+        """
+        Forgets cached file attachments of deleted records.  File versions never change, so modified
+        records keep their cached versions.
+        :param cache: FileCache
+        :param table: only for this table
+        """
+        def handler(event):
+            if event.action == 'delete':
+                for rid in event.rids:
+                    cache.invalidate(event.table, rid)
+        return self.subscribe(handler, table)
+
+    def invalidate_queries(self, client, table: str = None):
+        """
+        Removes queries cached with client.cache_query() for a table whenever its records change.
+        :param client: QuickbaseJSONClient
+        :param table: only for this table
+        """
+        return self.subscribe(lambda event: client.clear_query_cache(event.table), table)
+
+    def track_state(self, state, table: str):
+        """
+        Forgets modified and deleted records of an UpsertState, so they are sent whole on the next diff.
+        If records are merged on a field other than record id and the payload does not include it,
+        the whole state is cleared.
+        :param state: UpsertState
+        :param table: table the state is for
+        """
+        def handler(event):
+            if event.action == 'add':
+                return
+            for record in event.records:
+                if state.merge_fid not in record:
+                    state.records.clear()
+                    return
+                state.forget(record[state.merge_fid])
+        return self.subscribe(handler, table)
+
+    def mirror(self, response, table: str):
+        """
+        Keeps query results (in the default orientation, keyed by fid) in step with a table.  Deleted records
+        are removed, field values sent in the payload are patched in and added records are appended.
+        Changed records sent without field values can not be patched, they are removed and partial is set,
+        so the caller knows to query them again.
+        :param response: QBQueryResponse, or list of records
+        :param table: table the results are from
+        """
+        def handler(event):
+            data = response.get('data') if isinstance(response, dict) else response
+            if not isinstance(data, list):
+                raise ValueError('Only query results in the default orientation can be mirrored')
+            rows = {int(_cell_value(row.get('3'))): row for row in data if _cell_value(row.get('3')) is not None}
+            gone = set(event.rids) if event.action == 'delete' else set()
+
+            for record in event.records if event.action != 'delete' else []:
+                values = {fid: value for fid, value in record.items() if fid != '3'}
+                if not values:
+                    gone.add(record['3'])
+                    if hasattr(response, 'partial'):
+                        response.partial = True
+                    continue
+                raw = bool(data) and isinstance(data[0].get('3'), dict)
+                cells = {fid: {'value': value} if raw else value for fid, value in record.items()}
+                if record['3'] in rows:
+                    rows[record['3']].update(cells)
+                else:
+                    data.append(cells)
+                    rows[record['3']] = cells
+
+            if gone:
+                data[:] = [row for row in data if _cell_value(row.get('3')) not in gone]
+        return self.subscribe(handler, table)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: dict):
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        parts = [p for p in url.path.split('/') if p]
+        if parts[:1] != ['webhooks'] or len(parts) > 3:
+            return self._send(404, {'message': 'Not found'})
+
+        if receiver.secret is not None:
+            secret = self.headers.get('QB-Webhook-Secret') or params.get('secret') or ''
+            if not hmac.compare_digest(secret.encode('utf-8'), receiver.secret.encode('utf-8')):
+                receiver.stats['unauthorized'] += 1
+                return self._send(401, {'message': 'Unauthorized'})
+
+        try:
+            event = parse_webhook(raw, *parts[1:])
+        except ValueError as e:
+            receiver.stats['invalid'] += 1
+            return self._send(400, {'message': 'Bad Request', 'description': str(e)})
+
+        try:
+            handlers = receiver.handle(event)
+        except Exception as e:
+            receiver.errors.append((event, e))
+            return self._send(500, {'message': 'Handler failed', 'description': str(e)})
+        self._send(200, {'table': event.table, 'action': event.action, 'records': len(event.rids),
+                         'handlers': handlers})
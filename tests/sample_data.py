@@ -89,3 +89,31 @@ record_data_currency = {
         "skip": 0
     }
 }
+
+orders_data = {
+    "data": [
+        {"3": {"value": 1}, "7": {"value": 10.0}, "9": {"value": 100}},
+        {"3": {"value": 2}, "7": {"value": 20.0}, "9": {"value": 200}},
+        {"3": {"value": 3}, "7": {"value": 30.0}, "9": {"value": 100}},
+        {"3": {"value": 4}, "7": {"value": 40.0}, "9": {"value": None}},
+    ],
+    "fields": [
+        {"id": 3, "label": "Record ID#", "type": "recordid"},
+        {"id": 7, "label": "Amount", "type": "numeric"},
+        {"id": 9, "label": "Related Customer", "type": "numeric"}
+    ],
+    "metadata": {"totalRecords": 4, "numRecords": 4, "numFields": 3, "skip": 0}
+}
+
+customers_data = {
+    "data": [
+        {"3": {"value": 100}, "6": {"value": "Acme"}, "7": {"value": "Gold"}},
+        {"3": {"value": 300}, "6": {"value": "Globex"}, "7": {"value": "Silver"}},
+    ],
+    "fields": [
+        {"id": 3, "label": "Record ID#", "type": "recordid"},
+        {"id": 6, "label": "Name", "type": "text"},
+        {"id": 7, "label": "Tier", "type": "text"}
+    ],
+    "metadata": {"totalRecords": 2, "numRecords": 2, "numFields": 3, "skip": 0}
+}
@@ -0,0 +1,59 @@
+import pytest
+
+from quickbase_json.aggregate import Aggregator, HyperLogLog
+from quickbase_json.helpers import Group
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+@pytest.fixture
+def server():
+    store = TableStore()
+    store.add_table('lines', fields=[
+        {'id': 6, 'label': 'Region', 'type': 'text'},
+        {'id': 7, 'label': 'Amount', 'type': 'numeric'},
+        {'id': 8, 'label': 'Customer', 'type': 'text'},
+    ])
+    store.add_records('lines', [{6: ['east', 'west'][i % 2], 7: i, 8: f'c{i % 7}'} for i in range(100)])
+    with MockQuickbaseServer(store, page_size=30) as server:
+        yield server
+
+
+def test_hyperloglog():
+    hll = HyperLogLog(p=12)
+    for i in range(50000):
+        hll.add(f'value {i}')
+        hll.add(f'value {i}')
+    assert abs(hll.count() - 50000) / 50000 < 0.05
+    assert len(hll.registers) == 4096
+
+    other = HyperLogLog(p=12)
+    for i in range(50000, 60000):
+        other.add(f'value {i}')
+    hll.merge(other)
+    assert abs(hll.count() - 60000) / 60000 < 0.05
+
+
+def test_aggregator():
+    agg = Aggregator(Group([(6, 'equal-values')]), [(7, 'sum'), (7, 'avg', 'mean'), (7, 'min'), (8, 'distinct')],
+                     distinct_limit=2)
+    agg.extend([{'6': 'a', '7': 1, '8': 'x'}, {'6': 'a', '7': 3, '8': 'y'}, {'6': 'b', '7': None, '8': 'x'},
+                {'6': 'a', '7': 2, '8': 'z'}])
+    res = agg.result().denest()
+    assert res.data() == [
+        {'6': 'a', 'sum_7': 6, 'mean': 2.0, 'min_7': 1, 'distinct_8': 3},
+        {'6': 'b', 'sum_7': 0, 'mean': None, 'min_7': None, 'distinct_8': 1}]
+
+    with pytest.raises(ValueError):
+        Aggregator([6], [(7, 'median')])
+    with pytest.raises(ValueError):
+        Aggregator(Group([(6, 'first-word')]), [(7, 'sum')])
+
+
+def test_aggregate_records(server):
+    client = server.client()
+    res = client.aggregate_records('lines', '{7.GTE.10}', [6], [(3, 'count'), (7, 'sum'), (7, 'max'), (8, 'approx_distinct')])
+    assert res.ok
+    assert res.denest().data() == [
+        {'6': 'east', 'count_3': 45, 'sum_7': sum(range(10, 100, 2)), 'max_7': 98, 'approx_distinct_8': 7},
+        {'6': 'west', 'count_3': 45, 'sum_7': sum(range(11, 100, 2)), 'max_7': 99, 'approx_distinct_8': 7}]
+    assert server.stats['requests'] == 3
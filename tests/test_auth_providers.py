@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from quickbase_json.auth import QBUser, TicketAuth, UserTokenAuth, UserTokenPool
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+@pytest.fixture
+def server():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name'}])
+    with MockQuickbaseServer(store, users={'me@example.com': 'secret'}) as server:
+        yield server
+
+
+def test_ticket_auth_caches_tickets(server):
+    user = QBUser(realm='mock', username='me@example.com', realm_url=server.root_url)
+    auth = TicketAuth(user, 'secret', hours=1, background=False)
+    client = server.client(auth=auth)
+
+    for _ in range(3):
+        assert client.query_records(table='orders', select=[3], where='').ok
+    assert server.stats['authenticate'] == 1
+    assert 'secret' not in str(client)
+
+
+def test_ticket_auth_refresh_and_persist(server, tmp_path):
+    path = str(tmp_path / 'ticket.json')
+    user = QBUser(realm='mock', username='me@example.com', realm_url=server.root_url)
+    auth = TicketAuth(user, 'secret', hours=1, refresh_margin=3600 - 0.2, persist_path=path)
+    first = auth.ticket()
+
+    # background refresh kicks in once the ticket is within the refresh margin
+    time.sleep(0.5)
+    assert auth.refreshes >= 2
+    auth.close()
+
+    # another worker picks up the persisted ticket without authenticating
+    worker = TicketAuth(QBUser(realm='mock', username='me@example.com', realm_url=server.root_url), 'secret',
+                        hours=1, background=False, persist_path=path)
+    authenticated = server.stats['authenticate']
+    assert worker.ticket() != first
+    assert server.stats['authenticate'] == authenticated
+
+
+def test_ticket_auth_bad_password(server):
+    user = QBUser(realm='mock', username='me@example.com', realm_url=server.root_url)
+    with pytest.raises(PermissionError):
+        TicketAuth(user, 'wrong', background=False).ticket()
+
+
+def test_user_token_auth():
+    assert UserTokenAuth('abc').authorization() == 'QB-USER-TOKEN abc'
+
+
+def test_token_pool_spreads_load_and_cools_down_throttled_tokens():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name'}])
+    with MockQuickbaseServer(store, rate_limit=(2, 60)) as server:
+        pool = UserTokenPool(['token-aaaaa', 'token-bbbbb', 'token-ccccc'], requests=100, seconds=10, cooldown=60)
+        client = server.client(auth=pool)
+
+        # the server allows 2 requests per token, throttled requests are retried on another token
+        for _ in range(6):
+            assert client.query_records(table='orders', select=[3], where='').ok
+
+        stats = pool.stats()
+        assert sum(s['requests'] for s in stats.values()) >= 6
+        assert all(s['in_flight'] == 0 for s in stats.values())
+
+        server.inject(status=429, count=1, retry_after=60)
+        assert client.query_records(table='orders', select=[3], where='').status_code == 429
+        assert sum(s['throttled'] for s in pool.stats().values()) == 3
+        assert all(s['cooling'] for s in pool.stats().values())
+
+
+def test_token_pool_budgets():
+    pool = UserTokenPool(['token-aaaaa', 'token-bbbbb'], requests=2, seconds=60)
+    used = [pool.xml_credential()[1] for _ in range(4)]
+    assert sorted(used) == ['token-aaaaa', 'token-aaaaa', 'token-bbbbb', 'token-bbbbb']
+
+
+def test_authorization_timeout():
+    pool = UserTokenPool(['a'], requests=1, seconds=100)
+    assert pool.authorization(timeout=0.05) == 'QB-USER-TOKEN a'
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.authorization(timeout=0.05)
+    assert time.monotonic() - started < 0.5
+    assert pool.xml_credential_of('QB-USER-TOKEN a') == ('usertoken', 'a')
+
+
+def test_ticket_auth_background_failure(server, capsys):
+    user = QBUser(realm='mock', username='me@example.com', realm_url=server.root_url)
+    auth = TicketAuth(user, 'secret', hours=1, refresh_margin=3600 - 0.2)
+    auth.ticket()
+    server.users = {'me@example.com': 'changed'}
+    time.sleep(0.5)
+    # recorded quietly, then reported by the next foreground refresh
+    assert isinstance(auth.refresh_error, PermissionError)
+    assert capsys.readouterr().out == ''
+    with pytest.raises(PermissionError) as e:
+        auth.ticket()
+    assert e.value.__cause__ is not None
+    auth.close()
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+FIELDS = [
+    {'id': 6, 'label': 'Name', 'type': 'text'},
+    {'id': 7, 'label': 'Amount', 'type': 'numeric'},
+]
+
+
+@pytest.fixture
+def server():
+    store = TableStore()
+    store.add_table('orders', name='Orders', fields=FIELDS)
+    store.add_records('orders', [{6: 'existing', 7: 1}])
+    with MockQuickbaseServer(store) as server:
+        yield server
+
+
+def test_batches_records_from_many_threads(server):
+    client = server.client()
+    futures = []
+    with client.buffered_writer('orders', max_records=50, interval=60) as writer:
+        def produce(n):
+            for i in range(25):
+                futures.append(writer.append({'6': {'value': f'{n}-{i}'}, '7': {'value': None}}))
+
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    rids = sorted(f.result() for f in futures)
+    assert rids == list(range(2, 202))
+    assert writer.requests == 4
+    assert server.stats['requests'] == 4
+
+
+def test_interval_flush_and_line_errors(server):
+    client = server.client()
+    writer = client.buffered_writer('orders', interval=0.05)
+    updated = writer.append({'3': {'value': 1}, '7': {'value': 5}})
+    missing = writer.append({'3': {'value': 999}, '7': {'value': 5}})
+    created = writer.append({'6': {'value': 'new'}})
+
+    assert updated.result(timeout=5) == 1
+    assert created.result(timeout=5) == 2
+    with pytest.raises(ValueError):
+        missing.result(timeout=5)
+    assert writer.requests == 1
+
+    writer.close()
+    with pytest.raises(ValueError):
+        writer.append({'6': {'value': 'late'}})
+
+
+def test_failed_request_fails_every_record(server):
+    client = server.client()
+    server.inject(status=500, count=1, path='/v1/records')
+    with client.buffered_writer('orders') as writer:
+        futures = writer.extend([{'6': {'value': 'a'}}, {'6': {'value': 'b'}}])
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result()
+
+
+def test_batches_are_capped_by_bytes(server):
+    client = server.client()
+    insert_update_records, batches = client.insert_update_records, []
+    client.insert_update_records = lambda table, data, **kw: batches.append(len(data)) or insert_update_records(table, data, **kw)
+
+    writer = client.buffered_writer('orders', max_records=500, max_bytes=1000, interval=60)
+    # a burst appended before the background thread can send anything
+    with writer._cond:
+        futures = [writer.append({'6': {'value': 'x' * 80}}) for _ in range(50)]
+    writer.close()
+    assert len({f.result() for f in futures}) == 50
+    # ~100 bytes per record
+    assert sum(batches) == 50 and max(batches) <= 10
+
+
+def test_append_does_not_wait_for_send(server):
+    client = server.client()
+    insert_update_records, sending = client.insert_update_records, threading.Event()
+
+    def slow(table, data, **kw):
+        sending.set()
+        time.sleep(0.5)
+        return insert_update_records(table, data, **kw)
+    client.insert_update_records = slow
+
+    with client.buffered_writer('orders', max_records=1) as writer:
+        futures = [writer.append({'6': {'value': 'a'}})]
+        assert sending.wait(1)
+        # a flush waiting for the batch in flight must not block producers
+        futures.append(writer.append({'6': {'value': 'b'}}))
+        flush = threading.Thread(target=writer.flush)
+        flush.start()
+        time.sleep(0.1)
+        start = time.monotonic()
+        futures.append(writer.append({'6': {'value': 'c'}}))
+        assert time.monotonic() - start < 0.1
+        flush.join()
+    assert len({f.result() for f in futures}) == 3
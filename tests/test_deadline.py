@@ -0,0 +1,105 @@
+import time
+
+import pytest
+import requests
+
+from quickbase_json.deadline import Deadline, DeadlineExceeded
+from quickbase_json.helpers import upload_file
+from quickbase_json.jobs import ImportJob
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+@pytest.fixture
+def server():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name'}, {'id': 7, 'label': 'Amount', 'type': 'numeric'}])
+    store.add_records('orders', [{6: f'order {i}', 7: i} for i in range(100)])
+    with MockQuickbaseServer(store, page_size=10, latency=0.05) as server:
+        yield server
+
+
+def test_deadline():
+    deadline = Deadline(10)
+    assert deadline.timeout((5, 30))[0] == 5
+    assert 9 < deadline.timeout((5, 30))[1] <= 10
+    assert Deadline.of(deadline) is deadline
+    assert Deadline.of(None) is None
+
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0).timeout(5)
+
+
+def test_timeouts(server):
+    client = server.client(timeout=0.01)
+    with pytest.raises(requests.exceptions.Timeout):
+        client.query_records('orders', [3], '')
+
+    # per call timeout overrides the client's
+    assert client.query_records('orders', [3], '', timeout=(1, 5)).ok
+
+    with pytest.raises(DeadlineExceeded):
+        server.client().query_records('orders', [3], '', deadline=0.01)
+
+
+def test_paginator_deadline(server):
+    client = server.client()
+    started = time.monotonic()
+    paginator = client.paginate_query('orders', [3], '', deadline=0.3)
+    res = paginator.all()
+    assert time.monotonic() - started < 0.5
+    assert res.partial and paginator.partial
+    assert 0 < len(res.data()) < 100
+
+    res = client.query_all_records('orders', [3], '', deadline=10)
+    assert not res.partial and len(res.data()) == 100
+
+
+def test_multi_query_and_delete_deadline(server):
+    client = server.client()
+    res = client.multi_query_records('orders', 3, [3], list(range(1, 1001)), deadline=0.12)
+    assert res.partial
+    assert len(res.data()) < 100
+
+    res = client.delete_records_by_ids('orders', list(range(1, 200, 2)), max_length=100, max_workers=1, deadline=0.2)
+    assert res.partial and not res.ok
+    assert 0 < res['numberDeleted'] < 50
+
+
+def test_import_deadline(server, tmp_path):
+    client = server.client()
+    checkpoint = str(tmp_path / 'import.checkpoint')
+    records = [{'6': {'value': f'new {i}'}} for i in range(50)]
+    job = ImportJob(client, 'orders', records, checkpoint, batch_size=5, deadline=0.2)
+    rids = job.run()
+    assert job.partial and 0 < len(rids) < 50
+
+    job = ImportJob(client, 'orders', records, checkpoint, batch_size=5)
+    assert len(job.run()) == 50 and not job.partial
+
+
+def test_deadline_caps_rate_budget_wait(server):
+    client = server.client(rate_limit=(1, 100))
+    assert client.get_fields('orders', deadline=1)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.get_tables('mockapp', deadline=0.1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_per_call_deadlines(server, tmp_path):
+    client = server.client()
+    with pytest.raises(DeadlineExceeded):
+        client.delete_records('orders', '{3.EX.1}', deadline=0.01)
+    with pytest.raises(DeadlineExceeded):
+        client.download_file_to('orders', 1, 6, 1, str(tmp_path / 'file'), deadline=0.01)
+
+    # timeout and deadline are applied to the request, not sent in the body
+    r = client.insert_update_records_stream('orders', [{'6': {'value': 'streamed'}}], timeout=5, deadline=5)
+    assert r.ok
+
+    server.store.get('orders').add_field(8, 'Drawing', 'file')
+    path = tmp_path / 'drawing.dwg'
+    path.write_bytes(b'x' * 3000)
+    with pytest.raises(DeadlineExceeded):
+        upload_file(client, 'orders', 2, 8, str(path), json_limit=100, deadline=0.01)
+    assert upload_file(client, 'orders', 2, 8, str(path), json_limit=100, deadline=5).ok
@@ -0,0 +1,95 @@
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+
+from quickbase_json.encoder import RecordEncoder
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+FIELDS = [
+    {'id': 3, 'label': 'Record ID#', 'type': 'recordid'},
+    {'id': 6, 'label': 'Name', 'type': 'text'},
+    {'id': 7, 'label': 'Amount', 'type': 'currency'},
+    {'id': 8, 'label': 'Paid', 'type': 'checkbox'},
+    {'id': 9, 'label': 'Due', 'type': 'date'},
+    {'id': 10, 'label': 'Updated', 'type': 'timestamp'},
+    {'id': 11, 'label': 'Took', 'type': 'duration'},
+    {'id': 12, 'label': 'Tags', 'type': 'multitext'},
+    {'id': 13, 'label': 'Owner', 'type': 'user'},
+]
+
+
+def test_encode_types():
+    encoder = RecordEncoder(FIELDS)
+    updated = datetime.datetime(2023, 5, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    record = {
+        'Name': 123, 7: Decimal('12.30'), '8': True, 'Due': datetime.datetime(2023, 5, 1, 9),
+        'Updated': updated, 'Took': datetime.timedelta(minutes=1.5), 'Tags': ('a', 'b'), 'Owner': {'id': 'u1'},
+        3: None}
+    assert encoder.dumps(record) == (
+        '{"6":{"value":"123"},"7":{"value":12.30},"8":{"value":true},"9":{"value":"2023-05-01"},'
+        '"10":{"value":"2023-05-01T10:30:00.000Z"},"11":{"value":90000},"12":{"value":["a","b"]},'
+        '"13":{"value":{"id":"u1"}}}')
+
+    # raw cells are accepted, nulls are skipped
+    assert encoder.encode([{'6': {'value': 'x'}, '7': {'value': None}}]) == [{'6': {'value': 'x'}}]
+
+
+def test_encode_tuples():
+    encoder = RecordEncoder(FIELDS, columns=['Name', 7, 8])
+    assert encoder.encode([('a', 1.5, False), ('b', None)]) == [
+        {'6': {'value': 'a'}, '7': {'value': 1.5}, '8': {'value': False}},
+        {'6': {'value': 'b'}}]
+    body = json.loads(encoder.body('orders', [('a', 1, True)], mergeFieldId=6))
+    assert body == {'to': 'orders', 'mergeFieldId': 6, 'data': [{'6': {'value': 'a'}, '7': {'value': 1}, '8': {'value': True}}]}
+
+    # streamed in chunks, the same way as insert_update_records_stream
+    chunks = list(encoder.iter_body('orders', [('a', i, True) for i in range(100)], chunk_size=500))
+    assert len(chunks) > 1 and all(len(c) < 600 for c in chunks)
+    assert len(json.loads(b''.join(chunks))['data']) == 100
+
+    with pytest.raises(ValueError):
+        encoder.dumps(('a', 1, True, 'extra'))
+    with pytest.raises(ValueError):
+        RecordEncoder(FIELDS).dumps(('a',))
+
+
+def test_encode_get_fields_metadata():
+    # getFields returns the type as 'fieldType'
+    fields = [{'id': f['id'], 'label': f['label'], 'fieldType': f['type'], 'properties': {}} for f in FIELDS]
+    encoder = RecordEncoder(fields)
+    assert encoder.dumps({'Due': datetime.date(2023, 5, 1), 7: Decimal('1.50')}) == \
+        '{"9":{"value":"2023-05-01"},"7":{"value":1.50}}'
+
+
+def test_encode_errors():
+    encoder = RecordEncoder(FIELDS)
+    with pytest.raises(ValueError, match='Unknown field'):
+        encoder.dumps({'Missing': 1})
+    with pytest.raises(ValueError, match='Field 7'):
+        encoder.dumps({7: 'lots'})
+    with pytest.raises(ValueError, match='Field 7'):
+        encoder.dumps({7: float('nan')})
+    with pytest.raises(ValueError, match='Field 8'):
+        encoder.dumps({8: 'yes'})
+
+
+def test_insert_update_rows():
+    store = TableStore()
+    store.add_table('orders', fields=[f for f in FIELDS if f['id'] > 5])
+    with MockQuickbaseServer(store) as server:
+        client = server.client()
+        get_fields, calls = client.get_fields, []
+        client.get_fields = lambda table_id: calls.append(table_id) or get_fields(table_id)
+        r = client.insert_update_rows('orders', [('a', Decimal('1.25')), ('b', 2)], columns=['Name', 'Amount'])
+        assert r.ok
+        assert r.created_rids == [1, 2]
+        r = client.insert_update_rows('orders', [{'Record ID#': 1, 'Paid': True}])
+        assert r.updated_rids == [1]
+        # fields are fetched once per table
+        assert calls == ['orders']
+
+    records = store.get('orders').records
+    assert records[1]['7'] == {'value': 1.25}
+    assert records[1]['8'] == {'value': True}
@@ -0,0 +1,36 @@
+import base64
+
+from quickbase_json.file_cache import FileCache
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+def test_fetch_files_uses_cache(tmp_path):
+    store = TableStore()
+    store.add_table('docs', fields=[{'id': 8, 'label': 'File', 'type': 'file'}])
+    # two records with identical content are stored once
+    store.add_records('docs', [
+        {8: {'value': {'fileName': f'{i}.txt', 'data': base64.b64encode(b'same' if i < 2 else b'other').decode()}}}
+        for i in range(3)])
+    items = [('docs', rid, 8, 1) for rid in (1, 2, 3)]
+
+    with MockQuickbaseServer(store) as server:
+        client = server.client()
+        cache = FileCache(str(tmp_path / 'cache'))
+        results = list(client.fetch_files(items + [items[0]], cache=cache, max_workers=3))
+        assert len(results) == 3
+        assert all(r.ok and not r.cached for r in results)
+        assert len({r.entry.checksum for r in results}) == 2
+
+        downloads = server.stats['requests']
+        reopened = FileCache(str(tmp_path / 'cache'))
+        results = list(client.fetch_files(items, cache=reopened))
+        assert all(r.cached for r in results)
+        assert server.stats['requests'] == downloads
+        assert open(results[0].path, 'rb').read() in (b'same', b'other')
+
+        failed = list(client.fetch_files([('docs', 99, 8, 1)], cache=reopened))
+        assert not failed[0].ok
+
+    assert reopened.invalidate('docs', rid=1) == 1
+    assert reopened.prune() == 0
+    assert FileCache(str(tmp_path / 'cache')).get('docs', 1, 8, 1) is None
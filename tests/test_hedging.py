@@ -0,0 +1,56 @@
+import itertools
+import time
+
+import pytest
+
+from quickbase_json.hedging import HedgePolicy
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+@pytest.fixture
+def store():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name'}])
+    store.add_records('orders', [{6: f'order {i}'} for i in range(10)])
+    return store
+
+
+def test_route_and_delay():
+    assert HedgePolicy.route('get', 'http://x/v1/files/bq1/12/6/0') == 'GET /v1/files/bq1/{id}/{id}/{id}'
+
+    policy = HedgePolicy(percentile=90, min_delay=0.01, initial_delay=2, min_samples=10)
+    assert policy.delay('GET /v1/fields') == 2
+    for i in range(1, 101):
+        policy.observe('GET /v1/fields', i / 1000)
+    assert policy.delay('GET /v1/fields') == pytest.approx(0.091)
+
+
+def test_hedged_queries(store):
+    # every 10th query is very slow
+    counter = itertools.count()
+
+    def latency(method, path):
+        return 1.0 if next(counter) % 10 == 9 else 0.005
+
+    policy = HedgePolicy(percentile=90, min_delay=0.02, min_samples=5, max_ratio=0.5)
+    with MockQuickbaseServer(store, latency=latency) as server:
+        client = server.client(hedge=policy, rate_limit=(100, 100000))
+        started = time.monotonic()
+        for _ in range(20):
+            assert client.query_records('orders', [3, 6], '').ok
+        assert time.monotonic() - started < 1.0
+
+        stats = policy.stats()
+        assert stats['requests'] == 20
+        assert stats['hedged'] >= 2
+        assert stats['hedge_wins'] >= 2
+        # hedges are charged against the rate budget
+        assert client.auth_provider.rate_limiter.available == pytest.approx(100 - 20 - stats['hedged'], abs=0.1)
+
+
+def test_no_hedging_by_default(store):
+    with MockQuickbaseServer(store) as server:
+        client = server.client()
+        assert client.hedge is None
+        assert client.get_fields('orders')
+        assert server.client(hedge=True).hedge.stats()['requests'] == 0
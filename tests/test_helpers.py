@@ -1,4 +1,6 @@
+import base64
 import sys
+import threading
 
 import pytest
 
@@ -7,7 +9,10 @@ import os
 import os
 
 from quickbase_json import QBClient
-from quickbase_json.helpers import Where, IncorrectParameters, FileUpload, xml_upload
+from quickbase_json.helpers import Where, IncorrectParameters, FileUpload, xml_upload, upload_file, upload_files, \
+    chunk_query_values
+from quickbase_json.qb_insert_update_response import QBInsertResponse
+from quickbase_json.testing import MockQuickbaseServer, TableStore
 
 print(os.getcwd())
 empty_qbc = QBClient(realm='', auth='')
@@ -30,6 +35,19 @@ def test_where_join(fid, operator, value, expected):
     assert Where(fid, operator, value).build(join='OR') == expected
 
 
+def test_chunk_query_values():
+    assert chunk_query_values(3, [7, 1, 2, 3, 4, 9, 10], ranges=True) == [
+        '({3.GTE.1}AND{3.LTE.4})OR{3.EX.7}OR{3.EX.9}OR{3.EX.10}']
+    # ranges are opt-in, on other keys they would match values never listed
+    assert chunk_query_values(6, [1, 2, 3, 4]) == ['{6.EX.1}OR{6.EX.2}OR{6.EX.3}OR{6.EX.4}']
+    assert chunk_query_values(6, ['a', 'b']) == ['{6.EX."a"}OR{6.EX."b"}']
+    assert chunk_query_values(3, []) == []
+
+    queries = chunk_query_values(3, list(range(0, 2000, 2)), max_length=100)
+    assert all(len(q) <= 100 for q in queries)
+    assert sum(q.count('EX') for q in queries) == 1000
+
+
 def test_where_valid_operators():
     with pytest.raises(ValueError) as e_info:
         Where(3, 'EXX', 12345).build()
@@ -62,3 +80,49 @@ def test_xml_uploader_typing():
     with pytest.raises(TypeError) as e_buffered:
         xml_upload(empty_qbc, tbid='', rid=1, fid=1, file='testfile', filename='test')
 
+
+def test_upload_file_picks_json_or_xml(tmp_path):
+    payload = os.urandom(30000)
+    path = tmp_path / 'drawing.dwg'
+    path.write_bytes(payload)
+
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 8, 'label': 'Drawing', 'type': 'file'}])
+    store.add_records('orders', [{6: 'a'}, {6: 'b'}])
+
+    with MockQuickbaseServer(store) as server:
+        client = server.client()
+        small = upload_file(client, 'orders', 1, 8, str(path))
+        assert isinstance(small, QBInsertResponse) and small.ok
+
+        # force the XML path with a tiny JSON limit
+        results = upload_files(client, [{'tbid': 'orders', 'rid': 2, 'fid': 8, 'file': str(path)}], json_limit=1000,
+                               chunk_size=1000)
+        assert results[0].ok and results[0].status_code == 0
+
+    for rid in (1, 2):
+        assert base64.b64decode(store.get('orders').file(rid, 8, 1)['data']) == payload
+    assert server.log[-1] == ('POST', '/db/orders')
+
+
+def test_upload_file_from_pipe():
+    payload = os.urandom(100000)
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 8, 'label': 'Drawing', 'type': 'file'}])
+    store.add_records('orders', [{6: 'a'}])
+
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with os.fdopen(write_fd, 'wb') as w:
+            w.write(payload)
+    writer = threading.Thread(target=write)
+    writer.start()
+
+    with MockQuickbaseServer(store) as server, os.fdopen(read_fd, 'rb') as pipe:
+        # a pipe has no size to probe and can not be rewound, it is streamed with the XML API
+        assert not pipe.seekable()
+        r = upload_file(server.client(), 'orders', 1, 8, pipe, filename='piped.bin')
+        writer.join()
+        assert r.ok and server.log[-1] == ('POST', '/db/orders')
+    assert base64.b64decode(store.get('orders').file(1, 8, 1)['data']) == payload
@@ -0,0 +1,46 @@
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+import quickbase_json
+from quickbase_json import client
+
+# modules that are slow to import, and only needed by some features
+LAZY_MODULES = ['requests', 'pkg_resources', 'importlib.metadata', 'xml.etree.ElementTree', 'xml.sax.saxutils',
+                'multiprocessing', 'concurrent.futures.process', 'quickbase_json.aggregate', 'quickbase_json.snapshot']
+
+# import time budget in milliseconds, checked against the median of a few runs.  Wall clock timings are noisy
+# on shared runners, so the check only runs when the budget is set, i.e. QJAC_IMPORT_BUDGET_MS=200
+IMPORT_BUDGET_MS = os.environ.get('QJAC_IMPORT_BUDGET_MS')
+
+
+def run(code: str, *args) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(quickbase_json.__file__)))
+    return subprocess.run([sys.executable, *args, '-c', code], env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+
+def test_slow_modules_are_not_imported():
+    r = run(f'import sys, quickbase_json; print([m for m in {LAZY_MODULES!r} if m in sys.modules])')
+    assert r.stdout.strip() == '[]'
+
+
+@pytest.mark.skipif(not IMPORT_BUDGET_MS, reason='set QJAC_IMPORT_BUDGET_MS to benchmark the import')
+def test_import_time():
+    times = []
+    for _ in range(5):
+        r = run('import quickbase_json', '-X', 'importtime')
+        line = [ln for ln in r.stderr.splitlines() if ln.rstrip().endswith('| quickbase_json')][0]
+        times.append(int(line.split('|')[1]) / 1000)
+    print(f'import quickbase_json: {statistics.median(times):.1f}ms (median of {len(times)})')
+    assert statistics.median(times) < float(IMPORT_BUDGET_MS)
+
+
+def test_version():
+    assert client.get_version() == client.version
+    assert isinstance(client.get_version(), str)
+    qbc = quickbase_json.QBClient(realm='', auth='')
+    assert qbc.headers['User-Agent'] == f'python-qjac/{client.get_version()}'
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from quickbase_json.jobs import ExportJob, ImportJob
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+FIELDS = [
+    {'id': 6, 'label': 'Name', 'type': 'text'},
+    {'id': 7, 'label': 'Amount', 'type': 'numeric'},
+]
+
+
+@pytest.fixture
+def store():
+    store = TableStore()
+    store.add_table('orders', name='Orders', fields=FIELDS)
+    store.add_records('orders', [{6: f'order {i}', 7: i} for i in range(1, 46)])
+    store.add_table('copy', name='Copy', fields=FIELDS)
+    return store
+
+
+@pytest.fixture
+def server(store):
+    with MockQuickbaseServer(store, page_size=10) as server:
+        yield server
+
+
+def test_export_resumes_after_failure(server, tmp_path):
+    client = server.client()
+    dest = str(tmp_path / 'orders.jsonl')
+
+    # the third page fails
+    query_request, calls = client._query_request, []
+
+    def failing(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise ConnectionError('connection reset')
+        return query_request(*args, **kwargs)
+
+    client._query_request = failing
+    job = ExportJob(client, 'orders', [6], '{7.GT.5}', dest)
+    with pytest.raises(ConnectionError):
+        job.run()
+    assert job.checkpoint.last == {'last_rid': 25, 'records': 20, 'offset': job.checkpoint.last['offset']}
+    with open(dest, 'a') as f:
+        f.write('{"partial": ')
+
+    job = ExportJob(client, 'orders', [6], '{7.GT.5}', dest)
+    assert job.run() == 40
+    with open(dest) as f:
+        rids = [json.loads(line)['3']['value'] for line in f]
+    assert rids == list(range(6, 46))
+
+    # a finished export is not run again
+    requests = server.stats['requests']
+    assert ExportJob(client, 'orders', [6], '{7.GT.5}', dest).run() == 40
+    assert server.stats['requests'] == requests
+
+
+def test_import_resumes_without_duplicates(server, store, tmp_path):
+    client = server.client()
+    checkpoint = str(tmp_path / 'import.checkpoint')
+    records = [{'6': {'value': f'copy {i}'}, '7': {'value': i}} for i in range(25)]
+
+    def failing():
+        for i, record in enumerate(records):
+            if i == 22:
+                raise OSError('source went away')
+            yield record
+
+    job = ImportJob(client, 'copy', failing(), checkpoint, batch_size=10)
+    with pytest.raises(OSError):
+        job.run()
+    assert len(store.get('copy').records) == 20
+
+    job = ImportJob(client, 'copy', records, checkpoint, batch_size=10)
+    assert job.committed == 2
+    assert job.run() == list(range(1, 26))
+    assert len(store.get('copy').records) == 25
+
+
+def test_import_with_pending_batch_needs_merge_field(server, store, tmp_path):
+    client = server.client()
+    checkpoint = str(tmp_path / 'import.checkpoint')
+    records = [{'6': {'value': f'copy {i}'}, '7': {'value': i}} for i in range(15)]
+
+    server.inject(status=500, count=1, path='/v1/records')
+    with pytest.raises(ConnectionError):
+        ImportJob(client, 'copy', records, checkpoint, batch_size=10).run()
+
+    with pytest.raises(ValueError):
+        ImportJob(client, 'copy', records, checkpoint, batch_size=10).run()
+
+    rids = ImportJob(client, 'copy', records, checkpoint, batch_size=10, mergeFieldId=6).run()
+    assert rids == list(range(1, 16))
@@ -0,0 +1,57 @@
+from quickbase_json.qb_linked_record import LinkedRecordFactory
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+def build_store():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Number'}])
+    store.add_table('lines', fields=[{'id': 6, 'label': 'Qty', 'type': 'numeric'},
+                                     {'id': 10, 'label': 'Related Order', 'type': 'numeric'},
+                                     {'id': 11, 'label': 'Related Part', 'type': 'numeric'}])
+    store.add_table('parts', fields=[{'id': 6, 'label': 'Name'}, {'id': 12, 'label': 'Related Vendor', 'type': 'numeric'}])
+    store.add_table('vendors', fields=[{'id': 6, 'label': 'Name'}])
+
+    store.add_records('vendors', [{6: 'Acme'}, {6: 'Globex'}])
+    store.add_records('parts', [{6: f'part {i}', 12: 1 + i % 2} for i in range(10)])
+    store.add_records('orders', [{6: f'SO-{i}'} for i in range(20)])
+    store.add_records('lines', [{6: i, 10: 1 + i % 20, 11: 1 + i % 10} for i in range(100)])
+    return store
+
+
+def test_linked_record_factory_batches_per_table():
+    with MockQuickbaseServer(build_store()) as server:
+        factory = LinkedRecordFactory(client=server.client())
+        factory.set_root('orders', [6], '{3.LTE.5}')
+        factory.add_links([
+            ('orders', 3, 'lines', 10, 'lines', [6]),
+            {'source_table': 'lines', 'fid': 11, 'table': 'parts', 'alias': 'part', 'select': [6]},
+            {'source_table': 'parts', 'fid': 12, 'table': 'vendors', 'alias': 'vendor', 'select': [6]},
+            ('lines', 10, 'orders', 3, 'order'),
+        ])
+        roots = factory.build()
+
+    # root query plus one query per table per hop, no re-query of already loaded orders
+    assert factory.queries == 4
+    assert [r.rid for r in roots] == [1, 2, 3, 4, 5]
+
+    order = roots[0]
+    assert len(order.get('lines')) == 5
+    line = order.get('lines')[0]
+    assert line.get('order') == [order]
+    assert line.get('part')[0].get('vendor')[0].attributes['6'] in ('Acme', 'Globex')
+
+    built = order.build()
+    assert built['6'] == 'SO-0'
+    assert built['lines'][0]['order'] == [{'table': 'orders', 'rid': 1}]
+
+
+def test_linked_record_factory_max_hops():
+    with MockQuickbaseServer(build_store()) as server:
+        factory = LinkedRecordFactory(client=server.client())
+        factory.set_root('orders', 6, '{3.EX.1}')
+        factory.add_link('orders', 3, 'lines', target_fid=10)
+        factory.add_link('lines', 11, 'parts', alias='part')
+        roots = factory.build(max_hops=1)
+
+    assert len(roots[0].get('lines')) == 5
+    assert roots[0].get('lines')[0].get('part') == []
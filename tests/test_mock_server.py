@@ -0,0 +1,109 @@
+import pytest
+
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+FIELDS = [
+    {'id': 6, 'label': 'Name', 'type': 'text'},
+    {'id': 7, 'label': 'Amount', 'type': 'numeric'},
+    {'id': 8, 'label': 'Drawing', 'type': 'file'},
+]
+
+
+@pytest.fixture
+def store():
+    store = TableStore()
+    store.add_table('orders', name='Orders', fields=FIELDS, app_id='app1')
+    store.add_records('orders', [{6: f'order {i}', 7: i} for i in range(1, 26)])
+    return store
+
+
+@pytest.fixture
+def server(store):
+    with MockQuickbaseServer(store, page_size=10) as server:
+        yield server
+
+
+def test_query_pagination(server):
+    client = server.client()
+    r = client.query_records(table='orders', select=[3, 6], where='{7.GT.5}', options={'skip': 10, 'top': 5})
+    assert r.ok
+    assert r['metadata'] == {'totalRecords': 20, 'numRecords': 5, 'numFields': 2, 'skip': 10}
+    assert r.data()[0]['6']['value'] == 'order 16'
+
+    # page size is capped by the server
+    r = client.query_records(table='orders', select=[3], where='')
+    assert r['metadata']['numRecords'] == 10
+
+
+def test_upsert_and_delete(server, store):
+    client = server.client()
+    r = client.insert_update_records(table='orders', data=[{'6': {'value': 'new'}}, {'3': {'value': 1}, '7': {'value': 100}}])
+    assert r.ok
+    assert r.created_rids == [26]
+    assert r.updated_rids == [1]
+    assert store.get('orders').records[1]['7']['value'] == 100
+
+    deleted = client.delete_records(table='orders', where='{7.LTE.10}')
+    assert deleted == {'numberDeleted': 9}
+
+
+def test_delete_records_by_ids(server, store):
+    client = server.client()
+    r = client.delete_records_by_ids(table='orders', rids=[1, 2, 3, 4, 5, 8, 11, 12], max_length=40)
+    assert r.ok
+    assert r['numberDeleted'] == 8
+    assert r.chunks > 1
+    assert sorted(store.get('orders').records)[:3] == [6, 7, 9]
+
+    server.inject(status=500, count=1, path='/v1/records')
+    r = client.delete_records_by_ids(table='orders', rids=[6, 7], max_workers=1)
+    assert not r.ok
+    assert r.status_code == 207
+    assert r.failures[0]['status_code'] == 500
+
+    # throttled chunks back off and are retried
+    server.inject(status=429, count=2, path='/v1/records', retry_after=0)
+    r = client.delete_records_by_ids(table='orders', rids=[6, 7, 9], max_workers=1)
+    assert r.ok and r['numberDeleted'] == 3
+    assert server.stats['status_429'] == 2
+
+    # only record ids are collapsed into ranges
+    request, wheres = client._request, []
+    client._request = lambda *args, **kwargs: wheres.append(kwargs['json']['where']) or request(*args, **kwargs)
+    client.delete_records_by_ids(table='orders', rids=[1, 2, 3, 4], key_fid=7)
+    assert wheres and not any('GTE' in where for where in wheres)
+
+
+def test_fields_tables_and_files(server):
+    client = server.client()
+    assert [f['id'] for f in client.get_fields('orders')][-3:] == [6, 7, 8]
+    # as in the real API, getFields has 'fieldType' and query metadata 'type'
+    assert client.get_fields('orders')[-1]['fieldType'] == 'file'
+    assert client.query_records(table='orders', select=[8], where='')['fields'][0]['type'] == 'file'
+    assert client.get_tables('app1') == [{'id': 'orders', 'name': 'Orders'}]
+
+    client.insert_update_records(table='orders', data=[{'3': {'value': 2}, '8': {'value': {'fileName': 'a.txt', 'data': 'aGVsbG8='}}}])
+    f = client.download_file(table='orders', rid=2, fid=8, version=1)
+    assert f.content == 'aGVsbG8='
+
+
+def test_throttling_and_payload_cap(store):
+    with MockQuickbaseServer(store, rate_limit=(2, 60), max_payload_bytes=100) as server:
+        client = server.client()
+        assert client.query_records(table='orders', select=[3], where='').ok
+        assert client.query_records(table='orders', select=[3], where='').ok
+        throttled = client.query_records(table='orders', select=[3], where='')
+        assert throttled.status_code == 429
+        assert server.stats['throttled'] == 1
+
+        # each token has its own budget
+        other = server.client(auth='other-token')
+        r = other.insert_update_records(table='orders', data=[{'6': {'value': 'x' * 200}}])
+        assert r.status_code == 413
+
+
+def test_injected_fault(server):
+    client = server.client()
+    server.inject(status=429, count=1, path='/v1/records/query')
+    assert client.query_records(table='orders', select=[3], where='').status_code == 429
+    assert client.query_records(table='orders', select=[3], where='').ok
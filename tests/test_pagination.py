@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from quickbase_json.pagination import extract_metadata, PageSizer
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+@pytest.fixture
+def server():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name'}, {'id': 7, 'label': 'Amount', 'type': 'numeric'}])
+    store.add_records('orders', [{6: f'order {i}', 7: float(i)} for i in range(250)])
+    with MockQuickbaseServer(store, page_size=100) as server:
+        yield server
+
+
+def test_extract_metadata():
+    content = b'{"data": [{"6": {"value": "metadata"}}], "fields": [], "metadata": {"numRecords": 1, "totalRecords": 9}}'
+    assert extract_metadata(content) == {'numRecords': 1, 'totalRecords': 9}
+
+
+def test_paginate_query(server):
+    client = server.client()
+    paginator = client.paginate_query('orders', [3, 6, 7], '{7.GTE.10}', top=60)
+    pages = list(paginator)
+    assert [len(p.data()) for p in pages] == [60, 60, 60, 60]
+    assert paginator.total == 240
+
+    res = client.query_all_records('orders', [3, 6], '')
+    assert len(res.data()) == 250
+    assert res['metadata']['totalRecords'] == 250
+
+
+def test_paginate_query_process_pool(server):
+    client = server.client()
+    res = client.query_all_records('orders', [3, 7], '', processes=2,
+                                   transforms=['denest', 'round_ints'])
+    assert [r['3'] for r in res.data()] == list(range(1, 251))
+    assert res.data()[5]['7'] == 5 and isinstance(res.data()[5]['7'], int)
+    assert res.operations == ['denest']
+
+    with pytest.raises(ValueError):
+        client.paginate_query('orders', [3], '', transforms=['orient'])
+
+
+def test_shard_query(server):
+    client = server.client()
+    query = client.shard_query('orders', [3, 7], '{7.GTE.10}', shards=4, max_workers=3, ordered=True)
+    bounds = query.probe()
+    assert bounds[0] == (10, 70) and bounds[-1] == (190, None)
+    assert query.total == 240
+
+    res = query.all()
+    assert [r['3']['value'] for r in res.data()] == list(range(11, 251))
+
+    # unordered shards still return every record once
+    rids = [r['3']['value'] for r in client.shard_query('orders', [3], '', shards=7).iter_records()]
+    assert sorted(rids) == list(range(1, 251))
+
+
+def test_shard_query_is_bounded(server):
+    client = server.client()
+    for ordered in (True, False):
+        query = client.shard_query('orders', [3], '', shards=2, max_workers=2, ordered=ordered, top=10)
+        query.probe()
+        probed = server.stats['requests']
+        pages = iter(query)
+        next(pages)
+        time.sleep(0.3)
+        # a few pages buffered per worker, not whole shards of 13 pages
+        assert server.stats['requests'] - probed <= 2 * (query.BUFFERED_PAGES + 2)
+        assert sum(len(p.data()) for p in pages) == 240
+        assert query.records == 250
+
+    server.inject(status=500, count=1, path='/v1/records/query')
+    with pytest.raises(ConnectionError):
+        client.shard_query('orders', [3], '', shards=2, max_workers=2, ordered=True).all()
+
+
+def test_shard_query_retries_throttled_pages(server):
+    client = server.client()
+    server.inject(status=429, count=3, path='/v1/records/query', retry_after=0)
+    res = client.shard_query('orders', [3], '', shards=3, max_workers=3).all()
+    assert sorted(r['3']['value'] for r in res.data()) == list(range(1, 251))
+    assert server.stats['status_429'] == 3
+
+
+def test_shard_query_empty(server):
+    client = server.client()
+    assert client.shard_query('orders', [3], '{7.GT.1000}').all().data() == []
+
+
+def test_paginate_query_prefetch(server):
+    client = server.client()
+    paginator = client.paginate_query('orders', [3], '', top=25, prefetch=2)
+    pages = iter(paginator)
+    next(pages)
+    time.sleep(0.3)
+    # two pages buffered and a third waiting for room, no further
+    assert server.stats['requests'] == 4
+
+    assert sum(len(p.data()) for p in pages) == 225
+    assert paginator.records == 250
+
+    server.inject(status=500, count=1, path='/v1/records/query')
+    with pytest.raises(ConnectionError):
+        list(client.paginate_query('orders', [3], '', prefetch=2))
+
+
+def test_adaptive_page_size(server, tmp_path):
+    client = server.client()
+    path = str(tmp_path / 'page_sizes.json')
+    sizer = PageSizer(path=path, target_bytes=4000, initial=10)
+    paginator = client.paginate_query('orders', [3, 6, 7], '', adaptive=sizer)
+    assert len(paginator.all().data()) == 250
+    # pages grow 2x at a time toward the target size
+    assert paginator.pages < 10
+    top = sizer.top('orders', [7, 6, 3])
+    assert 20 < top <= 100
+
+    # remembered between runs, and halved when a page fails
+    sizer = PageSizer(path=path, target_bytes=4000)
+    assert sizer.top('orders', [3, 6, 7]) == top
+    server.inject(status=504, count=1, path='/v1/records/query')
+    assert len(client.query_all_records('orders', [3, 6, 7], '', adaptive=sizer).data()) == 250
+    assert server.stats['status_504'] == 1
+
+
+def test_adaptive_page_size_timeouts(server):
+    client = server.client()
+    requests = []
+    # the first request is too slow for the timeout
+    server.latency = lambda method, path: requests.append(path) or (0.5 if len(requests) == 1 else 0)
+    sizer = PageSizer(initial=80)
+    failed, sizer_failed = [], sizer.failed
+    sizer.failed = lambda *args: failed.append(args[-1]) or sizer_failed(*args)
+    res = client.query_all_records('orders', [3, 6, 7], '', adaptive=sizer, timeout=0.2)
+    assert len(res.data()) == 250
+    # the timed out page was retried at half the size
+    assert failed == [80]
@@ -82,4 +82,101 @@ def test_operations():
     assert res.operations == ['denest', 'orient']
 
 
+@pytest.mark.parametrize('swap', [False, True])
+def test_join_inner(swap):
+    orders = QBQueryResponse(sample_data=deepcopy(sample_data.orders_data))
+    customers = QBQueryResponse(sample_data=deepcopy(sample_data.customers_data))
+    if swap:
+        # make the left side the larger one, so the right side is hashed
+        customers['data'] = customers['data'] * 3
+    joined = orders.join(customers, on=[(9, 3)])
+
+    assert joined.fields('id') == [3, 7, 9, 6, '7_r']
+    assert joined.fields('label')[-1] == 'Tier_r'
+    assert sorted(r['3']['value'] for r in joined.data()) == ([1, 1, 1, 3, 3, 3] if swap else [1, 3])
+    assert joined.data()[0]['6'] == {'value': 'Acme'}
+    joined.transform('labels')
+    assert joined.data()[0]['Tier_r'] == 'Gold'
+
+
+def test_join_left_and_semi():
+    orders = QBQueryResponse(sample_data=deepcopy(sample_data.orders_data))
+    customers = QBQueryResponse(sample_data=deepcopy(sample_data.customers_data))
+
+    left = orders.join(customers, on=[(9, 3)], how='left')
+    assert [r['3']['value'] for r in left.data()] == [1, 2, 3, 4]
+    assert left.data()[1]['6'] == {'value': None}
+
+    semi = orders.join(customers, on=[(9, 3)], how='semi')
+    assert [r['3']['value'] for r in semi.data()] == [1, 3]
+    assert semi.fields('id') == [3, 7, 9]
+
+    with pytest.raises(ValueError):
+        orders.join(customers, on=9, how='outer')
+
+
+def test_join_representations_and_clashes():
+    orders = QBQueryResponse(sample_data=deepcopy(sample_data.orders_data)).denest()
+    customers = QBQueryResponse(sample_data=deepcopy(sample_data.customers_data))
+
+    # right rows are merged in the representation of the left rows
+    joined = orders.join(customers, on=[(9, 3)], how='left')
+    assert joined.data()[0]['6'] == 'Acme'
+    assert joined.data()[1]['6'] is None
+    raw = QBQueryResponse(sample_data=deepcopy(sample_data.customers_data)).join(orders, on=[(3, 9)])
+    assert raw.data()[0]['7_r'] == {'value': 10.0}
+
+    # a suffixed fid must not overwrite an existing one
+    orders['fields'].append({'id': '7_r', 'label': 'Taken'})
+    with pytest.raises(ValueError):
+        orders.join(customers, on=[(9, 3)])
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'snapshot.qbs')
+    res = QBQueryResponse(sample_data=deepcopy(sample_data.orders_data))
+    res['data'][0]['99'] = {'value': 1.5}
+    res.save(path)
+
+    loaded = QBQueryResponse.load(path)
+    assert loaded.data() == res.data()
+    assert loaded['fields'] == res['fields']
+    assert loaded['metadata'] == res['metadata']
+
+    partial = QBQueryResponse.load(path, columns=[3])
+    assert partial.data() == [{'3': r['3']} for r in res.data()]
+    assert [f['id'] for f in partial['fields']] == [3]
+
+    # denested data, nulls and missing keys
+    res = QBQueryResponse(sample_data={'data': [{'6': 'a', '7': 1}, {'6': None, '7': None}, {'7': 2**70}], 'fields': []})
+    res.operations = ['denest']
+    res.save(path)
+    loaded = QBQueryResponse.load(path)
+    assert loaded.data() == res.data()
+    assert loaded.operations == ['denest']
+
+    res['data'] = {'1': {'7': 1}}
+    with pytest.raises(ValueError):
+        res.save(path)
+
+
+def test_save_and_load_typed_columns(tmp_path):
+    from decimal import Decimal
+    path = str(tmp_path / 'snapshot.qbs')
+    utc = datetime.timezone.utc
+    res = QBQueryResponse(sample_data={'data': [
+        {'6': datetime.datetime(2019, 12, 18, 8, 0, 0, 500), '7': datetime.date(2020, 1, 1), '8': Decimal('12.30')},
+        {'6': datetime.datetime(2020, 1, 1, tzinfo=utc), '7': None, '8': Decimal('-1')}], 'fields': []})
+    res.save(path)
+    loaded = QBQueryResponse.load(path)
+    assert loaded.data() == res.data()
+    assert [type(v) for v in loaded.data()[0].values()] == [datetime.datetime, datetime.date, Decimal]
+    assert loaded.data()[1]['6'].tzinfo is not None
+
+    # other values are not silently turned into strings
+    res['data'][0]['9'] = {1, 2}
+    with pytest.raises(ValueError):
+        res.save(path)
+
+
 test_convert_datetime()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import base64
+import hashlib
+import io
+import json
+
+from quickbase_json.streaming import iter_upsert_body, Base64StreamDecoder
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+
+
+def test_iter_upsert_body_drops_nulls_without_mutating():
+    records = [{'6': {'value': 'a'}, '7': {'value': None}}, {'6': {'value': None}, '7': {'value': 2}}]
+    chunks = list(iter_upsert_body('abc', iter(records), chunk_size=8, mergeFieldId=6))
+    assert len(chunks) > 1
+    assert json.loads(b''.join(chunks)) == {
+        'to': 'abc', 'mergeFieldId': 6, 'data': [{'6': {'value': 'a'}}, {'7': {'value': 2}}]}
+    assert records[0]['7'] == {'value': None}
+
+
+def test_iter_upsert_body_empty():
+    assert json.loads(b''.join(iter_upsert_body('abc', []))) == {'to': 'abc', 'data': []}
+
+
+def test_insert_update_records_stream():
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name'}, {'id': 7, 'label': 'Amount', 'type': 'numeric'}])
+
+    def generate():
+        for i in range(2000):
+            yield {'6': {'value': f'order {i}'}, '7': {'value': i if i % 2 else None}}
+
+    with MockQuickbaseServer(store) as server:
+        r = server.client().insert_update_records_stream('orders', generate(), chunk_size=4096)
+
+    assert r.ok
+    assert r.processed == 2000
+    assert '7' not in store.get('orders').records[1]
+
+
+def test_base64_stream_decoder():
+    payload = bytes(range(256)) * 40
+    encoded = base64.b64encode(payload)
+    decoder = Base64StreamDecoder()
+    out = b''.join(decoder.decode(encoded[i:i + 7]) for i in range(0, len(encoded), 7)) + decoder.flush()
+    assert out == payload
+
+
+def test_download_file_to(tmp_path):
+    payload = bytes(range(256)) * 1000
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 8, 'label': 'Drawing', 'type': 'file'}])
+    store.add_records('orders', [{8: {'value': {'fileName': 'drawing.dwg', 'data': base64.b64encode(payload).decode()}}}])
+
+    with MockQuickbaseServer(store) as server:
+        client = server.client()
+
+        dest = tmp_path / 'drawing.dwg'
+        result = client.download_file_to('orders', 1, 8, 1, str(dest), chunk_size=1000)
+        assert dest.read_bytes() == payload
+        assert result.checksum == hashlib.sha256(payload).hexdigest()
+        assert result.name == 'drawing_dwg'
+
+        buffer = io.BytesIO()
+        client.download_file_to('orders', 1, 8, 1, buffer)
+        assert buffer.getvalue() == payload
+
+        # resume from a partial download
+        partial = tmp_path / 'resumed.dwg'
+        (tmp_path / 'resumed.dwg.part').write_bytes(payload[:10001])
+        result = client.download_file_to('orders', 1, 8, 1, str(partial), resume=True)
+        assert result.resumed_from == 9999
+        assert partial.read_bytes() == payload
+        assert result.checksum == hashlib.sha256(payload).hexdigest()
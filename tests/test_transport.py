@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+from quickbase_json import QBClient
+from quickbase_json.transport import RecordingTransport, ReplayTransport, CassetteResponse, CassetteError
+from tests import sample_data
+
+
+class FakeSession:
+    """Stands in for requests.Session, always returns the sample record data."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return CassetteResponse(200, json.dumps(sample_data.record_data).encode(), {'Content-Type': 'application/json'})
+
+
+def test_record_and_replay(tmp_path):
+    cassette = str(tmp_path / 'cassette.json')
+    session = FakeSession()
+    recording = QBClient(realm='test', auth='secret-token', transport=RecordingTransport(cassette, session=session))
+    recorded = recording.query_records(table='abc', select=[6, 7, 8], where='{3.GT.0}')
+    assert session.calls == 1
+
+    # auth headers are never written to disk
+    assert 'secret-token' not in open(cassette).read()
+
+    replaying = QBClient(realm='test', auth='secret-token', transport=ReplayTransport(cassette))
+    replayed = replaying.query_records(table='abc', select=[6, 7, 8], where='{3.GT.0}')
+    assert replayed.ok
+    assert replayed.data() == recorded.data()
+
+
+def test_replay_miss_and_latency(tmp_path):
+    cassette = str(tmp_path / 'cassette.json')
+    client = QBClient(realm='test', auth='', transport=RecordingTransport(cassette, session=FakeSession()))
+    client.query_records(table='abc', select=[6], where='')
+
+    replaying = QBClient(realm='test', auth='', transport=ReplayTransport(cassette, latency=0.05))
+    start = time.perf_counter()
+    replaying.query_records(table='abc', select=[6], where='')
+    assert time.perf_counter() - start >= 0.05
+
+    with pytest.raises(CassetteError):
+        replaying.query_records(table='xyz', select=[6], where='')
+
+
+def test_recording_appends_json_lines(tmp_path):
+    cassette = str(tmp_path / 'cassette.json')
+    client = QBClient(realm='test', auth='', transport=RecordingTransport(cassette, session=FakeSession()))
+    for i in range(3):
+        client.query_records(table='abc', select=[6], where=f'{{3.EX.{i}}}')
+    lines = open(cassette).read().splitlines()
+    assert len(lines) == 4 and json.loads(lines[0]) == {'version': 2}
+
+    # cassettes written as a single JSON document are still read
+    legacy = str(tmp_path / 'legacy.json')
+    with open(legacy, 'w') as f:
+        json.dump({'version': 1, 'interactions': [json.loads(line) for line in lines[1:]]}, f, indent=1)
+    replaying = QBClient(realm='test', auth='', transport=ReplayTransport(legacy))
+    assert replaying.query_records(table='abc', select=[6], where='{3.EX.2}').ok
+
+    recording = RecordingTransport(legacy, session=FakeSession(), overwrite=False)
+    assert len(recording.interactions) == 3
+    assert len(open(legacy).read().splitlines()) == 4
@@ -0,0 +1,61 @@
+import pytest
+
+from quickbase_json.testing import MockQuickbaseServer, TableStore
+from quickbase_json.upsert_state import UpsertState
+
+FIELDS = [
+    {'id': 6, 'label': 'SKU', 'type': 'text'},
+    {'id': 7, 'label': 'Price', 'type': 'numeric'},
+    {'id': 8, 'label': 'Stock', 'type': 'numeric'},
+]
+
+
+@pytest.fixture
+def server():
+    store = TableStore()
+    store.add_table('items', name='Items', fields=FIELDS)
+    store.add_records('items', [{6: f'sku-{i}', 7: i * 1.0, 8: 10} for i in range(1, 101)])
+    with MockQuickbaseServer(store) as server:
+        yield server
+
+
+def test_diff():
+    state = UpsertState.from_response({'data': [{'3': {'value': 1}, '6': {'value': 'a'}, '7': {'value': 5.0}}]})
+    assert state.diff({'3': {'value': 1}, '6': {'value': 'a'}, '7': {'value': 5}}) is None
+    assert state.diff({3: {'value': 1}, 7: {'value': 5}}) is None
+    assert state.diff({'3': {'value': 1}, '6': {'value': 'a'}, '7': {'value': 6}}) == {
+        '3': {'value': 1}, '7': {'value': 6}}
+    assert state.diff({'3': {'value': 2}, '6': {'value': 'b'}}) == {'3': {'value': 2}, '6': {'value': 'b'}}
+    assert state.diff({'6': {'value': 'c'}}) == {'6': {'value': 'c'}}
+
+
+def test_save_and_load(tmp_path):
+    state = UpsertState.from_response([{'6': 'a', '7': 1}], merge_fid=6)
+    state.save(str(tmp_path / 'state.json'))
+    loaded = UpsertState.load(str(tmp_path / 'state.json'))
+    assert loaded.merge_fid == '6'
+    assert loaded.diff({'6': {'value': 'a'}, '7': {'value': 1}}) is None
+
+
+def test_diff_upsert_sends_only_changes(server):
+    client = server.client()
+    state = UpsertState.from_response(client.query_records('items', [6, 7, 8], ''), merge_fid=6)
+    assert len(state) == 100
+
+    records = [{'6': {'value': f'sku-{i}'}, '7': {'value': i}, '8': {'value': 10}} for i in range(1, 101)]
+    records[4]['8']['value'] = 0
+    records.append({'6': {'value': 'sku-new'}, '7': {'value': 1}, '8': {'value': 1}})
+
+    before = server.stats['bytes_in']
+    r = client.insert_update_records_diff('items', records, state)
+    assert r.ok
+    assert r.skipped == 99
+    assert r.updated_rids == [5]
+    assert r.created_rids == [101]
+    assert server.stats['bytes_in'] - before < 300
+
+    # state follows what was written, so nothing is sent the second time
+    requests = server.stats['requests']
+    r = client.insert_update_records_diff('items', records, state)
+    assert r.ok and r.skipped == 101
+    assert server.stats['requests'] == requests
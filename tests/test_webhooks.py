@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from quickbase_json.file_cache import FileCache
+from quickbase_json.qb_response import QBQueryResponse
+from quickbase_json.testing import MockQuickbaseServer, TableStore, sample_webhook, post_webhook
+from quickbase_json.upsert_state import UpsertState
+from quickbase_json.webhooks import WebhookReceiver, parse_webhook
+
+
+def test_parse_webhook():
+    event = parse_webhook(sample_webhook('orders', 'Modify', [1, 2], fields={2: {6: 'new'}}))
+    assert (event.table, event.action, event.rids) == ('orders', 'modify', [1, 2])
+    assert event.records == [{'3': 1}, {'3': 2, '6': 'new'}]
+
+    event = parse_webhook(b'{"rid": "7"}', table='orders', action='Delete')
+    assert (event.table, event.action, event.rids) == ('orders', 'delete', [7])
+
+    with pytest.raises(ValueError):
+        parse_webhook('{"rid": 1}', action='add')
+    with pytest.raises(ValueError):
+        parse_webhook('{"rid": 1}', table='orders', action='archive')
+    with pytest.raises(ValueError):
+        parse_webhook('{"records": [{"6": "x"}]}', table='orders', action='add')
+
+
+def test_receiver(tmp_path):
+    cache = FileCache(str(tmp_path / 'files'))
+    for rid in (1, 2):
+        temp_path = cache.temp_path()
+        open(temp_path, 'w').write(f'file {rid}')
+        cache.put('orders', rid, 8, 1, temp_path, checksum=f'{rid:064d}')
+
+    state = UpsertState.from_response([{'3': {'value': 1}, '6': {'value': 'a'}}, {'3': {'value': 2}, '6': {'value': 'b'}}])
+    mirror = QBQueryResponse(sample_data={'data': [{'3': {'value': 1}, '6': {'value': 'a'}},
+                                                   {'3': {'value': 2}, '6': {'value': 'b'}}], 'fields': [], 'metadata': {}})
+
+    with WebhookReceiver(secret='s3cret') as receiver:
+        receiver.invalidate_files(cache)
+        receiver.track_state(state, 'orders')
+        receiver.mirror(mirror, 'orders')
+
+        status, r = post_webhook(receiver.url, sample_webhook('orders', 'Modify', [1], fields={1: {6: 'c'}}), secret='s3cret')
+        assert status == 200 and r['handlers'] == 3
+        assert state.diff({'3': 1, '6': 'c'}) == {'3': 1, '6': 'c'}
+        assert state.diff({'3': 2, '6': 'b'}) is None
+        assert mirror['data'][0]['6'] == {'value': 'c'}
+        assert not mirror.partial
+
+        status, r = post_webhook(receiver.url, '{"rid": 2}', table='orders', action='delete', secret='s3cret')
+        assert status == 200
+        assert len(cache) == 1 and cache.get('orders', 1, 8, 1) is not None
+        assert [row['3']['value'] for row in mirror['data']] == [1]
+        assert len(state) == 0
+
+        status, r = post_webhook(receiver.url, sample_webhook('orders', 'Add', [3]), secret='s3cret')
+        assert status == 200
+        # an added record without field values can not be mirrored
+        assert mirror.partial
+
+        assert post_webhook(receiver.url, '{"rid": 2}', table='orders', action='delete')[0] == 401
+        assert post_webhook(receiver.url, 'not json', secret='s3cret')[0] == 400
+        assert receiver.stats['modify'] == 1 and receiver.stats['delete'] == 1 and receiver.stats['add'] == 1
+
+
+def test_invalidate_queries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = TableStore()
+    store.add_table('orders', fields=[{'id': 6, 'label': 'Name', 'type': 'text'}])
+    store.add_table('items', fields=[{'id': 6, 'label': 'Name', 'type': 'text'}])
+    with MockQuickbaseServer(store) as server, WebhookReceiver() as receiver:
+        client = server.client()
+        client.cache_query('orders', [3, 6], '', hours=1)
+        client.cache_query('items', [3, 6], '', hours=1)
+        receiver.invalidate_queries(client)
+
+        status, r = post_webhook(receiver.url, sample_webhook('orders', 'Add', [1]))
+        assert status == 200
+        assert len(os.listdir('query_cache')) == 1